@@ -1,27 +0,0 @@
-"""
-TradePilot Engine Layers - Individual analysis modules
-"""
-
-from .layer_1_momentum import Layer1Momentum
-from .layer_2_volume import Layer2Volume
-from .layer_3_divergence import Layer3Divergence
-from .layer_4_volume_strength import Layer4VolumeStrength
-from .layer_5_trend import Layer5Trend
-from .layer_6_structure import Layer6Structure
-from .layer_7_liquidity import Layer7Liquidity
-from .layer_8_volatility_regime import Layer8VolatilityRegime
-from .layer_9_confirmation import Layer9Confirmation
-from .layer_10_candle_intelligence import Layer10CandleIntelligence
-
-__all__ = [
-    "Layer1Momentum",
-    "Layer2Volume",
-    "Layer3Divergence",
-    "Layer4VolumeStrength",
-    "Layer5Trend",
-    "Layer6Structure",
-    "Layer7Liquidity",
-    "Layer8VolatilityRegime",
-    "Layer9Confirmation",
-    "Layer10CandleIntelligence"
-]
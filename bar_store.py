@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Bar Store - Local columnar store of closed Polygon bars
+
+Historical bars don't change, so each (timeframe, symbol) is kept on disk
+as one raw little-endian binary file per column (t, o, h, l, c, v, vw, n)
+plus a manifest with the committed row count. Appends only write the new
+rows; reads memory-map the columns and return them in the columnar candle
+format DataProcessor.polygon_to_dataframe accepts. Only the missing tail is
+fetched from Polygon on each request; the still-forming bar is served but
+never stored.
+
+Usage:
+    python bar_store.py backfill AAPL MSFT [--tf day] [--limit 730] [--refresh]
+    python bar_store.py info AAPL [--tf day]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from market_calendar import BAR_SECONDS, MARKET_TZ, plan_range
+from polygon_client import get_candles, get_candles_range, get_candles_spanned, close_client
+from tradepilot_engine import DataProcessor
+
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", "")
+
+# Column -> dtype; "n" (trades) is float so missing values can be NaN
+COLUMNS = {
+    "t": "<i8",
+    "o": "<f8",
+    "h": "<f8",
+    "l": "<f8",
+    "c": "<f8",
+    "v": "<f8",
+    "vw": "<f8",
+    "n": "<f8",
+}
+
+
+def _day_start_ms(day) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class BarStore:
+    """Append-only columnar bar files under root/<tf>/<SYMBOL>/"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _dir(self, symbol: str, tf: str) -> str:
+        return os.path.join(self.root, tf, symbol.upper())
+
+    def manifest(self, symbol: str, tf: str) -> Optional[Dict]:
+        """Stored rows, first/last timestamp and the earliest time covered, or None"""
+        path = os.path.join(self._dir(symbol, tf), "manifest.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, directory: str, manifest: Dict):
+        tmp = os.path.join(directory, "manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(directory, "manifest.json"))
+
+    def read(self, symbol: str, tf: str, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        The last `limit` stored bars (all of them by default), memory-mapped
+
+        Returns columnar candles ({"ticker", "resultsCount", "columns"}) or None
+        if nothing is stored.
+        """
+        manifest = self.manifest(symbol, tf)
+        if not manifest or manifest["rows"] == 0:
+            return None
+        directory = self._dir(symbol, tf)
+        rows = manifest["rows"]
+        columns = {
+            name: np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            for name, dtype in COLUMNS.items()
+        }
+
+        first = 0 if limit is None else max(rows - limit, 0)
+        columns = {name: values[first:] for name, values in columns.items()}
+        return {"ticker": symbol.upper(), "resultsCount": rows - first, "columns": columns}
+
+    def append(self, symbol: str, tf: str, columns: Dict[str, np.ndarray], covered_from_ms: Optional[int] = None):
+        """Append bars newer than the last stored one"""
+        directory = self._dir(symbol, tf)
+        os.makedirs(directory, exist_ok=True)
+        manifest = self.manifest(symbol, tf) or {"rows": 0, "first_t": None, "last_t": None, "from_t": None}
+
+        t = np.asarray(columns["t"], dtype=COLUMNS["t"])
+        keep = t > manifest["last_t"] if manifest["last_t"] is not None else np.ones(len(t), dtype=bool)
+        rows = manifest["rows"]
+        new_rows = int(keep.sum())
+
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(directory, f"{name}.bin")
+            values = np.asarray(columns[name], dtype=dtype)[keep]
+            with open(path, "ab") as f:
+                # Drop bytes from an append that never made it into the manifest
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(values.tobytes())
+
+        if new_rows:
+            manifest["rows"] = rows + new_rows
+            manifest["first_t"] = manifest["first_t"] if manifest["first_t"] is not None else int(t[keep][0])
+            manifest["last_t"] = int(t[keep][-1])
+        if covered_from_ms is not None and (manifest["from_t"] is None or covered_from_ms < manifest["from_t"]):
+            manifest["from_t"] = covered_from_ms
+        self._write_manifest(directory, manifest)
+
+    def clear(self, symbol: str, tf: str):
+        """Remove everything stored for a symbol and timeframe"""
+        directory = self._dir(symbol, tf)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+store = BarStore(BAR_STORE_DIR) if BAR_STORE_DIR else None
+_locks: Dict[tuple, asyncio.Lock] = {}
+
+
+def _split_closed(columns: Dict[str, np.ndarray], tf: str, now: float):
+    """Split fetched bars into closed bars (storable) and the still-forming tail"""
+    closed = (columns["t"] // 1000 + BAR_SECONDS[tf]) <= now
+    return (
+        {name: values[closed] for name, values in columns.items()},
+        {name: values[~closed] for name, values in columns.items()},
+    )
+
+
+async def get_candles_stored(symbol: str, tf: str = "day", limit: int = 730, refresh: bool = False):
+    """
+    get_candles() through the bar store
+
+    Fetches only bars after the last stored one (the whole window when the
+    store doesn't reach back far enough, or with refresh=True), stores the
+    closed ones and serves the latest `limit` bars from disk. The whole
+    window comes from get_candles, so it reaches further back for symbols
+    with missing bars. Timeframes without a known bar length go straight
+    upstream.
+    """
+    if store is None or tf not in BAR_SECONDS:
+        return await get_candles(symbol, tf, limit, columnar=True)
+
+    start_date, end_date = plan_range(tf, limit)
+    start_ms = _day_start_ms(start_date)
+    lock = _locks.setdefault((symbol, tf), asyncio.Lock())
+    async with lock:
+        manifest = await asyncio.to_thread(store.manifest, symbol, tf)
+        covered = manifest is not None and manifest["from_t"] is not None and manifest["from_t"] <= start_ms
+        rewrite = refresh or not covered
+        if not rewrite and manifest["last_t"] is not None:
+            fetch_from = datetime.fromtimestamp(manifest["last_t"] / 1000, MARKET_TZ).date()
+        else:
+            fetch_from = start_date
+
+        if rewrite:
+            response, span_start = await get_candles_spanned(symbol, tf, limit, columnar=True)
+        else:
+            response = await get_candles_range(symbol, tf, fetch_from, end_date, columnar=True)
+        forming = None
+        if response and "columns" in response:
+            covered_from = None
+            if rewrite:
+                t = response["columns"]["t"]
+                if len(t) >= limit:
+                    # Only the latest `limit` bars were kept: coverage starts at the oldest of them
+                    covered_from = _day_start_ms(datetime.fromtimestamp(t[0] / 1000, MARKET_TZ).date())
+                else:
+                    covered_from = _day_start_ms(span_start)
+            closed, forming = _split_closed(response["columns"], tf, time.time())
+            if rewrite:
+                await asyncio.to_thread(store.clear, symbol, tf)
+            await asyncio.to_thread(store.append, symbol, tf, closed, covered_from)
+        elif manifest is None:
+            # Nothing stored to fall back on: pass the upstream response through
+            return response
+
+        stored = await asyncio.to_thread(store.read, symbol, tf, limit)
+
+    if forming is None or len(forming["t"]) == 0:
+        return stored or {"ticker": symbol.upper(), "resultsCount": 0, "columns": DataProcessor.results_to_columns([])}
+    if stored is None:
+        columns = {name: values[-limit:] for name, values in forming.items()}
+    else:
+        columns = {name: np.concatenate((stored["columns"][name], forming[name]))[-limit:] for name in COLUMNS}
+    return {"ticker": symbol.upper(), "resultsCount": len(columns["t"]), "columns": columns}
+
+
+async def backfill(symbols: Iterable[str], tf: str = "day", limit: int = 730, refresh: bool = False,
+                   concurrency: int = 5):
+    """Fill the store for many symbols (at most `concurrency` fetches at once)"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(symbol: str):
+        async with slots:
+            try:
+                candles = await get_candles_stored(symbol, tf, limit, refresh=refresh)
+                count = candles.get("resultsCount", 0) if candles else 0
+                print(f"{symbol:<8} {count:>7} bars")
+            except Exception as e:
+                print(f"{symbol:<8} failed: {e}")
+
+    try:
+        await asyncio.gather(*(one(symbol.upper()) for symbol in symbols))
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TradePilot local bar store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fill = sub.add_parser("backfill", help="fetch and store bars for a symbol list")
+    fill.add_argument("symbols", nargs="*", help="symbols (or use --file)")
+    fill.add_argument("--file", help="text file with one symbol per line")
+    fill.add_argument("--tf", default="day")
+    fill.add_argument("--limit", type=int, default=730, help="bars of history")
+    fill.add_argument("--refresh", action="store_true", help="refetch the whole window (e.g. after a split)")
+    fill.add_argument("--concurrency", type=int, default=5)
+
+    info = sub.add_parser("info", help="show what is stored for a symbol")
+    info.add_argument("symbol")
+    info.add_argument("--tf", default="day")
+
+    args = parser.parse_args()
+    if store is None:
+        parser.error("set BAR_STORE_DIR to enable the bar store")
+
+    if args.command == "backfill":
+        symbols = list(args.symbols)
+        if args.file:
+            with open(args.file) as f:
+                symbols += [line.strip() for line in f if line.strip()]
+        asyncio.run(backfill(symbols, args.tf, args.limit, args.refresh, args.concurrency))
+    elif args.command == "info":
+        print(json.dumps(store.manifest(args.symbol, args.tf), indent=2))
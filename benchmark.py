@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the TradePilot engine (synthetic data, no API key needed)
+
+Usage:
+    python benchmark.py memory [--bars 730 5000 20000]
+    python benchmark.py tail [--bars 730 5000 20000]
+    python benchmark.py universe [--symbols 3000] [--bars 730]
+    python benchmark.py decode [--bars 1000 10000 100000]
+    python benchmark.py backtest [--symbols 500] [--bars 2520]
+    python benchmark.py iv [--contracts 10000]
+"""
+import argparse
+import json
+import resource
+import time
+import tracemalloc
+import numpy as np
+
+from tradepilot_engine import TradePilotEngine, DataProcessor
+
+
+def synthetic_candles(bars: int, seed: int = 7, step_ms: int = 60_000) -> dict:
+    """Random-walk OHLCV in Polygon aggregates format"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = close * (1 + rng.normal(0, 0.003, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, bars)))
+    volume = rng.integers(10_000, 500_000, bars).astype(float)
+    start = 1_700_000_000_000
+    return {
+        "results": [
+            {
+                "o": float(open_[i]), "h": float(high[i]), "l": float(low[i]), "c": float(close[i]),
+                "v": float(volume[i]), "vw": float(close[i]), "n": 100, "t": start + i * step_ms
+            }
+            for i in range(bars)
+        ]
+    }
+
+
+def bench_memory(bar_counts):
+    """Peak memory allocated by one analyze() call"""
+    engine = TradePilotEngine()
+    print(f"{'bars':>8} {'peak alloc (MB)':>16} {'time (ms)':>10}")
+    for bars in bar_counts:
+        candles = synthetic_candles(bars)
+        engine.analyze(candles, "BENCH", "minute")  # warm up
+
+        tracemalloc.start()
+        engine.analyze(candles, "BENCH", "minute")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        runs = 5
+        for _ in range(runs):
+            engine.analyze(candles, "BENCH", "minute")
+        elapsed = (time.perf_counter() - start) / runs
+
+        print(f"{bars:>8} {peak / 1e6:>16.2f} {elapsed * 1000:>10.1f}")
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process max RSS: {max_rss_mb:.1f} MB")
+
+
+def max_difference(full, tail, path: str = "") -> tuple:
+    """Largest absolute difference between two analyze() results, and where"""
+    if isinstance(full, dict):
+        worst = (0.0, path)
+        for key, value in full.items():
+            worst = max(worst, max_difference(value, tail.get(key), f"{path}.{key}"), key=lambda w: w[0])
+        return worst
+    if isinstance(full, (int, float)) and not isinstance(full, bool):
+        return abs(full - tail), path
+    return (0.0, path) if full == tail else (float("inf"), path)
+
+
+def bench_tail(bar_counts):
+    """Tail-only vs. full-history evaluation: speed and parity"""
+    engine = TradePilotEngine()
+    print(f"{'bars':>8} {'full (ms)':>10} {'tail (ms)':>10} {'max diff':>10}  field")
+    for bars in bar_counts:
+        candles = synthetic_candles(bars)
+        full = engine.analyze(candles, "BENCH", "minute", tail_only=False)
+        tail = engine.analyze(candles, "BENCH", "minute", tail_only=True)
+        diff, field = max_difference(full, tail)
+
+        timings = []
+        for tail_only in (False, True):
+            start = time.perf_counter()
+            runs = 5
+            for _ in range(runs):
+                engine.analyze(candles, "BENCH", "minute", tail_only=tail_only)
+            timings.append((time.perf_counter() - start) / runs)
+
+        print(f"{bars:>8} {timings[0] * 1000:>10.1f} {timings[1] * 1000:>10.1f} {diff:>10.2g}  {field or '-'}")
+
+
+def synthetic_universe(symbols: int, bars: int) -> dict:
+    """Random-walk (symbols, bars) OHLCV matrices"""
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, bars)), axis=1))
+    open_ = close * (1 + rng.normal(0, 0.003, (symbols, bars)))
+    return {
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, (symbols, bars)))),
+        "low": np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, (symbols, bars)))),
+        "close": close,
+        "volume": rng.integers(10_000, 500_000, (symbols, bars)).astype(float),
+    }
+
+
+def bench_universe(symbols: int, bars: int):
+    """Cross-sectional scoring of a synthetic universe vs. per-symbol analyze()"""
+    matrices = synthetic_universe(symbols, bars)
+    names = [f"SYM{i}" for i in range(symbols)]
+
+    engine = TradePilotEngine()
+    engine.analyze_universe(names[:10], {k: v[:10] for k, v in matrices.items()})  # warm up
+    start = time.perf_counter()
+    table = engine.analyze_universe(names, matrices)
+    elapsed = time.perf_counter() - start
+    print(f"analyze_universe: {symbols} symbols x {bars} bars in {elapsed * 1000:.0f} ms")
+
+    sample = min(symbols, 50)
+    candles = [
+        {"results": [
+            {"o": o, "h": h, "l": l, "c": c, "v": v, "t": i * 86_400_000}
+            for i, (o, h, l, c, v) in enumerate(zip(*(matrices[k][row] for k in ("open", "high", "low", "close", "volume"))))
+        ]}
+        for row in range(sample)
+    ]
+    start = time.perf_counter()
+    for row in range(sample):
+        engine.analyze(candles[row], names[row])
+    per_symbol = (time.perf_counter() - start) / sample
+    print(f"per-symbol analyze(): {per_symbol * 1000:.1f} ms each, ~{per_symbol * symbols:.1f} s for the universe")
+    print(table["recommendation"].value_counts().to_string())
+
+
+def bench_backtest(symbols: int, bars: int):
+    """Vectorized backtest vs. the per-bar analyze() calls it replaces"""
+    matrices = synthetic_universe(symbols, bars)
+    names = [f"SYM{i}" for i in range(symbols)]
+
+    engine = TradePilotEngine()
+    start = time.perf_counter()
+    result = engine.backtest(names, matrices)
+    elapsed = time.perf_counter() - start
+    print(f"backtest: {symbols} symbols x {bars} bars ({symbols * bars:,} scored bars) in {elapsed:.2f} s")
+
+    candles = {"results": [
+        {"o": o, "h": h, "l": l, "c": c, "v": v, "t": i * 86_400_000}
+        for i, (o, h, l, c, v) in enumerate(zip(*(matrices[k][0] for k in ("open", "high", "low", "close", "volume"))))
+    ]}
+    sample = range(bars - 20, bars)
+    start = time.perf_counter()
+    for end in sample:
+        engine.analyze({"results": candles["results"][:end]}, names[0])
+    per_bar = (time.perf_counter() - start) / len(sample)
+    print(f"per-bar analyze(): {per_bar * 1000:.1f} ms each, ~{per_bar * symbols * bars / 60:.0f} min for the same backtest")
+    print(json.dumps(result["portfolio"], indent=2))
+
+
+def bench_iv(contracts: int):
+    """Batched implied-vol solve and greeks over a synthetic chain"""
+    from option_analytics import bs_greeks, bs_price, implied_volatility
+
+    rng = np.random.default_rng(11)
+    spot, rate, dividend_yield = 500.0, 0.04, 0.01
+    strike = rng.uniform(0.5, 1.8, contracts) * spot
+    years = rng.uniform(1 / 365, 2, contracts)
+    sigma = rng.uniform(0.05, 1.5, contracts)
+    is_call = rng.random(contracts) < 0.5
+    price = bs_price(spot, strike, years, rate, sigma, is_call, dividend_yield)
+
+    implied_volatility(price[:100], spot, strike[:100], years[:100], rate, is_call[:100], dividend_yield)  # warm up
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        iv = implied_volatility(price, spot, strike, years, rate, is_call, dividend_yield)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    bs_greeks(spot, strike, years, rate, iv, is_call, dividend_yield)
+    greeks = time.perf_counter() - start
+
+    solved = np.isfinite(iv)
+    # Time value under a cent carries no volatility information worth quoting
+    lower = np.maximum(np.where(is_call, 1, -1) * (spot * np.exp(-dividend_yield * years) - strike * np.exp(-rate * years)), 0)
+    quoted = solved & (price - lower >= 0.01)
+    print(f"implied_volatility: {contracts} contracts in {min(timings) * 1000:.1f} ms "
+          f"({solved.sum()} solved, max |iv - sigma| {np.max(np.abs(iv - sigma)[quoted]):.2e} at time value >= 0.01)")
+    print(f"bs_greeks: {greeks * 1000:.1f} ms")
+
+
+def bench_decode(bar_counts):
+    """Aggregates response body -> DataFrame: list-of-dicts path vs. columnar decode"""
+    print(f"{'bars':>8} {'dicts (ms)':>11} {'columnar (ms)':>14} {'speedup':>8}")
+    for bars in bar_counts:
+        payload = json.dumps(synthetic_candles(bars)).encode()
+        expected = DataProcessor.polygon_to_dataframe(json.loads(payload))
+        decoded = DataProcessor.polygon_to_dataframe(DataProcessor.decode_aggregates(payload))
+        assert np.array_equal(expected[["open", "high", "low", "close", "volume"]].to_numpy(),
+                              decoded[["open", "high", "low", "close", "volume"]].to_numpy())
+
+        timings = []
+        for decode in (
+            lambda: DataProcessor.polygon_to_dataframe(json.loads(payload)),
+            lambda: DataProcessor.polygon_to_dataframe(DataProcessor.decode_aggregates(payload)),
+        ):
+            runs = max(3, 100_000 // bars)
+            start = time.perf_counter()
+            for _ in range(runs):
+                decode()
+            timings.append((time.perf_counter() - start) / runs)
+
+        print(f"{bars:>8} {timings[0] * 1000:>11.2f} {timings[1] * 1000:>14.2f} {timings[0] / timings[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TradePilot engine benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    memory = sub.add_parser("memory", help="peak memory per analyze()")
+    memory.add_argument("--bars", type=int, nargs="+", default=[730, 5000, 20000])
+
+    tail = sub.add_parser("tail", help="tail-only vs. full-history evaluation")
+    tail.add_argument("--bars", type=int, nargs="+", default=[730, 5000, 20000])
+
+    universe = sub.add_parser("universe", help="cross-sectional scoring of a whole universe")
+    universe.add_argument("--symbols", type=int, default=3000)
+    universe.add_argument("--bars", type=int, default=730)
+
+    decode = sub.add_parser("decode", help="aggregates JSON -> DataFrame decode paths")
+    decode.add_argument("--bars", type=int, nargs="+", default=[1000, 10000, 100000])
+
+    backtest = sub.add_parser("backtest", help="vectorized backtest of the recommendation")
+    backtest.add_argument("--symbols", type=int, default=500)
+    backtest.add_argument("--bars", type=int, default=2520)
+
+    iv = sub.add_parser("iv", help="batched implied-vol solver and greeks")
+    iv.add_argument("--contracts", type=int, default=10000)
+
+    args = parser.parse_args()
+    if args.command == "memory":
+        bench_memory(args.bars)
+    elif args.command == "tail":
+        bench_tail(args.bars)
+    elif args.command == "universe":
+        bench_universe(args.symbols, args.bars)
+    elif args.command == "decode":
+        bench_decode(args.bars)
+    elif args.command == "backtest":
+        bench_backtest(args.symbols, args.bars)
+    elif args.command == "iv":
+        bench_iv(args.contracts)
@@ -0,0 +1,95 @@
+"""
+Candle Cache - Bounded in-process cache in front of polygon_client.get_candles
+
+Entries are keyed by (symbol, tf, limit) and expire when the newest bar in
+them can change: minute bars after ~60s, hour bars at the next hour boundary,
+daily and longer bars at the next regular-session close (holidays and
+early closes included).
+"""
+import os
+import time
+from cachetools import TLRUCache
+
+from market_calendar import next_session_close
+from polygon_client import get_candles
+from bar_store import store, get_candles_stored
+from market_feed import feed
+from singleflight import SingleFlight
+from tradepilot_engine import DataProcessor
+
+CACHE_SIZE = int(os.getenv("CANDLE_CACHE_SIZE", "512"))
+MINUTE_TTL = float(os.getenv("CANDLE_CACHE_MINUTE_TTL", "60"))
+
+
+def expires_at(tf: str, now: float) -> float:
+    """Expiry time for a candle set of timeframe `tf` fetched at `now`."""
+    if tf in ("second", "minute"):
+        return now + MINUTE_TTL
+    if tf == "hour":
+        return (now // 3600 + 1) * 3600
+    return next_session_close(now)
+
+
+class CandleCache(TLRUCache):
+    """TLRU cache with bar-aware expiry and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        super().__init__(maxsize, ttu=lambda key, value, now: expires_at(key[1], now), timer=time.time)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.evictions += 1
+        return key, value
+
+    def stats(self) -> dict:
+        return {
+            "size": self.currsize,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+candle_cache = CandleCache()
+_fetches = SingleFlight()
+
+
+async def get_candles_cached(symbol: str, tf: str = "day", limit: int = 730, bypass_cache: bool = False):
+    """
+    get_candles() through the candle cache.
+
+    With bypass_cache=True the cache is skipped on read but refreshed with
+    the new response. Candles are decoded straight into NumPy columns
+    ({"columns": ...}); only responses that carry bars are cached.
+    Concurrent misses for the same key share one upstream request. When the
+    bar store is enabled (BAR_STORE_DIR), misses read through it and only
+    fetch bars newer than the stored ones; bypass_cache skips it too.
+    Symbols on the live market feed (FEED_SYMBOLS) are served from its
+    in-memory bars without any upstream call once it holds `limit` of them.
+    """
+    key = (symbol, tf, limit)
+    if feed is not None and not bypass_cache:
+        live = feed.candles(symbol, tf, limit)
+        if live is not None:
+            return live
+    if not bypass_cache:
+        cached = candle_cache.get(key)
+        if cached is not None:
+            candle_cache.hits += 1
+            return cached
+    candle_cache.misses += 1
+
+    async def fetch():
+        if store is not None and not bypass_cache:
+            candles_data = await get_candles_stored(symbol, tf=tf, limit=limit)
+        else:
+            candles_data = await get_candles(symbol, tf=tf, limit=limit, columnar=True)
+        if DataProcessor.bar_count(candles_data) > 0:
+            candle_cache[key] = candles_data
+        return candles_data
+
+    return await _fetches.do(key + (bypass_cache,), fetch)
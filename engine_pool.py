@@ -0,0 +1,69 @@
+"""
+Engine Pool - Process pool for CPU-bound engine runs
+
+Batch requests analyze many symbols at once; running them in worker
+processes lets the pandas/NumPy work use every core instead of sharing the
+server process's GIL. Each worker builds its own TradePilotEngine once.
+
+A worker dying (OOM kill, signal) breaks the whole executor; the broken
+pool is then replaced and the run retried once on the fresh one.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from tradepilot_engine import TradePilotEngine
+
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "0")) or os.cpu_count() or 1
+# false evaluates indicators over the full history (shared with the in-process engine in engine_router)
+ENGINE_TAIL_ONLY = os.getenv("ENGINE_TAIL_ONLY", "true").lower() != "false"
+# Warm incremental streams the in-process engine keeps (0 = unbounded)
+ENGINE_MAX_STREAMS = int(os.getenv("ENGINE_MAX_STREAMS", "500")) or None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_worker_engine: Optional[TradePilotEngine] = None
+
+
+def _analyze(candles_data: Dict, symbol: str, timeframe: str, layers: Optional[List[str]]) -> Dict:
+    """Worker-side analyze() with a per-process engine"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = TradePilotEngine(tail_only=ENGINE_TAIL_ONLY)
+    return _worker_engine.analyze(candles_data, symbol, timeframe, layers)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=ENGINE_WORKERS)
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    """Drop a broken pool; concurrent callers that saw the same pool break reset it only once"""
+    global _pool
+    if _pool is broken:
+        _pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def analyze_in_pool(candles_data: Dict, symbol: str, timeframe: str = "day",
+                          layers: Optional[List[str]] = None) -> Dict:
+    """TradePilotEngine.analyze() in a worker process (retried once if the pool broke)"""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        return await loop.run_in_executor(pool, _analyze, candles_data, symbol, timeframe, layers)
+    except BrokenProcessPool:
+        _reset_pool(pool)
+    return await loop.run_in_executor(get_pool(), _analyze, candles_data, symbol, timeframe, layers)
+
+
+def close_pool():
+    """Shut down the worker processes (called on app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -3,56 +3,177 @@ Engine Router - FastAPI endpoints for TradePilot Engine
 """
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
-from typing import Optional
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+import asyncio
+import os
 import sys
 sys.path.append('.')
 
-from tradepilot_engine import TradePilotEngine
-from polygon_client import get_candles
+from tradepilot_engine import TradePilotEngine, DataProcessor
+from candle_cache import get_candles_cached, candle_cache
+from market_feed import feed
+from singleflight import SingleFlight
+from engine_pool import ENGINE_MAX_STREAMS, ENGINE_TAIL_ONLY, analyze_in_pool
+from json_response import NumpyJSONResponse
+from signal_stream import SignalScheduler
 
-router = APIRouter(prefix="/engine", tags=["TradePilot Engine"])
+# Engine routes return NumpyJSONResponse directly: results are rendered in
+# one pass without FastAPI's jsonable_encoder walk
+router = APIRouter(prefix="/engine", tags=["TradePilot Engine"], default_response_class=NumpyJSONResponse)
 
-# Initialize engine
-engine = TradePilotEngine()
+# Initialize engine with the same ENGINE_TAIL_ONLY setting as the pool workers
+engine = TradePilotEngine(tail_only=ENGINE_TAIL_ONLY, max_streams=ENGINE_MAX_STREAMS)
+
+# Concurrent identical requests share one fetch and one engine run
+inflight = SingleFlight()
+
+# One polling task per streamed symbol/timeframe, shared by all /sse clients
+scheduler = SignalScheduler(engine)
+
+# Batch analysis limits
+BATCH_MAX_SYMBOLS = int(os.getenv("BATCH_MAX_SYMBOLS", "500"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "10"))
+
+# Most candles /engine/analyze fetches to cover its mtf timeframes
+MTF_MAX_LIMIT = int(os.getenv("MTF_MAX_LIMIT", "50000"))
+
+
+class BatchAnalyzeRequest(BaseModel):
+    symbols: List[str] = Field(..., description="Stock symbols (e.g., AAPL, MSFT)")
+    tf: str = Field("day", description="Timeframe (day, hour, minute)")
+    limit: int = Field(730, description="Number of candles to fetch per symbol")
+    layers: Optional[List[str]] = Field(None, description="Layer names to return (add overall_signal for the combined signal)")
+    bypass_cache: bool = Field(False, description="Skip the candle cache and refetch from Polygon")
 
 @router.get("/analyze")
 async def analyze_symbol(
     symbol: str = Query(..., description="Stock symbol (e.g., AAPL)"),
     tf: str = Query("day", description="Timeframe (day, hour, minute)"),
-    limit: int = Query(730, description="Number of candles to fetch")
+    limit: int = Query(730, description="Number of candles to fetch"),
+    bypass_cache: bool = Query(False, description="Skip the candle cache and refetch from Polygon"),
+    layers: Optional[str] = Query(None, description="Comma-separated layer names to return (add overall_signal for the combined signal)"),
+    mtf: Optional[str] = Query(None, description="Comma-separated coarser timeframes for Layer 9 to confirm against (e.g. day,week), resampled from the tf bars")
 ):
     """
     Run complete 10-layer analysis on a symbol
     
-    Returns comprehensive analysis from all layers
+    Returns comprehensive analysis from all layers, or only the layers
+    named in `layers` (their dependencies are computed but not returned).
+    With `mtf`, the candles are fetched once at `tf` and aggregated into each
+    coarser timeframe for Layer 9's multi-timeframe confirmation; `limit` is
+    raised to cover 200 bars of the coarsest one, and the route responds
+    with HTTP 400 when that exceeds MTF_MAX_LIMIT candles.
     """
+    layer_list = None
+    if layers:
+        layer_list = [name.strip() for name in layers.split(",") if name.strip()]
+        try:
+            engine.resolve_layers(layer_list)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    timeframes = None
+    if mtf:
+        try:
+            timeframes = engine.resolve_timeframes(tf, [name.strip() for name in mtf.split(",") if name.strip()])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        required = engine.required_bars(tf, timeframes)
+        if required > MTF_MAX_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"mtf={','.join(timeframes)} needs at least {required} {tf} candles "
+                       f"(MTF_MAX_LIMIT is {MTF_MAX_LIMIT}); use a coarser tf",
+            )
+        limit = max(limit, required)
+    
     try:
-        # Fetch candles from Polygon
-        candles_data = get_candles(symbol.upper(), tf=tf, limit=limit)
-        
-        if not candles_data or "results" not in candles_data:
-            raise HTTPException(status_code=400, detail="Unable to fetch candle data")
-        
-        if len(candles_data["results"]) == 0:
-            raise HTTPException(status_code=400, detail="No candle data available")
-        
-        # Run analysis
-        results = engine.analyze(candles_data, symbol.upper(), tf)
+        symbol = symbol.upper()
+
+        async def run():
+            # Fetch candles from Polygon
+            candles_data = await get_candles_cached(symbol, tf=tf, limit=limit, bypass_cache=bypass_cache)
+
+            if not candles_data or ("results" not in candles_data and "columns" not in candles_data):
+                raise HTTPException(status_code=400, detail="Unable to fetch candle data")
+
+            if DataProcessor.bar_count(candles_data) == 0:
+                raise HTTPException(status_code=400, detail="No candle data available")
+
+            # Run analysis off the event loop
+            return await run_in_threadpool(engine.analyze, candles_data, symbol, tf, layer_list,
+                                           confirmation_timeframes=timeframes)
+
+        layer_key = tuple(layer_list) if layer_list is not None else None
+        mtf_key = tuple(timeframes) if timeframes else None
+        results = await inflight.do(("analyze", symbol, tf, limit, bypass_cache, layer_key, mtf_key), run)
         
         if "error" in results:
             raise HTTPException(status_code=400, detail=results["error"])
         
-        return results
+        return NumpyJSONResponse(results)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+@router.post("/batch-analyze")
+async def batch_analyze(request: BatchAnalyzeRequest):
+    """
+    Run the analysis on many symbols in one request
+    
+    Candles are fetched concurrently (at most BATCH_FETCH_CONCURRENCY at a
+    time) and the engine runs in a process pool across all cores. A symbol
+    that fails gets an "error" entry; the rest of the batch is unaffected.
+    """
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in request.symbols if symbol.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(symbols) > BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_SYMBOLS} symbols per batch")
+    if request.layers is not None:
+        try:
+            engine.resolve_layers(request.layers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+    
+    async def analyze_one(symbol: str) -> dict:
+        try:
+            async with fetch_slots:
+                candles_data = await get_candles_cached(
+                    symbol, tf=request.tf, limit=request.limit, bypass_cache=request.bypass_cache
+                )
+            
+            if DataProcessor.bar_count(candles_data) == 0:
+                return {"error": "Unable to fetch candle data"}
+            
+            return await analyze_in_pool(candles_data, symbol, request.tf, request.layers)
+        except Exception as e:
+            return {"error": f"Analysis failed: {str(e)}"}
+    
+    results = await asyncio.gather(*(analyze_one(symbol) for symbol in symbols))
+    failed = sum(1 for result in results if "error" in result)
+    
+    return NumpyJSONResponse({
+        "timeframe": request.tf,
+        "limit": request.limit,
+        "symbols": len(symbols),
+        "succeeded": len(symbols) - failed,
+        "failed": failed,
+        "results": dict(zip(symbols, results))
+    })
+
+
 @router.get("/signal-summary")
 async def get_signal_summary(
     symbol: str = Query(..., description="Stock symbol (e.g., AAPL)"),
     tf: str = Query("day", description="Timeframe"),
-    limit: int = Query(730, description="Number of candles")
+    limit: int = Query(730, description="Number of candles"),
+    bypass_cache: bool = Query(False, description="Skip the candle cache and refetch from Polygon")
 ):
     """
     Get condensed signal summary for quick decision making
@@ -60,30 +181,81 @@ async def get_signal_summary(
     Returns key metrics and overall recommendation
     """
     try:
-        # Fetch candles
-        candles_data = get_candles(symbol.upper(), tf=tf, limit=limit)
-        
-        if not candles_data or "results" not in candles_data:
-            raise HTTPException(status_code=400, detail="Unable to fetch candle data")
-        
-        # Get summary
-        summary = engine.get_signal_summary(candles_data, symbol.upper())
+        symbol = symbol.upper()
+
+        async def run():
+            # Fetch candles
+            candles_data = await get_candles_cached(symbol, tf=tf, limit=limit, bypass_cache=bypass_cache)
+
+            if not candles_data or ("results" not in candles_data and "columns" not in candles_data):
+                raise HTTPException(status_code=400, detail="Unable to fetch candle data")
+
+            # Get summary
+            return await run_in_threadpool(engine.get_signal_summary, candles_data, symbol)
+
+        summary = await inflight.do(("summary", symbol, tf, limit, bypass_cache), run)
         
         if "error" in summary:
             raise HTTPException(status_code=400, detail=summary["error"])
         
-        return summary
+        return NumpyJSONResponse(summary)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Summary failed: {str(e)}")
 
 
+@router.get("/signal-history")
+async def get_signal_history(
+    symbol: str = Query(..., description="Stock symbol (e.g., AAPL)"),
+    tf: str = Query("day", description="Timeframe (day, hour, minute)"),
+    bars: int = Query(100, ge=1, description="Number of latest bars to return"),
+    limit: int = Query(730, description="Number of candles to fetch (history before the returned bars warms the indicators)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: every layer's score and signal and the overall signal)"),
+    bypass_cache: bool = Query(False, description="Skip the candle cache and refetch from Polygon")
+):
+    """
+    Per-bar time series of each layer's score and signal
+    
+    Computed over the whole series in one vectorized pass (not one analysis
+    per bar) and returned column-wise: {"columns": {"t": [...], field: [...]}}
+    """
+    field_list = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    
+    try:
+        symbol = symbol.upper()
+
+        async def run():
+            candles_data = await get_candles_cached(symbol, tf=tf, limit=limit, bypass_cache=bypass_cache)
+
+            if not candles_data or ("results" not in candles_data and "columns" not in candles_data):
+                raise HTTPException(status_code=400, detail="Unable to fetch candle data")
+
+            try:
+                return await run_in_threadpool(engine.signal_history, candles_data, symbol, tf, bars, field_list)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        field_key = tuple(field_list) if field_list is not None else None
+        history = await inflight.do(("history", symbol, tf, bars, limit, bypass_cache, field_key), run)
+        
+        if "error" in history:
+            raise HTTPException(status_code=400, detail=history["error"])
+        
+        return NumpyJSONResponse(history)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Signal history failed: {str(e)}")
+
+
 @router.get("/layer/{layer_name}")
 async def get_layer_analysis(
     layer_name: str,
     symbol: str = Query(..., description="Stock symbol"),
     tf: str = Query("day", description="Timeframe"),
-    limit: int = Query(730, description="Number of candles")
+    limit: int = Query(730, description="Number of candles"),
+    bypass_cache: bool = Query(False, description="Skip the candle cache and refetch from Polygon")
 ):
     """
     Get analysis from a specific layer only
@@ -108,14 +280,19 @@ async def get_layer_analysis(
                 detail=f"Invalid layer name. Available: {list(engine.layers.keys())}"
             )
         
-        # Fetch candles
-        candles_data = get_candles(symbol.upper(), tf=tf, limit=limit)
-        
-        if not candles_data or "results" not in candles_data:
-            raise HTTPException(status_code=400, detail="Unable to fetch candle data")
-        
-        # Run full analysis to get the layer result
-        full_results = engine.analyze(candles_data, symbol.upper(), tf)
+        symbol = symbol.upper()
+
+        async def run():
+            # Fetch candles
+            candles_data = await get_candles_cached(symbol, tf=tf, limit=limit, bypass_cache=bypass_cache)
+
+            if not candles_data or ("results" not in candles_data and "columns" not in candles_data):
+                raise HTTPException(status_code=400, detail="Unable to fetch candle data")
+
+            # Run only this layer and its dependencies
+            return await run_in_threadpool(engine.analyze, candles_data, symbol, tf, [layer_name])
+
+        full_results = await inflight.do(("analyze", symbol, tf, limit, bypass_cache, (layer_name,), None), run)
         
         if "error" in full_results:
             raise HTTPException(status_code=400, detail=full_results["error"])
@@ -123,12 +300,12 @@ async def get_layer_analysis(
         # Return specific layer
         layer_result = full_results["layers"].get(layer_name, {})
         
-        return {
-            "symbol": symbol.upper(),
+        return NumpyJSONResponse({
+            "symbol": symbol,
             "timeframe": tf,
             "layer": layer_name,
             "result": layer_result
-        }
+        })
         
     except HTTPException:
         raise
@@ -145,7 +322,13 @@ async def engine_health():
         "status": "healthy",
         "engine": "TradePilot v2.0",
         "layers": len(engine.layers),
-        "available_layers": list(engine.layers.keys())
+        "available_layers": list(engine.layers.keys()),
+        "candle_cache": candle_cache.stats(),
+        "indicator_cache": engine.indicator_stats,
+        "in_flight": inflight.stats(),
+        "signal_stream": scheduler.stats(),
+        "engine_streams": engine.stream_stats(),
+        "market_feed": feed.stats() if feed is not None else None
     }
 
 
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Feed Replay - Local stand-in for Polygon's aggregates websocket
+
+Serves recorded bars over the same protocol the market feed speaks
+(status/auth/subscribe messages, then batches of AM/A aggregate events), so
+the feed can be developed and load-tested without a Polygon connection.
+
+Recordings can be:
+    *.jsonl  raw websocket messages, one per line (as written by FEED_RECORD_FILE)
+    *.json   a Polygon aggregates response, e.g. saved from /candles; its bars
+             are sent as --channel events for the response's ticker
+
+Events are replayed in bar-time order, --speed times faster than real time
+(0 sends as fast as the client reads). Any API key is accepted.
+
+Usage:
+    python feed_replay.py recordings/AAPL.json recordings/session.jsonl [--port 8765] [--speed 60] [--loop]
+    POLYGON_WS_URL=ws://localhost:8765 FEED_SYMBOLS=AAPL FEED_WARM=false uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+from itertools import groupby
+from typing import Dict, List
+
+try:
+    import websockets
+except ImportError:  # installed with uvicorn[standard]
+    websockets = None
+
+
+def load_events(paths: List[str], channel: str = "AM") -> List[Dict]:
+    """All aggregate events of the recordings, ordered by bar start time"""
+    events = []
+    for path in paths:
+        with open(path) as f:
+            if path.endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        events += [event for event in json.loads(line) if "sym" in event]
+                continue
+            body = json.load(f)
+        for bar in body.get("results") or []:
+            event = {"ev": channel, "sym": body["ticker"], "s": bar["t"],
+                     "o": bar["o"], "h": bar["h"], "l": bar["l"], "c": bar["c"], "v": bar["v"]}
+            if "vw" in bar:
+                event["vw"] = bar["vw"]
+            if bar.get("n"):
+                event["z"] = bar["v"] / bar["n"]
+            events.append(event)
+    events.sort(key=lambda event: event["s"])
+    return events
+
+
+def _status(status: str, message: str) -> str:
+    return json.dumps([{"ev": "status", "status": status, "message": message}])
+
+
+def _matches(event: Dict, subscriptions: set) -> bool:
+    return (f"{event['ev']}.{event['sym']}" in subscriptions
+            or f"{event['ev']}.*" in subscriptions)
+
+
+class ReplayServer:
+    """Replays one event list to every client that subscribes"""
+
+    def __init__(self, events: List[Dict], speed: float = 60.0, loop: bool = False):
+        self.events = events
+        self.speed = speed
+        self.loop = loop
+        self.clients = 0
+
+    async def _send_events(self, ws, subscriptions: set):
+        while True:
+            previous = None
+            for start, batch in groupby(self.events, key=lambda event: event["s"]):
+                if previous is not None and self.speed > 0:
+                    await asyncio.sleep((start - previous) / 1000 / self.speed)
+                previous = start
+                batch = [event for event in batch if _matches(event, subscriptions)]
+                if batch:
+                    await ws.send(json.dumps(batch))
+            if not self.loop:
+                return
+
+    async def handler(self, ws, path: str = "/"):
+        self.clients += 1
+        subscriptions = set()
+        sender = None
+        try:
+            await ws.send(_status("connected", "Connected Successfully"))
+            async for message in ws:
+                request = json.loads(message)
+                action, params = request.get("action"), request.get("params", "")
+                if action == "auth":
+                    await ws.send(_status("auth_success", "authenticated"))
+                elif action == "subscribe":
+                    subscriptions.update(param.strip() for param in params.split(",") if param.strip())
+                    await ws.send(_status("success", f"subscribed to: {params}"))
+                    if sender is None:
+                        sender = asyncio.create_task(self._send_events(ws, subscriptions))
+                elif action == "unsubscribe":
+                    subscriptions.difference_update(param.strip() for param in params.split(","))
+                    await ws.send(_status("success", f"unsubscribed to: {params}"))
+        finally:
+            if sender is not None:
+                sender.cancel()
+            self.clients -= 1
+
+
+async def serve(events: List[Dict], host: str, port: int, speed: float, loop: bool):
+    server = ReplayServer(events, speed, loop)
+    async with websockets.serve(server.handler, host, port, max_size=None):
+        print(f"Replaying {len(events)} events on ws://{host}:{port} (speed {speed or 'max'})")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded bars over Polygon's websocket protocol")
+    parser.add_argument("files", nargs="+", help=".jsonl recordings or .json aggregates responses")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=60.0, help="replay speed-up (0 = as fast as possible)")
+    parser.add_argument("--channel", default="AM", choices=["AM", "A"], help="channel for .json bar files")
+    parser.add_argument("--loop", action="store_true", help="start over when the recording ends")
+
+    args = parser.parse_args()
+    if websockets is None:
+        parser.error("the replay server needs the websockets package (pip install websockets)")
+    asyncio.run(serve(load_events(args.files, args.channel), args.host, args.port, args.speed, args.loop))
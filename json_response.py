@@ -0,0 +1,56 @@
+"""
+JSON Response - Single-pass JSON rendering for API responses
+
+Engine results are plain dicts of native types (plus the odd NumPy value
+or array), so they are rendered straight to bytes with orjson: NumPy
+scalars and arrays are serialized natively and NaN/Inf become null. Routes
+return the response object directly, which also skips FastAPI's
+jsonable_encoder pass. Without orjson it falls back to clean_for_json and
+the standard library encoder.
+"""
+import json
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from tradepilot_engine.json_utils import clean_for_json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Types orjson doesn't serialize on its own"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()  # non-contiguous arrays and views
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, pd.Timestamp):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes (NumPy-aware, NaN/Inf -> null)"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        clean_for_json(content), default=_default, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class NumpyJSONResponse(JSONResponse):
+    """JSONResponse rendered in one pass with dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
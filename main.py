@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from polygon_client import (
@@ -16,19 +16,28 @@ from polygon_client import (
     get_option_previous_day_bar,
     get_option_contract_snapshot,
     get_option_chain_snapshot,
+    close_client,
 )
 from fastapi.openapi.utils import get_openapi
-from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
 import numpy as np
 
 # Import TradePilot Engine Router
-from engine_router import router as engine_router
+from engine_router import router as engine_router, scheduler
+from engine_pool import close_pool
+from signal_stream import event_stream
+from market_feed import feed
+from option_chain import get_chain_cached, filter_chain, chain_response
+from option_analytics import OPTIONS_RISK_FREE_RATE, chain_analytics
+from option_index import ContractIndex, expiry_window, get_listing_indexed, parse_expirations
+from json_response import NumpyJSONResponse
 
 app = FastAPI(
     title="TradePilot MCP Server",
     description="Multi-layer trading intelligence engine powered by Polygon.io",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=NumpyJSONResponse
 )
 
 # Add CORS middleware
@@ -43,6 +52,19 @@ app.add_middleware(
 # Include TradePilot Engine routes
 app.include_router(engine_router)
 
+@app.on_event("startup")
+async def startup():
+    if feed is not None:
+        feed.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if feed is not None:
+        await feed.close()
+    await scheduler.close()
+    await close_client()
+    close_pool()
+
 # ---------------- Root ----------------
 @app.get("/")
 def root():
@@ -56,136 +78,188 @@ def root():
 
 # ---------------- Core endpoints ----------------
 @app.get("/symbol-lookup")
-def symbol_lookup(query: str):
-    return get_symbol_lookup(query)
+async def symbol_lookup(query: str):
+    return await get_symbol_lookup(query)
 
 @app.get("/candles")
-def candles(symbol: str, tf: str = "day", limit: int = 730):
-    """Fetch up to 2 years of OHLCV candles (default 730 daily bars)."""
-    return get_candles(symbol.upper(), tf=tf, limit=limit)
+async def candles(symbol: str, tf: str = "day", limit: int = 730):
+    """Fetch the latest `limit` OHLCV candles (default 730 bars)."""
+    return await get_candles(symbol.upper(), tf=tf, limit=limit)
 
 @app.get("/news")
-def news(symbol: str):
-    return get_news(symbol.upper())
+async def news(symbol: str):
+    return await get_news(symbol.upper())
 
 @app.get("/last-trade")
-def last_trade(symbol: str):
-    return get_last_trade(symbol.upper())
+async def last_trade(symbol: str):
+    return await get_last_trade(symbol.upper())
 
 @app.get("/ticker-details")
-def ticker_details(symbol: str):
-    return get_ticker_details(symbol.upper())
+async def ticker_details(symbol: str):
+    return await get_ticker_details(symbol.upper())
 
 @app.get("/fundamentals")
-def fundamentals(symbol: str):
-    return get_fundamentals(symbol.upper())
+async def fundamentals(symbol: str):
+    return await get_fundamentals(symbol.upper())
 
 # ---------------- Stock endpoints ----------------
 @app.get("/previous-day-bar/{ticker}")
-def previous_day_bar(ticker: str):
-    return get_previous_day_bar(ticker.upper())
+async def previous_day_bar(ticker: str):
+    return await get_previous_day_bar(ticker.upper())
 
 @app.get("/stock-snapshot/{ticker}")
-def stock_snapshot(ticker: str):
-    return get_single_stock_snapshot(ticker.upper())
+async def stock_snapshot(ticker: str):
+    return await get_single_stock_snapshot(ticker.upper())
 
 # ---------------- Options endpoints with expiry filtering ----------------
-def filter_by_expiry(results: list, expiry_bucket: str | None = None):
-    """Filter options contracts between today and +2 years. Optionally narrow by bucket."""
-    today = datetime.utcnow().date()
-    max_date = today + timedelta(days=730)
-
-    filtered = []
-    for c in results:
-        expiry = c.get("expiration_date")
-        if not expiry:
-            continue
-        try:
-            expiry_date = datetime.strptime(expiry, "%Y-%m-%d").date()
-        except Exception:
-            continue
-        if today <= expiry_date <= max_date:
-            filtered.append(c)
-
-    if expiry_bucket:
-        bucket_days = {
-            "otd": 0,
-            "7d": 7,
-            "30d": 30,
-            "90d": 90,
-            "365d": 365,
-            "730d": 730,
-        }
-        if expiry_bucket in bucket_days:
-            cutoff = today + timedelta(days=bucket_days[expiry_bucket])
-            filtered = [
-                c for c in filtered
-                if datetime.strptime(c["expiration_date"], "%Y-%m-%d").date() <= cutoff
-            ]
-
-    return filtered
-
 @app.get("/options")
-def options(symbol: str,
-            type: str = "call",
-            days_out: int = 30,
-            expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"])):
-    chain = get_options_chain(symbol.upper(), option_type=type.lower(), days_out=days_out)
-    if "results" in chain:
-        chain["results"] = filter_by_expiry(chain["results"], expiry_bucket)
-    return chain
+async def options(symbol: str,
+                  type: str = "call",
+                  days_out: int = 30,
+                  expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"]),
+                  strike_min: float | None = None,
+                  strike_max: float | None = None):
+    """Option contracts by type and expiry window (listing cached with its expiry index)."""
+    symbol, type = symbol.upper(), type.lower()
+    chain, index = await get_listing_indexed(
+        ("options", symbol, type, days_out),
+        lambda: get_options_chain(symbol, option_type=type, days_out=days_out),
+    )
+    if index is None:
+        return chain
+    return {**chain, "results": index.select(expiry_bucket, strike_min, strike_max)}
 
 @app.get("/all-option-contracts")
-def all_option_contracts(underlying_ticker: str,
-                         expiration_date: str | None = None,
-                         limit: int = 50,
-                         expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"])):
-    """Fetch all option contracts for a given stock, with expiry filtering."""
-    contracts = get_all_option_contracts(underlying_ticker.upper(), expiration_date, limit)
-    if "results" in contracts:
-        contracts["results"] = filter_by_expiry(contracts["results"], expiry_bucket)
-    return contracts
+async def all_option_contracts(underlying_ticker: str,
+                               expiration_date: str | None = None,
+                               limit: int = 50,
+                               expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"]),
+                               strike_min: float | None = None,
+                               strike_max: float | None = None):
+    """Fetch all option contracts for a given stock, with expiry and strike filtering."""
+    underlying_ticker = underlying_ticker.upper()
+    contracts, index = await get_listing_indexed(
+        ("contracts", underlying_ticker, expiration_date, limit),
+        lambda: get_all_option_contracts(underlying_ticker, expiration_date, limit),
+    )
+    if index is None:
+        return contracts
+    return {**contracts, "results": index.select(expiry_bucket, strike_min, strike_max)}
 
 @app.get("/option-aggregates/{options_ticker}")
-def option_aggregates(options_ticker: str, multiplier: int, timespan: str, from_date: str, to_date: str):
-    return get_option_aggregates(options_ticker.upper(), multiplier, timespan, from_date, to_date)
+async def option_aggregates(options_ticker: str, multiplier: int, timespan: str, from_date: str, to_date: str):
+    return await get_option_aggregates(options_ticker.upper(), multiplier, timespan, from_date, to_date)
 
 @app.get("/option-previous-day-bar/{options_ticker}")
-def option_previous_day_bar(options_ticker: str):
-    return get_option_previous_day_bar(options_ticker.upper())
+async def option_previous_day_bar(options_ticker: str):
+    return await get_option_previous_day_bar(options_ticker.upper())
 
 @app.get("/option-contract-snapshot/{underlying}/{contract}")
-def option_contract_snapshot_route(underlying: str, contract: str):
+async def option_contract_snapshot_route(underlying: str, contract: str):
     """Snapshot for a single option contract (requires both underlying + contract)."""
-    result = get_option_contract_snapshot(underlying.upper(), contract.upper())
+    result = await get_option_contract_snapshot(underlying.upper(), contract.upper())
     if "error" in result:
         return JSONResponse(status_code=400, content=result)
 
     expiry = result.get("results", {}).get("expiration_date")
     if expiry:
-        expiry_date = datetime.strptime(expiry, "%Y-%m-%d").date()
-        today = datetime.utcnow().date()
-        if expiry_date < today or expiry_date > today + timedelta(days=730):
+        start, end = expiry_window()
+        if not start <= parse_expirations([expiry])[0] <= end:
             return JSONResponse(status_code=400, content={"error": "Expired or too far contract"})
     return result
 
 @app.get("/option-chain-snapshot/{underlying_asset}")
-def option_chain_snapshot_route(underlying_asset: str,
-                                expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"]),
-                                cursor: str | None = None,
-                                limit: int = 50):
-    """Snapshot of full option chain for a stock (supports pagination)."""
-    chain = get_option_chain_snapshot(underlying_asset.upper(), cursor=cursor, limit=limit)
+async def option_chain_snapshot_route(underlying_asset: str,
+                                      expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"]),
+                                      cursor: str | None = None,
+                                      limit: int = 50,
+                                      full: bool = False,
+                                      type: str | None = Query(None, enum=["call", "put"]),
+                                      strike_min: float | None = None,
+                                      strike_max: float | None = None,
+                                      delta_min: float | None = Query(None, ge=0, le=1),
+                                      delta_max: float | None = Query(None, ge=0, le=1),
+                                      bypass_cache: bool = False):
+    """
+    Snapshot of full option chain for a stock (supports pagination).
+
+    With full=true the whole chain is fetched server-side (pages followed
+    concurrently, cached for OPTION_CHAIN_TTL seconds) and returned as
+    columns, filtered by type, expiry bucket, strike band and |delta| band.
+    """
+    if full:
+        chain = await get_chain_cached(underlying_asset.upper(), bypass_cache)
+        if "error" in chain:
+            return JSONResponse(status_code=502, content=chain)
+        columns = filter_chain(chain, type, expiry_bucket, strike_min, strike_max, delta_min, delta_max)
+        return NumpyJSONResponse(chain_response(chain, columns))
+
+    chain = await get_option_chain_snapshot(underlying_asset.upper(), cursor=cursor, limit=limit)
+    # Snapshot rows keep the expiration under "details" (the old top-level lookup dropped every row)
     if "results" in chain:
-        chain["results"] = filter_by_expiry(chain["results"], expiry_bucket)
+        chain["results"] = ContractIndex(chain["results"]).select(expiry_bucket, strike_min, strike_max)
     return chain
 
+@app.get("/options/analytics/{underlying}")
+async def options_analytics(underlying: str,
+                            type: str | None = Query(None, enum=["call", "put"]),
+                            expiry_bucket: str | None = Query(None, enum=["otd","7d","30d","90d","365d","730d"]),
+                            strike_min: float | None = None,
+                            strike_max: float | None = None,
+                            rate: float = OPTIONS_RISK_FREE_RATE,
+                            dividend_yield: float = 0.0,
+                            bypass_cache: bool = False):
+    """
+    Implied volatility and Black-Scholes greeks for a whole option chain.
+
+    Uses the cached full chain (see full=true on /option-chain-snapshot):
+    IV is solved from each contract's bid/ask midpoint (or day close) against
+    the underlying price in the snapshot, or the last trade when the
+    snapshot carries none. Theta is per day, vega and rho per 1 point.
+    """
+    underlying = underlying.upper()
+    chain = await get_chain_cached(underlying, bypass_cache)
+    if "error" in chain:
+        return JSONResponse(status_code=502, content=chain)
+
+    price = chain["underlying_price"]
+    if price is None:
+        trade = await get_last_trade(underlying)
+        price = (trade.get("results") or {}).get("p")
+        if price is None:
+            return JSONResponse(status_code=502, content={"error": "Unable to fetch the underlying price"})
+
+    columns = filter_chain(chain, type, expiry_bucket, strike_min, strike_max)
+    analytics = await run_in_threadpool(chain_analytics, columns, price, rate, dividend_yield)
+    return NumpyJSONResponse({
+        **chain_response({**chain, "underlying_price": price}, analytics),
+        "rate": rate,
+        "dividend_yield": dividend_yield,
+    })
+
 # ---------------- SSE ----------------
 @app.get("/sse")
-async def sse():
-    async def event_generator():
-        yield "data: TradePilot MCP Server connected\n\n"
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+async def sse(request: Request, symbols: str | None = None, tf: str = "minute"):
+    """
+    Server-sent signal events for comma-separated `symbols` (e.g. AAPL,MSFT:hour).
+
+    Sends a snapshot per symbol, then a signal event whenever a bar closes and
+    the overall or any layer signal changes; heartbeats keep idle streams open.
+    """
+    topics = []
+    for item in (symbols or "").split(","):
+        if item.strip():
+            symbol, _, timeframe = item.strip().partition(":")
+            topics.append((symbol.upper(), timeframe or tf))
+    try:
+        subscription = scheduler.subscribe(topics)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return StreamingResponse(
+        event_stream(scheduler, subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ---------------- OpenAPI ----------------
 @app.get("/openapi.json", include_in_schema=False)
@@ -0,0 +1,213 @@
+"""
+Market Calendar - US equity sessions and bar-count range planning
+
+Knows NYSE weekends, full-day holidays, early closes and session hours
+(regular 09:30-16:00, extended 04:00-20:00 New York time). plan_range()
+turns "the latest N bars of timeframe tf" into the shortest date span that
+holds them, so candle fetches download only the bars that are needed.
+"""
+import math
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+REGULAR_OPEN = dtime(9, 30)
+REGULAR_CLOSE = dtime(16, 0)
+EARLY_CLOSE = dtime(13, 0)
+EXTENDED_OPEN = dtime(4, 0)
+EXTENDED_CLOSE = dtime(20, 0)
+
+# Intraday bar length in seconds (Polygon aligns bars to these boundaries)
+INTRADAY_SECONDS = {"second": 1, "minute": 60, "hour": 3600}
+
+# Upper bound on a bar's length per timeframe; a bar is final once t + length has passed
+BAR_SECONDS = {
+    **INTRADAY_SECONDS,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 31 * 86400,
+    "quarter": 92 * 86400,
+    "year": 366 * 86400,
+}
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th weekday (Mon=0) of a month; n=-1 is the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> frozenset:
+    """NYSE full-day closures in a year"""
+    days = {
+        _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),    # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),   # Memorial Day
+        _observed(date(year, 7, 4)),    # Independence Day
+        _nth_weekday(year, 9, 0, 1),    # Labor Day
+        _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+        _observed(date(year, 12, 25)),  # Christmas
+    }
+    # New Year's Day falling on a Saturday is not observed on the prior Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days)
+
+
+@lru_cache(maxsize=None)
+def early_closes(year: int) -> frozenset:
+    """Days the regular session ends at 13:00"""
+    days = {
+        date(year, 7, 3),                                   # Independence Day eve
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),   # Day after Thanksgiving
+        date(year, 12, 24),                                 # Christmas Eve
+    }
+    return frozenset(day for day in days if is_trading_day(day))
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def session_bounds(day: date, extended: bool = False) -> Tuple[datetime, datetime]:
+    """Open and close of a trading day's session, in New York time"""
+    close = EARLY_CLOSE if day in early_closes(day.year) else REGULAR_CLOSE
+    if extended:
+        close = dtime(17, 0) if close == EARLY_CLOSE else EXTENDED_CLOSE
+    start = EXTENDED_OPEN if extended else REGULAR_OPEN
+    return (
+        datetime.combine(day, start, tzinfo=MARKET_TZ),
+        datetime.combine(day, close, tzinfo=MARKET_TZ),
+    )
+
+
+def next_session_close(now: float) -> float:
+    """Epoch seconds of the next regular-session close after `now`"""
+    day = datetime.fromtimestamp(now, MARKET_TZ).date()
+    while True:
+        if is_trading_day(day):
+            close = session_bounds(day)[1].timestamp()
+            if close > now:
+                return close
+        day += timedelta(days=1)
+
+
+def bar_close_time(tf: str, t_ms: int) -> float:
+    """Epoch seconds when the bar of tf starting at t_ms (Polygon timestamp) is final"""
+    start = t_ms / 1000
+    if tf == "day":
+        return next_session_close(start)
+    return start + BAR_SECONDS[tf]
+
+
+def next_bar_close(tf: str, now: float) -> float:
+    """
+    Epoch seconds when the next bar of tf closes
+
+    Intraday bars only close within a trading day's extended session, so
+    nights, weekends and holidays are skipped; longer bars are checked at
+    each regular-session close.
+    """
+    if tf not in INTRADAY_SECONDS:
+        return next_session_close(now)
+    seconds = INTRADAY_SECONDS[tf]
+    close = (now // seconds + 1) * seconds
+    day = datetime.fromtimestamp(close, MARKET_TZ).date()
+    while True:
+        if is_trading_day(day):
+            open_, end = (bound.timestamp() for bound in session_bounds(day, extended=True))
+            if close <= end:
+                return max(close, open_ + seconds)
+        day += timedelta(days=1)
+        close = 0
+
+
+def _bars_in_session(day: date, seconds: int, extended: bool, now: datetime) -> int:
+    """Clock-aligned bars of `seconds` length that start within the day's session, up to now"""
+    open_, close = session_bounds(day, extended)
+    close = min(close, now)
+    if close <= open_:
+        return 0
+    midnight = datetime.combine(day, dtime(0), tzinfo=MARKET_TZ)
+    first = int((open_ - midnight).total_seconds()) // seconds
+    last = (math.ceil((close - midnight).total_seconds()) - 1) // seconds
+    return last - first + 1
+
+
+def plan_range(tf: str, bars: int, multiplier: int = 1, now: Optional[datetime] = None,
+               extended: bool = False) -> Tuple[date, date]:
+    """
+    Shortest (start_date, end_date) span holding the latest `bars` bars
+
+    Intraday timeframes count clock-aligned bars within each trading day's
+    session (regular hours unless extended=True, early closes included,
+    today only up to now). Daily bars count trading days; week, month,
+    quarter and year bars count calendar periods.
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    end = now.date()
+    bars = max(bars, 1)
+
+    if tf in INTRADAY_SECONDS:
+        seconds = INTRADAY_SECONDS[tf] * multiplier
+        day, count = end, 0
+        while True:
+            if is_trading_day(day):
+                count += _bars_in_session(day, seconds, extended, now)
+                if count >= bars:
+                    return day, end
+            day -= timedelta(days=1)
+
+    if tf == "day":
+        day, count = end, 0
+        while True:
+            # Today's bar only exists once its session has opened
+            if is_trading_day(day) and (day < end or now >= session_bounds(day, extended)[0]):
+                count += 1
+                if count >= bars * multiplier:
+                    return day, end
+            day -= timedelta(days=1)
+
+    periods = (bars - 1) * multiplier
+    if tf == "week":
+        return end - timedelta(days=end.weekday() + 7 * periods), end
+    months = {"month": 1, "quarter": 3, "year": 12}.get(tf)
+    if months is None:
+        raise ValueError(f"Unknown timeframe: {tf}")
+    first_month = (end.year * 12 + end.month - 1) // months * months - periods * months
+    return date(first_month // 12, first_month % 12 + 1, 1), end
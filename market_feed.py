@@ -0,0 +1,298 @@
+"""
+Market Feed - Live Polygon aggregates over websocket into in-memory bars
+
+Subscribes to Polygon's per-minute (AM) and/or per-second (A) aggregate
+channels for FEED_SYMBOLS and keeps the latest FEED_BUFFER_BARS closed bars
+of each (symbol, timeframe) in memory. get_candles_cached() serves requests
+from these buffers when they hold enough bars, so /engine/analyze needs no
+upstream call for fed symbols, and the /sse scheduler pushes the fed bars
+into the engine's streams.
+
+Each buffer is a fixed-capacity BarRingBuffer, so memory stays constant
+per symbol; FEED_SNAPSHOT_DIR saves them on shutdown and restores them on
+startup. Buffers are warmed from REST on every (re)connect, which also
+fills bars missed while disconnected (only the gap after a restore).
+
+POLYGON_WS_URL can point at feed_replay.py to develop and load-test
+offline (set FEED_WARM=false); FEED_RECORD_FILE records the raw messages
+in the replay format.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from market_calendar import BAR_SECONDS, bar_close_time
+from polygon_client import API_KEY, get_candles
+from tradepilot_engine import BarRingBuffer
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional: pip install orjson
+    _loads = json.loads
+
+try:
+    import websockets
+except ImportError:  # installed with uvicorn[standard]
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+POLYGON_WS_URL = os.getenv("POLYGON_WS_URL", "wss://socket.polygon.io/stocks")
+FEED_SYMBOLS = [symbol.strip().upper() for symbol in os.getenv("FEED_SYMBOLS", "").split(",") if symbol.strip()]
+FEED_CHANNELS = [channel.strip() for channel in os.getenv("FEED_CHANNELS", "AM").split(",") if channel.strip()]
+FEED_BUFFER_BARS = int(os.getenv("FEED_BUFFER_BARS", "1000"))
+FEED_WARM = os.getenv("FEED_WARM", "true").lower() != "false"
+FEED_RECORD_FILE = os.getenv("FEED_RECORD_FILE", "")
+FEED_SNAPSHOT_DIR = os.getenv("FEED_SNAPSHOT_DIR", "")
+
+# Aggregate channel -> timeframe of its bars
+CHANNEL_TF = {"AM": "minute", "A": "second"}
+
+MAX_BACKOFF = 60.0
+
+BufferKey = Tuple[str, str]
+
+
+def event_to_bar(event: Dict) -> Dict:
+    """Polygon websocket aggregate event -> REST aggregate bar"""
+    bar = {
+        "t": event["s"],
+        "o": event["o"],
+        "h": event["h"],
+        "l": event["l"],
+        "c": event["c"],
+        "v": event["v"],
+    }
+    if "vw" in event:
+        bar["vw"] = event["vw"]
+    if event.get("z"):
+        bar["n"] = round(event["v"] / event["z"])  # volume / average trade size
+    return bar
+
+
+class BarBuffers:
+    """A BarRingBuffer of the latest closed bars per (symbol, timeframe)"""
+
+    def __init__(self, maxlen: int = FEED_BUFFER_BARS):
+        self.maxlen = maxlen
+        self.buffers: Dict[BufferKey, BarRingBuffer] = {}
+
+    def get(self, symbol: str, tf: str) -> BarRingBuffer:
+        buffer = self.buffers.get((symbol, tf))
+        if buffer is None:
+            buffer = self.buffers[(symbol, tf)] = BarRingBuffer(self.maxlen, symbol, tf)
+        return buffer
+
+    def append(self, symbol: str, tf: str, bar: Dict) -> bool:
+        """Add a bar; a repeated timestamp replaces the last bar, older ones are ignored"""
+        return self.get(symbol, tf).append(bar)
+
+    def last_t(self, symbol: str, tf: str) -> Optional[int]:
+        buffer = self.buffers.get((symbol, tf))
+        return buffer.last_t if buffer is not None else None
+
+    def candles(self, symbol: str, tf: str, limit: int) -> Optional[Dict]:
+        """
+        Latest `limit` bars as columnar candles, or None if fewer are buffered
+
+        The columns are copies: they are analyzed in the threadpool while the
+        event loop keeps appending, and an updated bar rewrites its slot in
+        place (at most 8 * limit floats per call).
+        """
+        buffer = self.buffers.get((symbol, tf))
+        if buffer is None or len(buffer) < limit:
+            return None
+        return buffer.to_candles(limit, copy=True)
+
+    def save(self, directory: str):
+        """Write every buffer to directory/<tf>/<SYMBOL>.npz"""
+        for (symbol, tf), buffer in self.buffers.items():
+            os.makedirs(os.path.join(directory, tf), exist_ok=True)
+            buffer.save(os.path.join(directory, tf, f"{symbol}.npz"))
+
+    def load(self, directory: str, keys: Iterable[BufferKey]) -> int:
+        """Restore the saved buffers of `keys`; returns how many were found"""
+        loaded = 0
+        for symbol, tf in keys:
+            path = os.path.join(directory, tf, f"{symbol}.npz")
+            if os.path.exists(path):
+                self.buffers[(symbol, tf)] = BarRingBuffer.load(path, self.maxlen)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> Dict:
+        memory = sum(buffer.memory_bytes() for buffer in self.buffers.values())
+        return {
+            "buffers": len(self.buffers),
+            "bars": sum(len(buffer) for buffer in self.buffers.values()),
+            "maxlen": self.maxlen,
+            "memory_bytes": memory,
+            "memory_bytes_per_buffer": memory // len(self.buffers) if self.buffers else 0,
+        }
+
+
+class MarketFeed:
+    """Websocket connection that keeps BarBuffers current"""
+
+    def __init__(self, symbols: Iterable[str], channels: Iterable[str] = ("AM",),
+                 url: str = POLYGON_WS_URL, maxlen: int = FEED_BUFFER_BARS,
+                 warm: bool = FEED_WARM, record_file: str = FEED_RECORD_FILE,
+                 snapshot_dir: str = FEED_SNAPSHOT_DIR):
+        unknown = [channel for channel in channels if channel not in CHANNEL_TF]
+        if unknown:
+            raise ValueError(f"Unsupported feed channels: {unknown} (use {list(CHANNEL_TF)})")
+        self.symbols = list(dict.fromkeys(symbols))
+        self.channels = list(channels)
+        self.url = url
+        self.warm = warm
+        self.record_file = record_file
+        self.snapshot_dir = snapshot_dir
+        self.buffers = BarBuffers(maxlen)
+        self.task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.messages = 0
+        self.bars_received = 0
+        self.reconnects = 0
+        self.last_message_at: Optional[float] = None
+
+    @property
+    def timeframes(self) -> List[str]:
+        return [CHANNEL_TF[channel] for channel in self.channels]
+
+    def covers(self, symbol: str, tf: str) -> bool:
+        return symbol in self.symbols and tf in self.timeframes
+
+    def candles(self, symbol: str, tf: str, limit: int) -> Optional[Dict]:
+        """Latest `limit` live bars, or None when the feed can't serve them"""
+        if not self.connected or not self.covers(symbol, tf):
+            return None
+        return self.buffers.candles(symbol, tf, limit)
+
+    def handle(self, events: List[Dict]):
+        """Apply one websocket message (a list of events)"""
+        self.messages += 1
+        self.last_message_at = time.time()
+        for event in events:
+            kind = event.get("ev")
+            tf = CHANNEL_TF.get(kind)
+            if tf is not None:
+                if self.buffers.append(event["sym"], tf, event_to_bar(event)):
+                    self.bars_received += 1
+            elif kind == "status":
+                logger.info("market feed: %s", event.get("message", event.get("status")))
+
+    async def _warm(self):
+        """Fill each buffer with the closed REST bars it is missing"""
+        now = time.time()
+
+        async def warm_one(symbol: str, tf: str):
+            last_t = self.buffers.last_t(symbol, tf)
+            limit = self.buffers.maxlen
+            if last_t is not None:
+                missing = int((now - last_t / 1000) // BAR_SECONDS[tf]) + 1
+                limit = min(missing, limit)
+            candles = await get_candles(symbol, tf=tf, limit=limit, columnar=True)
+            columns = candles.get("columns")
+            if columns is None:
+                return
+            # Keep the still-forming bar out; the feed sends it once it closes
+            closed = len(columns["t"])
+            while closed and bar_close_time(tf, int(columns["t"][closed - 1])) > now:
+                closed -= 1
+            self.buffers.get(symbol, tf).extend({key: values[:closed] for key, values in columns.items()})
+
+        results = await asyncio.gather(
+            *(warm_one(symbol, tf) for symbol in self.symbols for tf in self.timeframes),
+            return_exceptions=True,
+        )
+        for error in results:
+            if isinstance(error, Exception):
+                logger.warning("market feed warm-up failed: %s", error)
+
+    async def _connect(self, record):
+        """One websocket session: authenticate, subscribe, consume until closed"""
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.send(json.dumps({"action": "auth", "params": API_KEY}))
+            async for message in ws:
+                events = _loads(message)
+                statuses = {event.get("status") for event in events if event.get("ev") == "status"}
+                if "auth_failed" in statuses:
+                    raise RuntimeError(f"Polygon websocket authentication failed: {events}")
+                if "auth_success" in statuses:
+                    break
+
+            params = ",".join(f"{channel}.{symbol}" for channel in self.channels for symbol in self.symbols)
+            await ws.send(json.dumps({"action": "subscribe", "params": params}))
+            if self.warm:
+                await self._warm()
+            self.connected = True
+            async for message in ws:
+                if record is not None:
+                    record.write(message if isinstance(message, str) else message.decode())
+                    record.write("\n")
+                self.handle(_loads(message))
+
+    async def run(self):
+        """Stay connected, reconnecting with exponential backoff"""
+        if websockets is None:
+            raise RuntimeError("The market feed needs the websockets package (pip install websockets)")
+        backoff = 1.0
+        record = open(self.record_file, "a") if self.record_file else None
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    await self._connect(record)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("market feed disconnected: %s", e)
+                self.connected = False
+                self.reconnects += 1
+                if time.monotonic() - started > MAX_BACKOFF:
+                    backoff = 1.0
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+        finally:
+            self.connected = False
+            if record is not None:
+                record.close()
+
+    def start(self):
+        """Restore the last snapshot (if any) and connect in the background"""
+        if self.task is None:
+            if self.snapshot_dir:
+                keys = [(symbol, tf) for symbol in self.symbols for tf in self.timeframes]
+                loaded = self.buffers.load(self.snapshot_dir, keys)
+                logger.info("market feed: restored %d of %d buffers", loaded, len(keys))
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Stop the feed and snapshot its buffers (called on app shutdown)"""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.snapshot_dir:
+            self.buffers.save(self.snapshot_dir)
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "symbols": len(self.symbols),
+            "channels": self.channels,
+            "messages": self.messages,
+            "bars_received": self.bars_received,
+            "reconnects": self.reconnects,
+            "last_message_at": self.last_message_at,
+            **self.buffers.stats(),
+        }
+
+
+# Disabled unless FEED_SYMBOLS is set
+feed = MarketFeed(FEED_SYMBOLS, FEED_CHANNELS) if FEED_SYMBOLS else None
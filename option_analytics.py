@@ -0,0 +1,187 @@
+"""
+Option Analytics - Vectorized Black-Scholes pricing, greeks and implied vol
+
+Every function works elementwise on NumPy arrays (scalars broadcast), so a
+whole chain is priced or solved in a handful of array passes:
+
+- bs_price / bs_greeks: European Black-Scholes-Merton with a continuous
+  dividend yield q. Theta is per calendar day, vega and rho per 1 point
+  (0.01) of volatility and rate.
+- implied_volatility: batched Newton iterations safeguarded by a per-contract
+  bisection bracket. Contracts that converge drop out of the working set,
+  so late iterations only touch the few slow ones (deep in/out of the money).
+  Prices outside the no-arbitrage bounds give NaN.
+
+chain_analytics() applies them to a columnar chain from option_chain.
+"""
+import math
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from market_calendar import MARKET_TZ
+
+OPTIONS_RISK_FREE_RATE = float(os.getenv("OPTIONS_RISK_FREE_RATE", "0.04"))
+
+SIGMA_MIN = 1e-4
+SIGMA_MAX = 5.0
+IV_TOLERANCE = 1e-9         # price error, relative to the time value, that counts as solved
+IV_BRACKET_TOLERANCE = 1e-10  # ... or a bracket this narrow (prices too small to resolve further)
+IV_MAX_ITERATIONS = 100
+
+YEAR_SECONDS = 365 * 86400
+_SQRT_2PI = math.sqrt(2 * math.pi)
+
+
+def _norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def _d1_d2(S, K, T, r, q, sigma):
+    vol_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def bs_price(S, K, T, r, sigma, is_call, q=0.0) -> np.ndarray:
+    """Black-Scholes-Merton price"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+        spot = S * np.exp(-q * T)
+        strike = K * np.exp(-r * T)
+        return np.where(is_call, spot * ndtr(d1) - strike * ndtr(d2), strike * ndtr(-d2) - spot * ndtr(-d1))
+
+
+def bs_vega(S, K, T, r, sigma, q=0.0) -> np.ndarray:
+    """dPrice/dSigma per 1.00 of volatility (the Newton step's derivative)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, _ = _d1_d2(S, K, T, r, q, sigma)
+        return S * np.exp(-q * T) * _norm_pdf(d1) * np.sqrt(T)
+
+
+def bs_greeks(S, K, T, r, sigma, is_call, q=0.0) -> Dict[str, np.ndarray]:
+    """Price, delta, gamma, theta (per day), vega and rho (per 1 point)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sqrt_t = np.sqrt(T)
+        d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+        div = np.exp(-q * T)
+        disc = np.exp(-r * T)
+        pdf = _norm_pdf(d1)
+        n_d1, n_d2 = ndtr(d1), ndtr(d2)
+        n_md1, n_md2 = ndtr(-d1), ndtr(-d2)
+
+        decay = -S * div * pdf * sigma / (2 * sqrt_t)
+        return {
+            "price": np.where(is_call, S * div * n_d1 - K * disc * n_d2, K * disc * n_md2 - S * div * n_md1),
+            "delta": np.where(is_call, div * n_d1, -div * n_md1),
+            "gamma": div * pdf / (S * sigma * sqrt_t),
+            "theta": np.where(
+                is_call,
+                decay - r * K * disc * n_d2 + q * S * div * n_d1,
+                decay + r * K * disc * n_md2 - q * S * div * n_md1,
+            ) / 365,
+            "vega": S * div * pdf * sqrt_t / 100,
+            "rho": np.where(is_call, K * T * disc * n_d2, -K * T * disc * n_md2) / 100,
+        }
+
+
+def implied_volatility(price, S, K, T, r, is_call, q=0.0, tol: float = IV_TOLERANCE,
+                       max_iterations: int = IV_MAX_ITERATIONS) -> np.ndarray:
+    """
+    Volatility reproducing each price (NaN where no volatility in [SIGMA_MIN, SIGMA_MAX] does)
+
+    Newton steps start from the Manaster-Koehler guess; a step leaving the
+    contract's bracket [lo, hi] (or a vanishing vega) bisects instead.
+    """
+    price, S, K, T, r, q, is_call = (np.asarray(a, dtype=dtype).ravel() for a, dtype in zip(
+        np.broadcast_arrays(price, S, K, T, r, q, is_call),
+        (np.float64,) * 6 + (bool,),
+    ))
+    sigma = np.full(price.shape, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        spot = S * np.exp(-q * T)
+        strike = K * np.exp(-r * T)
+        lower = np.maximum(np.where(is_call, spot - strike, strike - spot), 0)
+        upper = np.where(is_call, spot, strike)
+        solvable = (np.isfinite(price) & np.isfinite(S) & np.isfinite(K) & (T > 0) & (S > 0) & (K > 0)
+                    & (price > lower) & (price < upper))
+        active = np.flatnonzero(solvable)
+        price, S, K, T, r, q, is_call = (a[active] for a in (price, S, K, T, r, q, is_call))
+        # Only the time value carries volatility information (deep in the money it is a sliver of the price)
+        time_value = price - lower[active]
+
+        # Manaster-Koehler: the inflection point of price(sigma), from which Newton converges
+        guess = np.sqrt(2 * np.abs(np.log(S / K) + (r - q) * T) / T)
+        vol = np.clip(np.where(guess > 0, guess, 0.3), SIGMA_MIN, SIGMA_MAX)
+        lo = np.full(active.shape, SIGMA_MIN)
+        hi = np.full(active.shape, SIGMA_MAX)
+
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            diff = bs_price(S, K, T, r, vol, is_call, q) - price
+            converged = (np.abs(diff) <= tol * time_value) | (hi - lo < IV_BRACKET_TOLERANCE)
+            sigma[active[converged]] = vol[converged]
+
+            keep = ~converged
+            active, S, K, T, r, q, is_call, price, time_value, vol, diff, lo, hi = (
+                a[keep] for a in (active, S, K, T, r, q, is_call, price, time_value, vol, diff, lo, hi)
+            )
+            # Price rises with volatility: a positive error means sigma is too high
+            hi = np.where(diff > 0, vol, hi)
+            lo = np.where(diff > 0, lo, vol)
+            step = vol - diff / bs_vega(S, K, T, r, vol, q)
+            vol = np.where((step > lo) & (step < hi), step, 0.5 * (lo + hi))
+
+    # Out of iterations: the bracket midpoint is the best estimate, unless it sits on a bound
+    inside = (vol > SIGMA_MIN * 1.01) & (vol < SIGMA_MAX * 0.99)
+    sigma[active[inside]] = vol[inside]
+    return sigma
+
+
+def years_to_expiry(expiration: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+    """Years from `now` until each expiration date's 16:00 New York close (negative once passed)"""
+    now = time.time() if now is None else now
+    close = pd.DatetimeIndex(expiration).tz_localize(MARKET_TZ) + pd.Timedelta(hours=16)
+    return (close.as_unit("s").asi8 - now) / YEAR_SECONDS
+
+
+def market_prices(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Bid/ask midpoint where both sides are quoted, else the day's close"""
+    bid, ask = columns["bid"], columns["ask"]
+    quoted = (bid > 0) & (ask >= bid)
+    return np.where(quoted, 0.5 * (bid + ask), columns["close"])
+
+
+def chain_analytics(columns: Dict[str, np.ndarray], underlying_price: float, rate: float = OPTIONS_RISK_FREE_RATE,
+                    dividend_yield: float = 0.0, now: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Implied volatility and greeks for every contract of a columnar chain
+
+    Solves IV from market_prices() and evaluates the greeks at that IV;
+    contracts without a usable price get NaN.
+    """
+    T = years_to_expiry(columns["expiration"], now)
+    is_call = columns["type"] == "call"
+    price = market_prices(columns)
+    iv = implied_volatility(price, underlying_price, columns["strike"], T, rate, is_call, dividend_yield)
+    greeks = bs_greeks(underlying_price, columns["strike"], T, rate, iv, is_call, dividend_yield)
+    return {
+        "ticker": columns["ticker"],
+        "type": columns["type"],
+        "expiration": columns["expiration"],
+        "strike": columns["strike"],
+        "years": T,
+        "price": price,
+        "iv": iv,
+        "delta": greeks["delta"],
+        "gamma": greeks["gamma"],
+        "theta": greeks["theta"],
+        "vega": greeks["vega"],
+        "rho": greeks["rho"],
+    }
@@ -0,0 +1,203 @@
+"""
+Option Chain - Full option-chain snapshots, assembled server-side
+
+Polygon serves a chain snapshot one page at a time behind an opaque cursor,
+so a single listing can only be walked sequentially. The full chain is
+split into independent listings instead, one per contract type and expiry
+window (OPTION_CHAIN_WINDOWS), which are paginated concurrently (at most
+OPTION_CHAIN_CONCURRENCY at a time) with the largest page Polygon allows.
+
+The contracts are assembled into one columnar chain: a NumPy array per
+field (strike, expiration, type, greeks, IV, open interest, volume,
+bid/ask), sorted by expiration, type and strike. Chains are cached per
+underlying for OPTION_CHAIN_TTL seconds and concurrent misses share one
+fetch; expiry, strike and delta filters are array masks over the cached
+chain, applied before any JSON is built. A listing longer than
+POLYGON_MAX_PAGES pages is cut short; the chain then carries
+"truncated": true.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from option_index import expiry_window
+from polygon_client import get_option_chain_snapshot_all
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+OPTION_CHAIN_TTL = float(os.getenv("OPTION_CHAIN_TTL", "15"))
+OPTION_CHAIN_CACHE_SIZE = int(os.getenv("OPTION_CHAIN_CACHE_SIZE", "64"))
+OPTION_CHAIN_CONCURRENCY = int(os.getenv("OPTION_CHAIN_CONCURRENCY", "8"))
+
+# Expiry windows (days from today, inclusive) fetched as separate listings.
+# Near-dated windows are narrow: that is where most contracts are.
+OPTION_CHAIN_WINDOWS = [(0, 2), (3, 7), (8, 14), (15, 30), (31, 60), (61, 90), (91, 180), (181, 365), (366, 730)]
+CONTRACT_TYPES = ("call", "put")
+
+# Chain columns: name -> (snapshot section, field); the section None is the result itself
+NUMERIC_FIELDS = {
+    "strike": ("details", "strike_price"),
+    "delta": ("greeks", "delta"),
+    "gamma": ("greeks", "gamma"),
+    "theta": ("greeks", "theta"),
+    "vega": ("greeks", "vega"),
+    "iv": (None, "implied_volatility"),
+    "open_interest": (None, "open_interest"),
+    "volume": ("day", "volume"),
+    "close": ("day", "close"),
+    "bid": ("last_quote", "bid"),
+    "ask": ("last_quote", "ask"),
+}
+
+
+def assemble_chain(results: List[Dict]) -> Dict[str, np.ndarray]:
+    """Snapshot results -> columnar chain sorted by expiration, type and strike (missing values NaN)"""
+    details = [result.get("details") or {} for result in results]
+    columns = {
+        "ticker": np.array([d.get("ticker", "") for d in details], dtype=str),
+        "type": np.array([d.get("contract_type", "") for d in details], dtype=str),
+        "expiration": np.array([d.get("expiration_date") or "NaT" for d in details], dtype="datetime64[D]"),
+    }
+    for name, (section, field) in NUMERIC_FIELDS.items():
+        values = [
+            (result if section is None else result.get(section) or {}).get(field)
+            for result in results
+        ]
+        columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+    order = np.lexsort((columns["strike"], columns["type"], columns["expiration"]))
+    return {name: values[order] for name, values in columns.items()}
+
+
+def _underlying_price(results: List[Dict]) -> Optional[float]:
+    for result in results:
+        price = (result.get("underlying_asset") or {}).get("price")
+        if price is not None:
+            return float(price)
+    return None
+
+
+class OptionChainCache(TTLCache):
+    """TTL cache of assembled chains with hit/miss counters"""
+
+    def __init__(self, maxsize: int = OPTION_CHAIN_CACHE_SIZE, ttl: float = OPTION_CHAIN_TTL):
+        super().__init__(maxsize, ttl, timer=time.time)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": self.currsize, "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+
+chain_cache = OptionChainCache()
+_fetches = SingleFlight()
+
+
+async def fetch_chain(underlying: str) -> Dict:
+    """
+    Fetch and assemble the full chain (expirations up to 730 days out)
+
+    Returns {"underlying", "underlying_price", "as_of", "listings",
+    "truncated", "columns"} or {"error": ...} when any listing fails;
+    truncated is True when a listing hit the page cap (next_url left over).
+    """
+    today = expiry_window()[0].item()
+    slots = asyncio.Semaphore(OPTION_CHAIN_CONCURRENCY)
+
+    async def listing(contract_type: str, window: Tuple[int, int]) -> Dict:
+        async with slots:
+            return await get_option_chain_snapshot_all(underlying, {
+                "contract_type": contract_type,
+                "expiration_date.gte": str(today + timedelta(days=window[0])),
+                "expiration_date.lte": str(today + timedelta(days=window[1])),
+            })
+
+    listings = [(contract_type, window) for contract_type in CONTRACT_TYPES for window in OPTION_CHAIN_WINDOWS]
+    pages = await asyncio.gather(*(listing(contract_type, window) for contract_type, window in listings))
+    results = []
+    truncated = []
+    for (contract_type, window), page in zip(listings, pages):
+        if "results" not in page and page.get("status") != "OK":
+            return {"error": page.get("error") or page.get("message") or "Unable to fetch option chain"}
+        results += page.get("results") or []
+        if page.get("next_url"):
+            truncated.append(f"{contract_type} {window[0]}-{window[1]}d")
+    if truncated:
+        logger.warning("Option chain for %s truncated at the page cap: %s", underlying, ", ".join(truncated))
+
+    return {
+        "underlying": underlying,
+        "underlying_price": _underlying_price(results),
+        "as_of": time.time(),
+        "listings": len(pages),
+        "truncated": bool(truncated),
+        "columns": assemble_chain(results),
+    }
+
+
+async def get_chain_cached(underlying: str, bypass_cache: bool = False) -> Dict:
+    """fetch_chain() through the TTL cache; concurrent misses share one fetch"""
+    if not bypass_cache:
+        chain = chain_cache.get(underlying)
+        if chain is not None:
+            chain_cache.hits += 1
+            return chain
+    chain_cache.misses += 1
+
+    async def fetch():
+        chain = await fetch_chain(underlying)
+        if "error" not in chain:
+            chain_cache[underlying] = chain
+        return chain
+
+    return await _fetches.do(underlying, fetch)
+
+
+def filter_chain(chain: Dict, contract_type: Optional[str] = None, expiry_bucket: Optional[str] = None,
+                 strike_min: Optional[float] = None, strike_max: Optional[float] = None,
+                 delta_min: Optional[float] = None, delta_max: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Columns of the contracts passing every filter given
+
+    Expired contracts are always dropped. The chain is sorted by
+    expiration, so the expiry window is a binary search; the other filters
+    are masks over that slice. Delta bounds apply to |delta| (0.25-0.5
+    selects both calls and puts in that band); contracts without greeks
+    never pass a delta filter.
+    """
+    start, end = expiry_window(expiry_bucket)
+    expirations = chain["columns"]["expiration"]
+    window = slice(np.searchsorted(expirations, start, side="left"), np.searchsorted(expirations, end, side="right"))
+    columns = {name: values[window] for name, values in chain["columns"].items()}
+    mask = np.ones(len(columns["strike"]), dtype=bool)
+    if contract_type:
+        mask &= columns["type"] == contract_type
+    if strike_min is not None:
+        mask &= columns["strike"] >= strike_min
+    if strike_max is not None:
+        mask &= columns["strike"] <= strike_max
+    if delta_min is not None or delta_max is not None:
+        delta = np.abs(columns["delta"])
+        mask &= (delta >= (delta_min if delta_min is not None else 0)) & (delta <= (delta_max if delta_max is not None else np.inf))
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def chain_response(chain: Dict, columns: Dict[str, np.ndarray]) -> Dict:
+    """JSON-ready columnar chain (expirations as YYYY-MM-DD strings)"""
+    body = dict(columns, expiration=np.datetime_as_string(columns["expiration"], unit="D"))
+    return {
+        "underlying": chain["underlying"],
+        "underlying_price": chain["underlying_price"],
+        "as_of": chain["as_of"],
+        "truncated": chain["truncated"],
+        "count": len(columns["strike"]),
+        "columns": body,
+    }
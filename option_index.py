@@ -0,0 +1,146 @@
+"""
+Option Index - Pre-parsed expiry/strike index over option contract listings
+
+A ContractIndex parses a listing's expiration dates once, in one vectorized
+NumPy conversion, into an expiry-sorted datetime64 array (with the strikes
+in the same order). Expiry buckets and date ranges are then two binary
+searches and strike bands an array mask over the matching slice, instead
+of a strptime per contract per request.
+
+Listings from /options and /all-option-contracts are cached together with
+their index for OPTION_CONTRACTS_TTL seconds, so repeated queries with
+different buckets or strike bands reuse both until the listing is refetched.
+"""
+import os
+import time
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from market_calendar import MARKET_TZ
+from singleflight import SingleFlight
+
+OPTION_CONTRACTS_TTL = float(os.getenv("OPTION_CONTRACTS_TTL", "300"))
+OPTION_CONTRACTS_CACHE_SIZE = int(os.getenv("OPTION_CONTRACTS_CACHE_SIZE", "128"))
+
+# Expiry buckets: latest expiry in days from today
+EXPIRY_BUCKETS = {"otd": 0, "7d": 7, "30d": 30, "90d": 90, "365d": 365, "730d": 730}
+
+# Contracts expiring further out than this are never returned
+MAX_EXPIRY_DAYS = 730
+
+
+def market_today() -> date:
+    """Today's date in New York (options expire on New York dates)"""
+    return datetime.now(MARKET_TZ).date()
+
+
+def parse_expirations(values: List[Optional[str]]) -> np.ndarray:
+    """YYYY-MM-DD strings -> datetime64[D] array; missing or malformed dates become NaT"""
+    try:
+        return np.array([value or "NaT" for value in values], dtype="datetime64[D]")
+    except ValueError:
+        # Rare: salvage the well-formed dates one by one
+        parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = np.datetime64(value, "D")
+            except (TypeError, ValueError):
+                pass
+        return parsed
+
+
+def _contract_fields(contract: Dict) -> Dict:
+    """Reference contracts carry the fields at the top level, snapshots under "details" """
+    return contract.get("details") or contract
+
+
+def expiry_window(expiry_bucket: Optional[str] = None, today: Optional[date] = None) -> Tuple[np.datetime64, np.datetime64]:
+    """Inclusive expiration range of a bucket: today .. today + N days (730 without a bucket)"""
+    start = np.datetime64(today or market_today(), "D")
+    return start, start + EXPIRY_BUCKETS.get(expiry_bucket, MAX_EXPIRY_DAYS)
+
+
+class ContractIndex:
+    """A contract listing with expirations parsed once and sorted for binary search"""
+
+    def __init__(self, contracts: List[Dict]):
+        self.contracts = contracts
+        fields = [_contract_fields(contract) for contract in contracts]
+        expirations = parse_expirations([f.get("expiration_date") for f in fields])
+        strikes = np.array([f.get("strike_price") for f in fields], dtype=np.float64)
+        # NaT sorts last; only the dated prefix is searched
+        self.order = np.argsort(expirations, kind="stable")
+        self.expirations = expirations[self.order]
+        self.strikes = strikes[self.order]
+        self.dated = int(np.count_nonzero(~np.isnat(expirations)))
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def query(self, start: Optional[np.datetime64] = None, end: Optional[np.datetime64] = None,
+              strike_min: Optional[float] = None, strike_max: Optional[float] = None) -> np.ndarray:
+        """Listing positions (in listing order) expiring in [start, end] with strikes in [strike_min, strike_max]"""
+        dated = self.expirations[:self.dated]
+        lo = 0 if start is None else int(np.searchsorted(dated, start, side="left"))
+        hi = self.dated if end is None else int(np.searchsorted(dated, end, side="right"))
+        positions = self.order[lo:hi]
+        if strike_min is not None or strike_max is not None:
+            strikes = self.strikes[lo:hi]
+            mask = np.ones(len(positions), dtype=bool)
+            if strike_min is not None:
+                mask &= strikes >= strike_min
+            if strike_max is not None:
+                mask &= strikes <= strike_max
+            positions = positions[mask]
+        return np.sort(positions)
+
+    def select(self, expiry_bucket: Optional[str] = None, strike_min: Optional[float] = None,
+               strike_max: Optional[float] = None, today: Optional[date] = None) -> List[Dict]:
+        """Contracts expiring between today and the bucket's cutoff (730 days without one), in listing order"""
+        start, end = expiry_window(expiry_bucket, today)
+        return [self.contracts[i] for i in self.query(start, end, strike_min, strike_max)]
+
+
+class ContractIndexCache(TTLCache):
+    """TTL cache of (listing, index) pairs with hit/miss counters"""
+
+    def __init__(self, maxsize: int = OPTION_CONTRACTS_CACHE_SIZE, ttl: float = OPTION_CONTRACTS_TTL):
+        super().__init__(maxsize, ttl, timer=time.time)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": self.currsize, "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+
+index_cache = ContractIndexCache()
+_fetches = SingleFlight()
+
+
+async def get_listing_indexed(key: Hashable, fetch: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, Optional[ContractIndex]]:
+    """
+    A contract listing and its index, through the cache
+
+    `fetch` returns a Polygon listing body; only bodies with results are
+    cached (errors come back with a None index). Concurrent misses for the
+    same key share one fetch.
+    """
+    cached = index_cache.get(key)
+    if cached is not None:
+        index_cache.hits += 1
+        return cached
+    index_cache.misses += 1
+
+    async def build():
+        body = await fetch()
+        if "results" not in body:
+            return body, None
+        entry = (body, ContractIndex(body["results"]))
+        index_cache[key] = entry
+        return entry
+
+    return await _fetches.do(key, build)
@@ -1,120 +1,338 @@
-import requests
+import asyncio
+import importlib.util
 import os
+import httpx
+from contextlib import aclosing
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Callable, Tuple
+
+import numpy as np
+
+from market_calendar import plan_range
+from tradepilot_engine import DataProcessor
 
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("POLYGON_API_KEY")
 BASE_URL = "https://api.polygon.io"
 
+# Connection pool / request limits (override via .env)
+HTTP_TIMEOUT = float(os.getenv("POLYGON_HTTP_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("POLYGON_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE = int(os.getenv("POLYGON_MAX_KEEPALIVE", "20"))
+MAX_CONCURRENCY = int(os.getenv("POLYGON_MAX_CONCURRENCY", "20"))
+MAX_PAGES = int(os.getenv("POLYGON_MAX_PAGES", "50"))
+# Times get_candles reaches further back when a span returns fewer than `limit` bars
+CANDLE_EXTEND_ROUNDS = int(os.getenv("POLYGON_CANDLE_EXTEND_ROUNDS", "3"))
+
+# Largest page each endpoint serves
+AGGS_PAGE_LIMIT = 50000
+CONTRACTS_PAGE_LIMIT = 1000
+SNAPSHOT_PAGE_LIMIT = 250
+
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+# ---------------- Shared client ----------------
+
+_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Shared AsyncClient with keep-alive pooling. Created lazily on first use.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            http2=HTTP2_AVAILABLE,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client():
+    """Close the shared client (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _get(path: str, params: dict | None = None, timeout: float | None = None,
+               decode: Callable[[bytes], dict] | None = None) -> dict:
+    """
+    GET a Polygon endpoint through the shared client and return the JSON body
+    (parsed by `decode` when given). At most MAX_CONCURRENCY requests are in flight at once.
+    """
+    query = dict(params or {})
+    query["apiKey"] = API_KEY
+    async with _get_semaphore():
+        response = await get_client().get(
+            path, params=query, timeout=timeout if timeout is not None else HTTP_TIMEOUT
+        )
+    return decode(response.content) if decode is not None else response.json()
+
+
+async def paginate(path: str, params: dict | None = None, max_pages: int = MAX_PAGES,
+                   timeout: float | None = None, decode: Callable[[bytes], dict] | None = None) -> AsyncIterator[dict]:
+    """
+    Yield the pages of a Polygon list endpoint, following `next_url`.
+
+    Each page's next_url is requested before the page is yielded, so the
+    caller parses one page while the next downloads. Stops after max_pages.
+    """
+    pending = asyncio.ensure_future(_get(path, params, timeout, decode))
+    pages = 0
+    try:
+        while pending is not None:
+            page = await pending
+            pages += 1
+            next_url = page.get("next_url")
+            pending = None
+            if next_url and pages < max_pages:
+                url = httpx.URL(next_url)
+                pending = asyncio.ensure_future(_get(url.path, dict(url.params), timeout, decode))
+            yield page
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def _get_all(path: str, params: dict, max_results: int | None = None, timeout: float | None = None,
+                   decode: Callable[[bytes], dict] | None = None) -> dict:
+    """
+    Follow pagination and merge every page's results into the first page.
+
+    Pages decoded into columnar candles ("columns") are concatenated per
+    column. Stops once max_results results are in. next_url is kept only
+    when the page cap cut the listing short.
+    """
+    pages = []
+    count = 0
+    async with aclosing(paginate(path, params, timeout=timeout, decode=decode)) as stream:
+        async for page in stream:
+            if not pages and "results" not in page and "columns" not in page:
+                return page
+            pages.append(page)
+            count += DataProcessor.bar_count(page)
+            if max_results is not None and count >= max_results:
+                break
+
+    body, last = pages[0], pages[-1]
+    if "columns" in body:
+        body["columns"] = {
+            name: np.concatenate([page["columns"][name] for page in pages if "columns" in page])[:max_results]
+            for name in body["columns"]
+        }
+    else:
+        body["results"] = [bar for page in pages for bar in page.get("results") or []][:max_results]
+    if "resultsCount" in body:
+        body["resultsCount"] = DataProcessor.bar_count(body)
+    if (max_results is None or count < max_results) and last.get("next_url"):
+        body["next_url"] = last["next_url"]
+    else:
+        body.pop("next_url", None)
+    return body
+
 
 # ---------------- Core endpoints ----------------
 
-def get_symbol_lookup(query: str):
-    url = f"{BASE_URL}/v3/reference/tickers?search={query}&active=true&apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_symbol_lookup(query: str, timeout: float | None = None):
+    return await _get("/v3/reference/tickers", {"search": query, "active": "true"}, timeout)
 
 
-def get_candles(symbol: str, tf: str = "day", limit: int = 730):
+async def get_candles(symbol: str, tf: str = "day", limit: int = 730, timeout: float | None = None,
+                      columnar: bool = False):
+    """
+    Get the latest `limit` OHLCV bars of timeframe tf, oldest first (default = 730 bars).
+    With columnar=True pages are decoded straight into NumPy columns ({"columns": ...}).
+
+    The date span is planned to hold `limit` bars of complete regular
+    sessions. Symbols with missing bars (illiquid, halted, newly listed)
+    fill less of it, so the span is extended further back, doubling each
+    time, up to CANDLE_EXTEND_ROUNDS times; fewer than `limit` bars come
+    back only when that older history has none either.
+    """
+    candles, _ = await get_candles_spanned(symbol, tf, limit, timeout, columnar)
+    return candles
+
+
+async def get_candles_spanned(symbol: str, tf: str = "day", limit: int = 730, timeout: float | None = None,
+                              columnar: bool = False) -> Tuple[dict, date | None]:
+    """get_candles() plus the first date of the (possibly extended) span it searched (None on errors)"""
+    try:
+        start_date, end_date = plan_range(tf, limit)
+    except ValueError as e:
+        return {"status": "ERROR", "error": str(e)}, None
+    decode = DataProcessor.decode_aggregates if columnar else None
+
+    async def fetch(start, end, count: int) -> dict:
+        return await _get_all(
+            f"/v2/aggs/ticker/{symbol}/range/1/{tf}/{start}/{end}",
+            {"sort": "desc", "limit": min(count, AGGS_PAGE_LIMIT)},
+            max_results=count,
+            timeout=timeout,
+            decode=decode,
+        )
+
+    candles = await fetch(start_date, end_date, limit)
+    span = end_date - start_date + timedelta(days=1)
+    for _ in range(CANDLE_EXTEND_ROUNDS):
+        missing = limit - DataProcessor.bar_count(candles)
+        # Error bodies and page-capped listings (next_url kept) are returned as they are
+        if missing <= 0 or ("columns" not in candles and "results" not in candles) or candles.get("next_url"):
+            break
+        older_end = start_date - timedelta(days=1)
+        start_date = older_end - span + timedelta(days=1)
+        span *= 2
+        older = await fetch(start_date, older_end, missing)
+        if DataProcessor.bar_count(older) == 0:
+            break
+        _append_older(candles, older)
+
+    if "columns" in candles:
+        candles["columns"] = DataProcessor.sort_columns(candles["columns"])
+    elif "results" in candles:
+        candles["results"].reverse()
+    return candles, start_date
+
+
+def _append_older(candles: dict, older: dict):
+    """Append an older newest-first aggregates response to a newer one, in place"""
+    if "columns" in candles:
+        candles["columns"] = {
+            name: np.concatenate([values, older["columns"][name]]) for name, values in candles["columns"].items()
+        }
+    else:
+        candles["results"] = (candles.get("results") or []) + older["results"]
+    if "resultsCount" in candles:
+        candles["resultsCount"] = DataProcessor.bar_count(candles)
+    if older.get("next_url"):
+        candles["next_url"] = older["next_url"]
+
+
+async def get_candles_range(symbol: str, tf: str, start_date, end_date, timeout: float | None = None,
+                            columnar: bool = False):
     """
-    Get OHLCV candles dynamically (default = 730 days ≈ 2 years).
+    Get every OHLCV bar between two dates (inclusive), oldest first.
     """
-    end_date = datetime.utcnow().date()
-    start_date = end_date - timedelta(days=limit)
-    url = (
-        f"{BASE_URL}/v2/aggs/ticker/{symbol}/range/1/{tf}/{start_date}/{end_date}"
-        f"?limit={limit}&apiKey={API_KEY}"
+    return await _get_all(
+        f"/v2/aggs/ticker/{symbol}/range/1/{tf}/{start_date}/{end_date}",
+        {"sort": "asc", "limit": AGGS_PAGE_LIMIT},
+        timeout=timeout,
+        decode=DataProcessor.decode_aggregates if columnar else None,
     )
-    return requests.get(url).json()
 
 
-def get_news(symbol: str):
-    url = f"{BASE_URL}/v2/reference/news?ticker={symbol}&limit=5&apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_news(symbol: str, timeout: float | None = None):
+    return await _get("/v2/reference/news", {"ticker": symbol, "limit": 5}, timeout)
 
 
-def get_last_trade(symbol: str):
-    url = f"{BASE_URL}/v2/last/trade/{symbol}?apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_last_trade(symbol: str, timeout: float | None = None):
+    return await _get(f"/v2/last/trade/{symbol}", timeout=timeout)
 
 
-def get_ticker_details(symbol: str):
-    url = f"{BASE_URL}/v3/reference/tickers/{symbol}?apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_ticker_details(symbol: str, timeout: float | None = None):
+    return await _get(f"/v3/reference/tickers/{symbol}", timeout=timeout)
 
 
-def get_fundamentals(symbol: str):
+async def get_fundamentals(symbol: str, timeout: float | None = None):
     """
     Get latest company financials (quarterly).
     """
-    url = f"{BASE_URL}/v2/reference/financials?ticker={symbol.upper()}&limit=1&apiKey={API_KEY}"
-    return requests.get(url).json()
+    return await _get("/v2/reference/financials", {"ticker": symbol.upper(), "limit": 1}, timeout)
 
 
-def get_previous_day_bar(ticker: str):
-    url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/prev?apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_previous_day_bar(ticker: str, timeout: float | None = None):
+    return await _get(f"/v2/aggs/ticker/{ticker}/prev", timeout=timeout)
 
 
-def get_single_stock_snapshot(ticker: str):
-    url = f"{BASE_URL}/v2/snapshot/locale/us/markets/stocks/tickers/{ticker}?apiKey={API_KEY}"
-    return requests.get(url).json()
+async def get_single_stock_snapshot(ticker: str, timeout: float | None = None):
+    return await _get(f"/v2/snapshot/locale/us/markets/stocks/tickers/{ticker}", timeout=timeout)
 
 
 # ---------------- Options endpoints ----------------
 
-def get_all_option_contracts(underlying_ticker: str, expiration_date: str | None = None, limit: int = 50):
+async def get_all_option_contracts(underlying_ticker: str, expiration_date: str | None = None,
+                                   limit: int | None = None, timeout: float | None = None):
     """
-    List all option contracts for a given underlying.
+    List all option contracts for a given underlying (at most `limit`, across pages).
     """
-    url = f"{BASE_URL}/v3/reference/options/contracts?underlying_ticker={underlying_ticker}&limit={limit}&apiKey={API_KEY}"
+    params = {"underlying_ticker": underlying_ticker, "limit": min(limit or CONTRACTS_PAGE_LIMIT, CONTRACTS_PAGE_LIMIT)}
     if expiration_date:
-        url += f"&expiration_date.gte={expiration_date}"
-    return requests.get(url).json()
+        params["expiration_date.gte"] = expiration_date
+    return await _get_all("/v3/reference/options/contracts", params, limit, timeout)
 
 
-def get_options_chain(symbol: str, option_type: str = "call", days_out: int = 30):
+async def get_options_chain(symbol: str, option_type: str = "call", days_out: int = 30,
+                            timeout: float | None = None):
     """
     Fetch filtered option contracts by type (call/put) and expiry window.
     """
     today = datetime.utcnow().date()
     target_date = today + timedelta(days=days_out)
 
-    url = (
-        f"{BASE_URL}/v3/reference/options/contracts?"
-        f"underlying_ticker={symbol}&contract_type={option_type}&"
-        f"expiration_date.gte={today}&expiration_date.lte={target_date}&limit=100&apiKey={API_KEY}"
+    params = {
+        "underlying_ticker": symbol,
+        "contract_type": option_type,
+        "expiration_date.gte": str(today),
+        "expiration_date.lte": str(target_date),
+        "limit": CONTRACTS_PAGE_LIMIT,
+    }
+    return await _get_all("/v3/reference/options/contracts", params, timeout=timeout)
+
+
+async def get_option_aggregates(options_ticker: str, multiplier: int, timespan: str, from_date: str, to_date: str,
+                                timeout: float | None = None):
+    return await _get(
+        f"/v2/aggs/ticker/{options_ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}",
+        timeout=timeout,
     )
-    return requests.get(url).json()
 
 
-def get_option_aggregates(options_ticker: str, multiplier: int, timespan: str, from_date: str, to_date: str):
-    url = (
-        f"{BASE_URL}/v2/aggs/ticker/{options_ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
-        f"?apiKey={API_KEY}"
-    )
-    return requests.get(url).json()
-
+async def get_option_previous_day_bar(options_ticker: str, timeout: float | None = None):
+    return await _get(f"/v2/aggs/ticker/{options_ticker}/prev", timeout=timeout)
 
-def get_option_previous_day_bar(options_ticker: str):
-    url = f"{BASE_URL}/v2/aggs/ticker/{options_ticker}/prev?apiKey={API_KEY}"
-    return requests.get(url).json()
 
-
-def get_option_chain_snapshot(underlying_asset: str, cursor: str | None = None, limit: int = 50):
+async def get_option_chain_snapshot(underlying_asset: str, cursor: str | None = None, limit: int = 50,
+                                    timeout: float | None = None):
     """
     Get paginated option chain snapshot for an underlying.
     """
-    url = f"{BASE_URL}/v3/snapshot/options/{underlying_asset}?limit={limit}&apiKey={API_KEY}"
+    params = {"limit": limit}
     if cursor:
-        url += f"&cursor={cursor}"
-    return requests.get(url).json()
+        params["cursor"] = cursor
+    return await _get(f"/v3/snapshot/options/{underlying_asset}", params, timeout)
+
+
+async def get_option_chain_snapshot_all(underlying_asset: str, filters: dict | None = None,
+                                        timeout: float | None = None):
+    """
+    Every option chain snapshot matching Polygon's filters (e.g. contract_type,
+    expiration_date.gte/.lte, strike_price.gte/.lte), across pages.
+    """
+    params = {"limit": SNAPSHOT_PAGE_LIMIT, **(filters or {})}
+    return await _get_all(f"/v3/snapshot/options/{underlying_asset}", params, timeout=timeout)
 
 
-def get_option_contract_snapshot(underlying: str, contract: str):
+async def get_option_contract_snapshot(underlying: str, contract: str, timeout: float | None = None):
     """
     Snapshot for a single option contract.
     """
-    url = f"{BASE_URL}/v3/snapshot/options/{underlying}/{contract}?apiKey={API_KEY}"
-    return requests.get(url).json()
+    return await _get(f"/v3/snapshot/options/{underlying}/{contract}", timeout=timeout)
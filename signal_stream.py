@@ -0,0 +1,287 @@
+"""
+Signal Stream - Shared scheduler behind the /sse endpoint
+
+Subscribers pick (symbol, timeframe) topics. Each topic has exactly one
+polling task no matter how many clients follow it: it warms the engine's
+incremental stream from history once, then wakes when the next bar closes,
+fetches only the last few bars and pushes the newly closed ones through
+TradePilotEngine.update(). An event is published when the overall signal or
+any layer's signal changes.
+
+Every subscription has a bounded queue; when a slow client falls behind
+the oldest pending events are dropped (signal events carry the full state,
+so the latest one is always enough) and the drop count is reported.
+
+A failed warm-up or upstream error is retried from SSE_RETRY_SECONDS,
+doubling up to SSE_ERROR_RETRY_MAX_SECONDS (never later than the next bar
+close), so one transient error doesn't idle a daily topic until the next
+session close.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from candle_cache import get_candles_cached
+from json_response import dumps
+from market_calendar import BAR_SECONDS, bar_close_time, next_bar_close
+from market_feed import feed
+from polygon_client import get_candles
+from tradepilot_engine import TradePilotEngine
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "32"))
+SSE_MAX_TOPICS = int(os.getenv("SSE_MAX_TOPICS", "50"))
+SSE_HISTORY_BARS = int(os.getenv("SSE_HISTORY_BARS", "730"))
+SSE_POLL_BARS = 10
+SSE_CLOSE_DELAY = float(os.getenv("SSE_CLOSE_DELAY", "2"))
+SSE_RETRY_SECONDS = 5.0
+SSE_RETRIES = 3
+SSE_ERROR_RETRY_MAX_SECONDS = 300.0
+
+TopicKey = Tuple[str, str]
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    """One server-sent event frame"""
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+
+def _closed_columns(columns: Dict[str, np.ndarray], tf: str, now: float) -> Dict[str, np.ndarray]:
+    """Columnar bars without the still-forming tail"""
+    t = columns["t"]
+    count = len(t)
+    while count and bar_close_time(tf, int(t[count - 1])) > now:
+        count -= 1
+    return {name: values[:count] for name, values in columns.items()}
+
+
+def _signals(result: Dict) -> Dict:
+    """The part of an analysis that decides whether an event is sent"""
+    overall = result.get("overall_signal", {})
+    return {
+        "recommendation": overall.get("recommendation"),
+        "direction": overall.get("direction"),
+        "layers": {name: layer.get("signal") for name, layer in result["layers"].items()},
+    }
+
+
+class Subscription:
+    """One client's topics and bounded event queue"""
+
+    def __init__(self, topics: List[TopicKey], maxsize: int = SSE_QUEUE_SIZE):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, frame: bytes):
+        """Queue an event, dropping the oldest one if the client is behind"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+class Topic:
+    """Polling state for one (symbol, timeframe)"""
+
+    def __init__(self, symbol: str, tf: str):
+        self.symbol = symbol
+        self.tf = tf
+        self.subscribers: Set[Subscription] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.last_t: Optional[int] = None
+        self.signals: Optional[Dict] = None
+        self.last_event: Optional[bytes] = None
+        self.computes = 0
+        self.errors = 0
+
+
+class SignalScheduler:
+    """Shares one fetch-and-compute loop per topic among all subscribers"""
+
+    def __init__(self, engine: TradePilotEngine):
+        self.engine = engine
+        self.topics: Dict[TopicKey, Topic] = {}
+
+    def subscribe(self, keys: Iterable[TopicKey]) -> Subscription:
+        """Follow topics; the latest known state of each is queued right away"""
+        keys = list(dict.fromkeys(keys))
+        for symbol, tf in keys:
+            if tf not in BAR_SECONDS:
+                raise ValueError(f"Unknown timeframe: {tf}")
+        if len(keys) > SSE_MAX_TOPICS:
+            raise ValueError(f"At most {SSE_MAX_TOPICS} symbol/timeframe pairs per stream")
+
+        subscription = Subscription(keys)
+        for key in keys:
+            topic = self.topics.get(key)
+            if topic is None:
+                topic = self.topics[key] = Topic(*key)
+                topic.task = asyncio.create_task(self._run(topic))
+            topic.subscribers.add(subscription)
+            if topic.last_event is not None:
+                subscription.offer(topic.last_event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop following; topics without subscribers stop polling"""
+        for key in subscription.topics:
+            topic = self.topics.get(key)
+            if topic is None:
+                continue
+            topic.subscribers.discard(subscription)
+            if not topic.subscribers:
+                topic.task.cancel()
+                del self.topics[key]
+                self.engine.stop_stream(*key)
+
+    def _publish(self, topic: Topic, event: str, data: Dict, event_id: Optional[int] = None):
+        frame = format_event(event, data, event_id)
+        if event != "error":
+            topic.last_event = frame
+        for subscription in topic.subscribers:
+            subscription.offer(frame)
+
+    async def _warm(self, topic: Topic) -> Optional[Dict]:
+        """Replay closed history into the engine's incremental stream"""
+        candles = await get_candles_cached(topic.symbol, tf=topic.tf, limit=SSE_HISTORY_BARS)
+        if not candles or "columns" not in candles:
+            return {"error": (candles or {}).get("error", "Unable to fetch candle data")}
+        columns = _closed_columns(candles["columns"], topic.tf, time.time())
+        result = await run_in_threadpool(
+            self.engine.start_stream, {"columns": columns}, topic.symbol, topic.tf
+        )
+        if "error" not in result:
+            topic.last_t = int(columns["t"][-1])
+        return result
+
+    async def _advance(self, topic: Topic) -> Optional[Dict]:
+        """Push bars closed since the last one; None when there are none yet"""
+        candles = feed.candles(topic.symbol, topic.tf, SSE_POLL_BARS) if feed is not None else None
+        if candles is None:
+            candles = await get_candles(topic.symbol, tf=topic.tf, limit=SSE_POLL_BARS, columnar=True)
+        if not candles or "columns" not in candles:
+            return {"error": (candles or {}).get("error", "Unable to fetch candle data")}
+        columns = _closed_columns(candles["columns"], topic.tf, time.time())
+        t = columns["t"]
+        if len(t) == 0 or t[-1] <= topic.last_t:
+            return None
+        if t[0] > topic.last_t or not self.engine.has_stream(topic.symbol, topic.tf):
+            # Missed more bars than one poll returns, or the engine evicted
+            # the stream (ENGINE_MAX_STREAMS): rebuild from history
+            return await self._warm(topic)
+
+        new = t > topic.last_t
+        bars = [
+            {"o": o, "h": h, "l": l, "c": c, "v": v, "t": int(ts)}
+            for o, h, l, c, v, ts in zip(*(columns[key][new] for key in ("o", "h", "l", "c", "v", "t")))
+        ]
+
+        def push_all():
+            result = None
+            for bar in bars:
+                result = self.engine.update(topic.symbol, bar, topic.tf)
+            return result
+
+        result = await run_in_threadpool(push_all)
+        topic.last_t = bars[-1]["t"]
+        return result
+
+    def _emit(self, topic: Topic, result: Dict):
+        """Publish a signal event if the overall or any layer signal changed"""
+        topic.computes += 1
+        signals = _signals(result)
+        if signals == topic.signals:
+            return
+        previous, topic.signals = topic.signals, signals
+        changed = [] if previous is None else [
+            name for name, signal in signals["layers"].items() if previous["layers"].get(name) != signal
+        ]
+        if previous is not None and previous["recommendation"] != signals["recommendation"]:
+            changed.append("overall_signal")
+        self._publish(topic, "snapshot" if previous is None else "signal", {
+            "symbol": topic.symbol,
+            "timeframe": topic.tf,
+            "bar_time": result.get("latest_datetime"),
+            "latest_price": result.get("latest_price"),
+            "confidence": result.get("overall_signal", {}).get("confidence"),
+            "changed": changed,
+            **signals,
+        }, topic.last_t)
+
+    async def _run(self, topic: Topic):
+        """Polling loop of one topic: warm once, then wake at each bar close"""
+        retries = 0
+        errors = 0
+        try:
+            while True:
+                try:
+                    result = await (self._warm(topic) if topic.last_t is None else self._advance(topic))
+                except Exception as e:
+                    logger.warning("signal stream %s %s failed: %s", topic.symbol, topic.tf, e)
+                    result = {"error": str(e)}
+
+                now = time.time()
+                until_close = max(next_bar_close(topic.tf, now) + SSE_CLOSE_DELAY - now, 0)
+                if result is not None and "error" in result:
+                    topic.errors += 1
+                    self._publish(topic, "error", {"symbol": topic.symbol, "timeframe": topic.tf,
+                                                   "error": result["error"]})
+                    backoff = min(SSE_RETRY_SECONDS * 2 ** errors, SSE_ERROR_RETRY_MAX_SECONDS)
+                    errors += 1
+                    await asyncio.sleep(min(backoff, until_close))
+                    continue
+                errors = 0
+                if result is not None:
+                    self._emit(topic, result)
+
+                # Polygon can publish a bar a few seconds after it closes
+                if result is None and retries < SSE_RETRIES:
+                    retries += 1
+                    await asyncio.sleep(SSE_RETRY_SECONDS)
+                    continue
+                retries = 0
+                await asyncio.sleep(until_close)
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> Dict:
+        return {
+            "topics": len(self.topics),
+            "subscriptions": len({id(s) for topic in self.topics.values() for s in topic.subscribers}),
+            "computes": sum(topic.computes for topic in self.topics.values()),
+            "errors": sum(topic.errors for topic in self.topics.values()),
+        }
+
+    async def close(self):
+        """Cancel every polling task (called on app shutdown)"""
+        tasks = [topic.task for topic in self.topics.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.topics.clear()
+
+
+async def event_stream(scheduler: SignalScheduler, subscription: Subscription, is_disconnected):
+    """SSE frames for one subscription, with heartbeats while it is idle"""
+    try:
+        yield format_event("connected", {"message": "TradePilot MCP Server connected",
+                                         "topics": [f"{symbol}:{tf}" for symbol, tf in subscription.topics]})
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                frame = format_event("heartbeat", {"time": time.time(), "dropped": subscription.dropped})
+            yield frame
+    finally:
+        scheduler.unsubscribe(subscription)
@@ -0,0 +1,71 @@
+"""Deterministic synthetic Polygon aggregates, and a mock aggregates endpoint, for the tests"""
+from datetime import date, datetime
+
+import httpx
+import numpy as np
+
+from market_calendar import MARKET_TZ
+
+DAY_MS = 86_400_000
+
+
+def make_candles(seed: int, bars: int = 730, flat_runs: int = 0,
+                 start: int = 1_600_000_000_000, step: int = DAY_MS) -> dict:
+    """
+    A Polygon aggregates body of a random walk
+
+    flat_runs inserts that many runs of 5-20 flat bars (open = high = low =
+    close, the zero-range bars that produce 0/0 in the indicators).
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    open_ = close * (1 + rng.normal(0, 0.005, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, bars)))
+    volume = rng.integers(1_000_000, 5_000_000, bars).astype(float)
+    for _ in range(flat_runs):
+        first = int(rng.integers(1, bars - 20))
+        run = slice(first, first + int(rng.integers(5, 21)))
+        close[run] = close[first - 1]
+        open_[run] = high[run] = low[run] = close[run]
+    return {"results": [
+        {"o": float(open_[i]), "h": float(high[i]), "l": float(low[i]), "c": float(close[i]),
+         "v": float(volume[i]), "vw": float(close[i]), "n": 100, "t": start + i * step}
+        for i in range(bars)
+    ]}
+
+
+def session_ms(day: date, hour: int = 9, minute: int = 30) -> int:
+    """Epoch ms of a New York wall-clock time on `day`"""
+    return int(datetime(day.year, day.month, day.day, hour, minute, tzinfo=MARKET_TZ).timestamp() * 1000)
+
+
+def bar(t: int, close: float = 100.0) -> dict:
+    return {"t": t, "o": close, "h": close + 1, "l": close - 1, "c": close, "v": 1000.0, "vw": close, "n": 10}
+
+
+class MockAggregates:
+    """
+    httpx MockTransport handler serving /v2/aggs ranges from per-symbol bar lists
+
+    Bars are filtered by their New York date against the path's start/end
+    dates, ordered by the sort param and cut to limit (one page, no
+    next_url). Every request's (symbol, start, end) is recorded.
+    """
+
+    def __init__(self, bars: dict):
+        self.bars = bars
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.split("/")
+        symbol, start, end = parts[4], date.fromisoformat(parts[-2]), date.fromisoformat(parts[-1])
+        self.requests.append((symbol, start, end))
+        rows = [b for b in self.bars.get(symbol, [])
+                if start <= datetime.fromtimestamp(b["t"] / 1000, MARKET_TZ).date() <= end]
+        rows.sort(key=lambda b: b["t"], reverse=request.url.params.get("sort") == "desc")
+        rows = rows[:int(request.url.params.get("limit", 50000))]
+        body = {"ticker": symbol, "status": "OK", "resultsCount": len(rows)}
+        if rows:
+            body["results"] = rows
+        return httpx.Response(200, json=body)
@@ -0,0 +1,140 @@
+"""
+Backtest: position holding, return alignment and cost/trade arithmetic
+
+run_backtest is checked on small hand-built matrices (recommendations and
+validity patched in) whose answers are worked out below, and the per-bar
+recommendations it trades are checked against analyze() on the history up
+to each bar.
+"""
+import numpy as np
+import pytest
+
+from synthetic import make_candles
+from tradepilot_engine import TradePilotEngine, backtest, universe
+
+COST = (1.0 + 2.0) / 10_000  # run_backtest's default commission_bps + slippage_bps
+
+
+def test_positions_hold_through_bars_without_a_decision():
+    recommendation = np.array([["HOLD", "BUY", "HOLD", "WEAK BUY", "SELL", "WEAK SELL", "HOLD", "STRONG BUY"]])
+    valid = np.ones(recommendation.shape, dtype=bool)
+    np.testing.assert_array_equal(backtest.positions(recommendation, valid), [[0, 1, 1, 1, 0, 0, 0, 1]])
+    np.testing.assert_array_equal(backtest.positions(recommendation, valid, allow_short=True),
+                                  [[0, 1, 1, 1, -1, -1, -1, 1]])
+
+
+def test_positions_are_flat_on_invalid_bars_and_stay_flat_until_the_next_decision():
+    recommendation = np.array([["BUY", "HOLD", "HOLD", "HOLD", "BUY"],
+                               ["STRONG SELL", "BUY", "HOLD", "HOLD", "HOLD"]])
+    valid = np.array([[True, True, False, True, True],
+                      [False, True, True, True, True]])
+    np.testing.assert_array_equal(backtest.positions(recommendation, valid, allow_short=True),
+                                  [[1, 1, 0, 0, 1], [0, 1, 1, 1, 1]])
+
+
+def test_positions_custom_entry_and_exit():
+    recommendation = np.array([["WEAK BUY", "HOLD", "WEAK SELL", "BUY"]])
+    valid = np.ones(recommendation.shape, dtype=bool)
+    np.testing.assert_array_equal(
+        backtest.positions(recommendation, valid, entry=("WEAK BUY",), exit=("WEAK SELL",)), [[1, 1, 0, 0]])
+
+
+def test_trade_returns_earn_the_bars_after_entry():
+    position = np.array([[0, 1, 1, 0, -1, -1]], dtype=float)
+    returns = np.array([[0, 0.1, 0.2, -0.05, 0.1, -0.1]])
+    trades = backtest._trade_returns(position, returns, COST)
+    # Long from bar 1's close earns bars 2 and 3 (not bar 1's +10%); the
+    # short from bar 4's close earns bar 5 and is still open
+    round_trip = (1 - COST) ** 2
+    np.testing.assert_allclose(trades, [1.2 * 0.95 * round_trip - 1, 1.1 * round_trip - 1])
+
+
+def test_trade_returns_split_reversals_and_rows():
+    position = np.array([[1, -1, -1, 1], [0, 0, 1, 1]], dtype=float)
+    returns = np.array([[0, 0.1, -0.2, 0.5], [0, 0.3, 0.1, 0.1]])
+    trades = backtest._trade_returns(position, returns, 0.0)
+    # Row 0: long earns +10%, the short held over bars 2-3 earns +20% then
+    # -50%, the last long is open with no bars yet; row 1: long from bar 2
+    # earns bar 3 only
+    np.testing.assert_allclose(trades, [0.1, 1.2 * 0.5 - 1, 0.0, 0.1])
+
+
+@pytest.fixture
+def matrix(monkeypatch):
+    """Two symbols, five bars, with patched recommendations and validity"""
+    bars = {column: np.array([[100, 110, 121, 108.9, 108.9],
+                              [50, 50, 55, 44, 44]], dtype=float)
+            for column in ("open", "high", "low", "close", "volume")}
+    recommendation = np.array([["BUY", "HOLD", "SELL", "HOLD", "HOLD"],
+                               ["HOLD", "SELL", "BUY", "HOLD", "SELL"]])
+    valid = np.array([[True] * 5, [False] + [True] * 4])
+    monkeypatch.setattr(backtest, "recommendations", lambda bars, layers: recommendation)
+    monkeypatch.setattr(universe, "valid_bars", lambda bars: valid)
+    return bars
+
+
+def test_run_backtest_costs_and_returns(matrix):
+    result = backtest.run_backtest(["A", "B"], matrix, layers={})
+    a, b = result["symbols"]["A"], result["symbols"]["B"]
+
+    # A: long at bar 0's close (cost), earns +10% twice, sells at bar 2's close (cost)
+    a_net = [-COST, 0.1, 0.1 - COST, 0.0, 0.0]
+    assert a["bars"] == 5
+    assert a["total_return"] == pytest.approx(np.prod(1 + np.array(a_net)) - 1, abs=1e-6)
+    assert a["trades"] == 1
+    assert a["hit_rate"] == 1.0
+    assert a["turnover"] == 2
+    assert a["exposure"] == pytest.approx(2 / 5)
+
+    # B: active from bar 1; buys at bar 2's close, so bar 2's +10% is not earned
+    b_net = [0.0, -COST, -0.2, -COST]
+    assert b["bars"] == 4
+    assert b["total_return"] == pytest.approx(np.prod(1 + np.array(b_net)) - 1, abs=1e-6)
+    assert b["trades"] == 1
+    assert b["hit_rate"] == 0.0
+    assert b["max_drawdown"] == pytest.approx((1 - COST) * 0.8 * (1 - COST) - 1, abs=1e-6)
+
+    # Equal weight over the symbols active at each bar
+    portfolio_net = [a_net[0]] + [(x + y) / 2 for x, y in zip(a_net[1:], b_net)]
+    np.testing.assert_allclose(result["equity"], np.cumprod(1 + np.array(portfolio_net)))
+    assert result["portfolio"]["trades"] == 2
+    assert result["portfolio"]["symbols"] == 2
+
+
+def test_run_backtest_allow_short(matrix):
+    result = backtest.run_backtest(["A", "B"], matrix, layers={}, allow_short=True,
+                                   commission_bps=0, slippage_bps=0)
+    b = result["symbols"]["B"]
+    # B: short from bar 1 (loses bar 2's +10%), long from bar 2 (loses bar
+    # 3's -20%, flat bar 4), short again at bar 4's close
+    assert b["total_return"] == pytest.approx(0.9 * 0.8 - 1)
+    assert b["trades"] == 3
+    assert b["turnover"] == 5
+    assert b["hit_rate"] == 0.0
+
+
+def test_recommendations_match_analyze_on_the_history_so_far():
+    engine = TradePilotEngine()
+    candles = [make_candles(30, 320), make_candles(31, 260, 4)]
+    symbols, bars = universe.stack_candles(dict(zip(["A", "B"], candles)))
+    recommendation = backtest.recommendations(bars, engine.layers, block=1)
+    np.testing.assert_array_equal(recommendation, backtest.recommendations(bars, engine.layers))
+
+    width = bars["close"].shape[-1]
+    for row, body in enumerate(candles):
+        length = len(body["results"])
+        for end in (200, 231, length):
+            analysis = engine.analyze({"results": body["results"][:end]}, "SYM", tail_only=False)
+            column = width - length + end - 1
+            assert recommendation[row, column] == analysis["overall_signal"]["recommendation"], (row, end)
+
+
+def test_engine_backtest_single_symbol_portfolio_is_the_symbol():
+    engine = TradePilotEngine()
+    symbols, bars = universe.stack_candles({"A": make_candles(32, 600)})
+    result = engine.backtest(symbols, bars, commission_bps=0, slippage_bps=0)
+    portfolio = dict(result["portfolio"])
+    assert portfolio.pop("symbols") == 1
+    assert portfolio == result["symbols"]["A"]
+    assert result["symbols"]["A"]["bars"] == 600 - 199
+    assert len(result["equity"]) == 600
@@ -0,0 +1,160 @@
+"""
+Local bar store: on-disk appends and reads, and get_candles_stored against a mocked Polygon
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+import pytest
+
+import bar_store
+import polygon_client
+from bar_store import BarStore, get_candles_stored
+from market_calendar import MARKET_TZ, is_trading_day
+from synthetic import MockAggregates, bar, session_ms
+
+
+def trading_days(count: int, before=None):
+    """The `count` trading days before `before` (default today), oldest first"""
+    day = before or datetime.now(MARKET_TZ).date()
+    days = []
+    while len(days) < count:
+        day -= timedelta(days=1)
+        if is_trading_day(day):
+            days.append(day)
+    return days[::-1]
+
+
+def daily_bars(days):
+    return [bar(session_ms(day, 0, 0), 100.0 + i) for i, day in enumerate(days)]
+
+
+@pytest.fixture
+def polygon(monkeypatch, tmp_path):
+    """Install a mock aggregates endpoint and an empty store; returns the handler"""
+    handler = MockAggregates({})
+    monkeypatch.setattr(polygon_client, "_client", httpx.AsyncClient(
+        base_url=polygon_client.BASE_URL, transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(polygon_client, "_semaphore", None)
+    monkeypatch.setattr(bar_store, "store", BarStore(str(tmp_path)))
+    monkeypatch.setattr(bar_store, "_locks", {})
+    return handler
+
+
+def stored(symbol: str, limit: int = 730, **kwargs):
+    return asyncio.run(get_candles_stored(symbol, "day", limit, **kwargs))
+
+
+def test_store_reaches_back_for_missing_bars(polygon):
+    # An illiquid symbol trading on two sessions out of three
+    days = [day for i, day in enumerate(trading_days(1500)) if i % 3]
+    polygon.bars["ILLIQ"] = daily_bars(days)
+
+    candles = stored("ILLIQ", 730)
+    assert list(candles["columns"]["t"]) == [b["t"] for b in polygon.bars["ILLIQ"][-730:]]
+
+    # The extended window counts as covered: the next call only fetches the tail
+    polygon.requests.clear()
+    assert len(stored("ILLIQ", 730)["columns"]["t"]) == 730
+    assert len(polygon.requests) == 1
+    assert polygon.requests[0][1] == days[-1]
+
+
+def test_store_new_listing_is_not_refetched(polygon):
+    polygon.bars["NEW"] = daily_bars(trading_days(100))
+    assert len(stored("NEW", 730)["columns"]["t"]) == 100
+
+    polygon.requests.clear()
+    assert len(stored("NEW", 730)["columns"]["t"]) == 100
+    assert len(polygon.requests) == 1
+
+
+# ---------------- BarStore on disk ----------------
+
+def columns_of(bars):
+    return {name: np.array([b.get(name, np.nan) for b in bars], dtype=dtype)
+            for name, dtype in bar_store.COLUMNS.items()}
+
+
+def test_append_truncates_bytes_past_the_manifest(tmp_path):
+    store = BarStore(str(tmp_path))
+    bars = [bar(1_000 * i, 100.0 + i) for i in range(1, 11)]
+    store.append("AAPL", "day", columns_of(bars[:5]))
+
+    # A crashed append: bytes written to every column, manifest never updated
+    for name, dtype in bar_store.COLUMNS.items():
+        with open(tmp_path / "day" / "AAPL" / f"{name}.bin", "ab") as f:
+            f.write(np.full(3, 7, dtype=dtype).tobytes())
+    assert store.read("AAPL", "day")["resultsCount"] == 5
+
+    store.append("AAPL", "day", columns_of(bars[5:]))
+    candles = store.read("AAPL", "day")
+    assert list(candles["columns"]["t"]) == [b["t"] for b in bars]
+    assert list(candles["columns"]["c"]) == [b["c"] for b in bars]
+    assert (tmp_path / "day" / "AAPL" / "c.bin").stat().st_size == 10 * 8
+
+
+def test_append_skips_bars_already_stored(tmp_path):
+    store = BarStore(str(tmp_path))
+    bars = [bar(1_000 * i, 100.0 + i) for i in range(1, 9)]
+    store.append("AAPL", "day", columns_of(bars[:5]), covered_from_ms=500)
+    # The tail fetch starts at the last stored bar's date, so it overlaps
+    store.append("AAPL", "day", columns_of(bars[3:]))
+
+    manifest = store.manifest("AAPL", "day")
+    assert manifest == {"rows": 8, "first_t": 1_000, "last_t": 8_000, "from_t": 500}
+    assert list(store.read("AAPL", "day")["columns"]["t"]) == [b["t"] for b in bars]
+    assert list(store.read("AAPL", "day", limit=3)["columns"]["t"]) == [6_000, 7_000, 8_000]
+
+
+def test_clear_removes_everything(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append("AAPL", "day", columns_of([bar(1_000)]))
+    store.clear("AAPL", "day")
+    assert store.manifest("AAPL", "day") is None
+    assert store.read("AAPL", "day") is None
+
+
+# ---------------- get_candles_stored ----------------
+
+def test_tail_fetch_appends_only_new_bars(polygon):
+    days = trading_days(300)
+    polygon.bars["AAPL"] = daily_bars(days[:-5])
+    assert len(stored("AAPL", 200)["columns"]["t"]) == 200
+
+    polygon.bars["AAPL"] = daily_bars(days)
+    polygon.requests.clear()
+    candles = stored("AAPL", 200)
+    assert polygon.requests == [("AAPL", days[-6], polygon.requests[0][2])]
+    assert list(candles["columns"]["t"]) == [b["t"] for b in polygon.bars["AAPL"][-200:]]
+    manifest = bar_store.store.manifest("AAPL", "day")
+    assert manifest["last_t"] == polygon.bars["AAPL"][-1]["t"]
+    assert manifest["rows"] == len(set(b["t"] for b in polygon.bars["AAPL"][-200 - 5:]))
+
+
+def test_forming_bar_is_served_but_not_stored(polygon):
+    days = trading_days(250)
+    start = session_ms(days[-1], 0, 0)
+    # Today's daily bar closes at the end of the day
+    forming = bar(session_ms(datetime.now(MARKET_TZ).date(), 0, 0), 555.0)
+    polygon.bars["AAPL"] = daily_bars(days) + [forming]
+
+    candles = stored("AAPL", 200)
+    assert candles["columns"]["t"][-1] == forming["t"]
+    assert candles["columns"]["c"][-1] == 555.0
+    assert len(candles["columns"]["t"]) == 200
+    assert bar_store.store.manifest("AAPL", "day")["last_t"] == start
+
+
+def test_refresh_rewrites_the_window(polygon):
+    days = trading_days(250)
+    polygon.bars["AAPL"] = daily_bars(days)
+    stored("AAPL", 200)
+
+    # A split: every historical close changes
+    polygon.bars["AAPL"] = [dict(b, c=b["c"] / 2) for b in polygon.bars["AAPL"]]
+    assert stored("AAPL", 200)["columns"]["c"][0] == polygon.bars["AAPL"][-200]["c"] * 2
+    refreshed = stored("AAPL", 200, refresh=True)
+    assert list(refreshed["columns"]["c"]) == [b["c"] for b in polygon.bars["AAPL"][-200:]]
+    assert bar_store.store.manifest("AAPL", "day")["rows"] == 200
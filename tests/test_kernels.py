@@ -0,0 +1,205 @@
+"""
+Golden tests: tradepilot_engine.kernels against the pandas/NumPy code they replaced
+
+Each kernel is compared with its pandas rolling/ewm (or np.percentile /
+np.polyfit) counterpart on random series with NaN and ±inf, one symbol and
+a (symbols, bars) matrix. analyze() is compared layer by layer with
+golden/analyze_day.json, recorded from the pandas layers before the port
+(commit 677ae96) on the synthetic series in synthetic.py.
+"""
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic import make_candles
+from tradepilot_engine import TradePilotEngine, kernels
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "analyze_day.json")
+
+# name -> (seed, bars, flat runs), as recorded in the golden file
+GOLDEN_CASES = {"seed0": (0, 730, 0), "seed1": (1, 730, 0), "seed2": (2, 730, 0), "seed3": (3, 1500, 0),
+                "flat4": (4, 730, 6), "flat5": (5, 1200, 10)}
+
+WINDOWS = [1, 2, 3, 9, 14, 26, 52, 200]
+
+
+def random_series(seed: int, bars: int = 400, gaps: bool = True) -> np.ndarray:
+    """Random walk with scattered NaN, +inf and -inf"""
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(0, 1, bars))
+    if gaps:
+        x[rng.choice(bars, 8, replace=False)] = np.nan
+        x[rng.choice(bars, 3, replace=False)] = np.inf
+        x[rng.choice(bars, 3, replace=False)] = -np.inf
+    return x
+
+
+def assert_same(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def pandas_rolling(x: np.ndarray, window: int, how: str) -> np.ndarray:
+    return getattr(pd.Series(x).rolling(window), how)().to_numpy()
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("kernel,how", [
+    (kernels.rolling_sum, "sum"),
+    (kernels.rolling_mean, "mean"),
+    (kernels.rolling_max, "max"),
+    (kernels.rolling_min, "min"),
+])
+def test_rolling_matches_pandas(kernel, how, seed, window):
+    x = random_series(seed)
+    assert_same(kernel(x, window), pandas_rolling(x, window, how))
+
+
+@pytest.mark.parametrize("kernel,how", [
+    (kernels.rolling_sum, "sum"),
+    (kernels.rolling_max, "max"),
+    (kernels.rolling_min, "min"),
+])
+def test_rolling_rows_match_pandas(kernel, how):
+    matrix = np.vstack([random_series(seed, 150) for seed in range(5)])
+    out = kernel(matrix, 14)
+    for row, x in zip(out, matrix):
+        assert_same(row, pandas_rolling(x, 14, how))
+
+
+@pytest.mark.parametrize("kernel", [kernels.rolling_sum, kernels.rolling_max, kernels.rolling_min])
+def test_rolling_window_longer_than_series(kernel):
+    assert np.isnan(kernel(random_series(0, 10), 20)).all()
+
+
+@pytest.mark.parametrize("span", [3, 9, 12, 26])
+@pytest.mark.parametrize("seed", range(3))
+def test_ema_matches_pandas(seed, span):
+    x = random_series(seed, gaps=False)
+    assert_same(kernels.ema(x, span), pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy())
+
+
+def test_ema_skips_leading_nan_rows():
+    matrix = np.vstack([random_series(seed, 120, gaps=False) for seed in range(3)])
+    matrix[1, :30] = np.nan
+    matrix[2, :119] = np.nan
+    out = kernels.ema(matrix, 12)
+    for row, x in zip(out, matrix):
+        assert_same(row, pd.Series(x).ewm(span=12, adjust=False).mean().to_numpy())
+
+
+def test_ema_propagates_interior_non_finite():
+    # Documented divergence: pandas' ewm skips interior NaN/inf, the kernel propagates them
+    x = random_series(0, 60, gaps=False)
+    x[20] = np.nan
+    x[40] = np.inf
+    out = kernels.ema(x, 9)
+    assert_same(out[:20], pd.Series(x[:20]).ewm(span=9, adjust=False).mean().to_numpy())
+    assert np.isnan(out[20:]).all()
+
+
+def test_cumsum_matches_pandas():
+    x = random_series(1)
+    x[np.isinf(x)] = 1.0
+    assert_same(kernels.cumsum(x), pd.Series(x).cumsum().to_numpy())
+
+
+def test_shift_and_diff_match_pandas():
+    x = random_series(2)
+    s = pd.Series(x)
+    assert_same(kernels.shift(x, 1), s.shift(1).to_numpy())
+    assert_same(kernels.shift(x, 5), s.shift(5).to_numpy())
+    with np.errstate(invalid="ignore"):
+        assert_same(kernels.diff(x), s.diff().to_numpy())
+
+
+def test_true_range_matches_pandas():
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 1, 300))
+    high = close + rng.uniform(0, 2, 300)
+    low = close - rng.uniform(0, 2, 300)
+    prev_close = pd.Series(close).shift(1)
+    expected = pd.concat([
+        pd.Series(high - low), (pd.Series(high) - prev_close).abs(), (pd.Series(low) - prev_close).abs(),
+    ], axis=1).max(axis=1, skipna=False).to_numpy()
+    assert_same(kernels.true_range(high, low, close), expected)
+
+
+@pytest.mark.parametrize("window", [14, 20, 50])
+def test_trailing_reductions_match_pandas(window):
+    for seed in range(6):
+        x = random_series(seed, 80)
+        for kernel, how in ((kernels.trailing_mean, "mean"), (kernels.trailing_max, "max"),
+                            (kernels.trailing_min, "min")):
+            with np.errstate(invalid="ignore"):  # inf - inf inside a window
+                actual = kernel(x, window)
+            assert_same(actual, pandas_rolling(x, window, how)[-1])
+
+
+def test_linreg_slope_matches_polyfit():
+    x = random_series(4, 20, gaps=False)
+    assert math.isclose(kernels.linreg_slope(x), np.polyfit(np.arange(20), x, 1)[0], rel_tol=1e-9)
+    rolling = kernels.rolling_linreg_slope(x, 5)
+    assert np.isnan(rolling[:4]).all()
+    for end in range(5, 21):
+        assert math.isclose(rolling[end - 1], np.polyfit(np.arange(5), x[end - 5:end], 1)[0],
+                            rel_tol=1e-9, abs_tol=1e-12)
+
+
+@pytest.mark.parametrize("window", [7, 50, 100])
+def test_rolling_percentiles_match_numpy(window):
+    x = np.abs(random_series(5, 300, gaps=False))
+    x[[60, 200]] = np.nan
+    percentiles = [20, 40, 60, 80]
+    outs = kernels.rolling_percentiles(x, window, percentiles)
+    for end in range(window, len(x) + 1):
+        expected = np.percentile(x[end - window:end], percentiles)
+        for out, value in zip(outs, expected):
+            assert_same(out[end - 1], value)
+    for out in outs:
+        assert np.isnan(out[:window - 1]).all()
+
+
+# ---------------- Layer outputs against the pandas implementation ----------------
+
+def _assert_matches(actual, expected, path):
+    # JSON types are part of the wire format (60 and 60.0 render differently)
+    if expected is not None and not (isinstance(expected, float) and math.isnan(expected)):
+        assert type(actual) is type(expected), f"{path}: {type(actual).__name__} != {type(expected).__name__}"
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), path
+        for key in expected:
+            _assert_matches(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _assert_matches(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) and not isinstance(actual, bool):
+        if math.isnan(expected):
+            assert actual is None or math.isnan(actual), path
+        else:
+            assert actual == pytest.approx(expected, rel=1e-6, abs=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture(scope="module")
+def golden():
+    with open(GOLDEN) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("case", GOLDEN_CASES)
+def test_analyze_matches_pandas_layers(golden, case):
+    seed, bars, flat_runs = GOLDEN_CASES[case]
+    result = TradePilotEngine().analyze(make_candles(seed, bars, flat_runs), "SYM", "day")
+    # Same normalization as the recording (datetimes as strings)
+    result = json.loads(json.dumps(result, default=str))
+    expected = golden[case]
+    for layer, outputs in expected["layers"].items():
+        _assert_matches(result["layers"][layer], outputs, layer)
+    _assert_matches(result, expected, case)
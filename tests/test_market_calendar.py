@@ -0,0 +1,112 @@
+"""
+NYSE calendar tables and plan_range spans
+
+Expected dates are the published NYSE holiday and early-close schedules.
+"""
+from datetime import date, datetime, time as dtime
+
+import pytest
+
+from market_calendar import MARKET_TZ, early_closes, holidays, is_trading_day, plan_range, session_bounds
+
+HOLIDAYS = {
+    2021: [date(2021, 1, 1), date(2021, 1, 18), date(2021, 2, 15), date(2021, 4, 2), date(2021, 5, 31),
+           date(2021, 7, 5), date(2021, 9, 6), date(2021, 11, 25), date(2021, 12, 24)],
+    # New Year's Day on a Saturday: no Friday closure; Juneteenth (Sunday) observed Monday
+    2022: [date(2022, 1, 17), date(2022, 2, 21), date(2022, 4, 15), date(2022, 5, 30), date(2022, 6, 20),
+           date(2022, 7, 4), date(2022, 9, 5), date(2022, 11, 24), date(2022, 12, 26)],
+    2023: [date(2023, 1, 2), date(2023, 1, 16), date(2023, 2, 20), date(2023, 4, 7), date(2023, 5, 29),
+           date(2023, 6, 19), date(2023, 7, 4), date(2023, 9, 4), date(2023, 11, 23), date(2023, 12, 25)],
+    2024: [date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+           date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25)],
+    # Independence Day on a Saturday: observed Friday July 3
+    2026: [date(2026, 1, 1), date(2026, 1, 19), date(2026, 2, 16), date(2026, 4, 3), date(2026, 5, 25),
+           date(2026, 6, 19), date(2026, 7, 3), date(2026, 9, 7), date(2026, 11, 26), date(2026, 12, 25)],
+    # Juneteenth and Christmas on Saturdays: observed Fridays; New Year's Day 2028 (Saturday) is not
+    2027: [date(2027, 1, 1), date(2027, 1, 18), date(2027, 2, 15), date(2027, 3, 26), date(2027, 5, 31),
+           date(2027, 6, 18), date(2027, 7, 5), date(2027, 9, 6), date(2027, 11, 25), date(2027, 12, 24)],
+}
+
+EARLY_CLOSES = {
+    2021: [date(2021, 11, 26)],                     # July 3 a Saturday, Dec 24 a holiday
+    2022: [date(2022, 11, 25)],                     # July 3 a Sunday, Dec 24 a Saturday
+    2023: [date(2023, 7, 3), date(2023, 11, 24)],   # Dec 24 a Sunday
+    2024: [date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24)],
+    2026: [date(2026, 11, 27), date(2026, 12, 24)],  # July 3 a holiday
+}
+
+
+@pytest.mark.parametrize("year", HOLIDAYS)
+def test_holidays(year):
+    assert sorted(holidays(year)) == HOLIDAYS[year]
+
+
+def test_juneteenth_from_2022_only():
+    assert date(2021, 6, 18) not in holidays(2021)
+    assert is_trading_day(date(2021, 6, 18))
+    assert date(2022, 6, 20) in holidays(2022)
+
+
+@pytest.mark.parametrize("year", EARLY_CLOSES)
+def test_early_closes(year):
+    assert sorted(early_closes(year)) == EARLY_CLOSES[year]
+
+
+def test_session_bounds():
+    assert session_bounds(date(2024, 11, 29)) == (
+        datetime(2024, 11, 29, 9, 30, tzinfo=MARKET_TZ), datetime(2024, 11, 29, 13, 0, tzinfo=MARKET_TZ))
+    assert session_bounds(date(2024, 11, 29), extended=True)[1].time() == dtime(17, 0)
+    assert session_bounds(date(2024, 11, 27), extended=True) == (
+        datetime(2024, 11, 27, 4, 0, tzinfo=MARKET_TZ), datetime(2024, 11, 27, 20, 0, tzinfo=MARKET_TZ))
+
+
+# Friday after Thanksgiving 2024, after its 13:00 close
+THANKSGIVING_FRIDAY = datetime(2024, 11, 29, 15, 0, tzinfo=MARKET_TZ)
+
+
+@pytest.mark.parametrize("tf,bars,start", [
+    # Daily: Thanksgiving (Nov 28) is skipped
+    ("day", 1, date(2024, 11, 29)),
+    ("day", 2, date(2024, 11, 27)),
+    ("day", 5, date(2024, 11, 22)),
+    # Minute: 210 bars in the half session, 390 in a full one
+    ("minute", 210, date(2024, 11, 29)),
+    ("minute", 211, date(2024, 11, 27)),
+    ("minute", 600, date(2024, 11, 27)),
+    ("minute", 601, date(2024, 11, 26)),
+    # Hour (clock-aligned): 4 bars on the half day (9:00-12:00), 7 on a full one
+    ("hour", 4, date(2024, 11, 29)),
+    ("hour", 11, date(2024, 11, 27)),
+    ("hour", 12, date(2024, 11, 26)),
+    # Calendar periods
+    ("week", 1, date(2024, 11, 25)),
+    ("week", 3, date(2024, 11, 11)),
+    ("month", 3, date(2024, 9, 1)),
+])
+def test_plan_range_thanksgiving_week(tf, bars, start):
+    assert plan_range(tf, bars, now=THANKSGIVING_FRIDAY) == (start, date(2024, 11, 29))
+
+
+def test_plan_range_good_friday_and_before_the_open():
+    # Monday after Good Friday 2024 (March 29), mid-session
+    monday = datetime(2024, 4, 1, 10, 0, tzinfo=MARKET_TZ)
+    assert plan_range("day", 2, now=monday) == (date(2024, 3, 28), date(2024, 4, 1))
+    # Before the open today's bar doesn't exist yet
+    early = datetime(2024, 4, 1, 8, 0, tzinfo=MARKET_TZ)
+    assert plan_range("day", 1, now=early) == (date(2024, 3, 28), date(2024, 4, 1))
+    # 30 minutes into the session: 30 minute bars today, the rest from Thursday
+    assert plan_range("minute", 30, now=monday) == (date(2024, 4, 1), date(2024, 4, 1))
+    assert plan_range("minute", 31, now=monday) == (date(2024, 3, 28), date(2024, 4, 1))
+
+
+def test_plan_range_extended_hours():
+    # 16 extended hours on a full day, 13 (04:00-17:00) on the half day
+    assert plan_range("hour", 13, now=THANKSGIVING_FRIDAY.replace(hour=18), extended=True)[0] == date(2024, 11, 29)
+    assert plan_range("hour", 14, now=THANKSGIVING_FRIDAY.replace(hour=18), extended=True)[0] == date(2024, 11, 27)
+    assert plan_range("hour", 29, now=THANKSGIVING_FRIDAY.replace(hour=18), extended=True)[0] == date(2024, 11, 27)
+    assert plan_range("hour", 30, now=THANKSGIVING_FRIDAY.replace(hour=18), extended=True)[0] == date(2024, 11, 26)
+
+
+def test_plan_range_unknown_timeframe():
+    with pytest.raises(ValueError):
+        plan_range("decade", 10)
@@ -0,0 +1,131 @@
+"""
+Option analytics: implied-volatility round trips, greeks against finite
+differences of bs_price, and NaN for contracts no volatility can price
+"""
+import numpy as np
+import pytest
+
+from option_analytics import bs_greeks, bs_price, chain_analytics, implied_volatility
+
+S, R, Q = 100.0, 0.04, 0.01
+# Strikes from deep in to deep out of the money, expiries from a day to three years
+STRIKES = [40, 60, 80, 95, 100, 105, 120, 150, 250]
+YEARS = [1 / 365, 7 / 365, 0.25, 1, 3]
+SIGMAS = [0.05, 0.2, 0.5, 1.5, 3.0]
+
+
+def grid():
+    K, T, sigma, is_call = (a.ravel() for a in np.meshgrid(STRIKES, YEARS, SIGMAS, [True, False], indexing="ij"))
+    return K.astype(float), T, sigma, is_call
+
+
+def intrinsic(K, T, is_call):
+    """The discounted intrinsic value: implied_volatility's lower bound"""
+    spot, strike = S * np.exp(-Q * T), K * np.exp(-R * T)
+    return np.maximum(np.where(is_call, spot - strike, strike - spot), 0)
+
+
+def test_implied_volatility_round_trip():
+    K, T, sigma, is_call = grid()
+    price = bs_price(S, K, T, R, sigma, is_call, Q)
+    iv = implied_volatility(price, S, K, T, R, is_call, Q)
+    time_value = price - intrinsic(K, T, is_call)
+
+    # Any time value at all is solved and reproduces the price ...
+    solvable = time_value > 0
+    assert np.isfinite(iv[solvable]).all()
+    np.testing.assert_allclose(bs_price(S, K, T, R, iv, is_call, Q)[solvable], price[solvable],
+                               rtol=1e-9, atol=1e-12)
+    # ... and a time value of at least a millionth of a dollar pins the volatility
+    resolved = time_value > 1e-6
+    assert resolved.sum() > 0.7 * len(price)
+    np.testing.assert_allclose(iv[resolved], sigma[resolved], rtol=1e-7)
+
+    # Deep in the money over a day or a week the price is all intrinsic value
+    assert np.isnan(iv[~solvable]).all()
+
+
+def test_implied_volatility_round_trip_deep_in_and_out_of_the_money():
+    K = np.array([50.0, 50.0, 200.0, 200.0])
+    is_call = np.array([True, False, True, False])
+    price = bs_price(S, K, 1.0, R, 0.4, is_call, Q)
+    np.testing.assert_allclose(implied_volatility(price, S, K, 1.0, R, is_call, Q), 0.4, rtol=1e-8)
+
+
+@pytest.mark.parametrize("is_call", [True, False])
+def test_prices_at_or_below_intrinsic_are_nan(is_call):
+    K = np.array([80.0, 100.0, 120.0])
+    floor = intrinsic(K, 0.5, is_call)
+    for price in (floor, floor - 0.01, np.zeros(3)):
+        assert np.isnan(implied_volatility(price, S, K, 0.5, R, is_call, Q)).all()
+
+
+def test_prices_at_or_above_the_upper_bound_are_nan():
+    T = 0.5
+    call_bound, put_bound = S * np.exp(-Q * T), 100 * np.exp(-R * T)
+    price = [call_bound, call_bound + 1, put_bound, put_bound + 1]
+    is_call = [True, True, False, False]
+    assert np.isnan(implied_volatility(price, S, 100.0, T, R, is_call, Q)).all()
+
+
+def test_unsolvable_contracts_are_nan_without_affecting_the_rest():
+    price = np.array([5.0, np.nan, np.inf, 5.0, 5.0, 5.0, 5.0, 5.0])
+    spot = np.array([S, S, S, 0.0, S, S, S, np.nan])
+    strike = np.array([100.0, 100.0, 100.0, 100.0, 0.0, 100.0, 100.0, 100.0])
+    years = np.array([0.5, 0.5, 0.5, 0.5, 0.5, 0.0, -0.1, 0.5])
+    iv = implied_volatility(price, spot, strike, years, R, True, Q)
+    assert np.isfinite(iv[0])
+    assert np.isnan(iv[1:]).all()
+    assert bs_price(S, 100.0, 0.5, R, iv[0], True, Q) == pytest.approx(5.0, rel=1e-9)
+
+
+def test_unsolvable_contracts_get_nan_greeks():
+    greeks = bs_greeks(S, 100.0, 0.5, R, np.array([0.3, np.nan]), True, Q)
+    for name, values in greeks.items():
+        assert np.isfinite(values[0]), name
+        assert np.isnan(values[1]), name
+
+
+def test_chain_analytics_leaves_unpriced_contracts_nan():
+    now = 1_700_000_000  # 2023-11-14
+    columns = {
+        "ticker": np.array(["O:A", "O:B", "O:C"]),
+        "type": np.array(["call", "put", "call"]),
+        "expiration": np.array(["2024-06-21"] * 3),
+        "strike": np.array([100.0, 100.0, 60.0]),
+        "bid": np.array([6.0, 0.0, 0.0]),
+        "ask": np.array([6.2, 0.0, 0.0]),
+        "close": np.array([6.5, 0.0, 1.0]),  # no quote and no trade; C below intrinsic
+    }
+    out = chain_analytics(columns, S, rate=R, now=now)
+    assert out["price"][0] == pytest.approx(6.1)
+    for name in ("iv", "delta", "gamma", "theta", "vega", "rho"):
+        assert np.isfinite(out[name][0]), name
+        assert np.isnan(out[name][1:]).all(), name
+
+
+# ---------------- Greeks against finite differences of bs_price ----------------
+
+@pytest.mark.parametrize("is_call", [True, False])
+@pytest.mark.parametrize("T", [0.1, 1.0])
+@pytest.mark.parametrize("K", [80.0, 100.0, 130.0])
+def test_greeks_match_finite_differences(K, T, is_call):
+    sigma, q = 0.3, 0.02
+    greeks = bs_greeks(S, K, T, R, sigma, is_call, q)
+
+    def price(S=S, T=T, r=R, sigma=sigma):
+        return float(bs_price(S, K, T, r, sigma, is_call, q))
+
+    h = 1e-3
+    assert greeks["price"] == pytest.approx(price(), rel=1e-12)
+    assert greeks["delta"] == pytest.approx((price(S=S + h) - price(S=S - h)) / (2 * h), rel=1e-6, abs=1e-9)
+    h = 1e-2
+    gamma = (price(S=S + h) - 2 * price() + price(S=S - h)) / h ** 2
+    assert greeks["gamma"] == pytest.approx(gamma, rel=1e-5)
+    h = 1e-5
+    # Vega and rho per 1 point (0.01), theta per calendar day as time passes
+    assert greeks["vega"] == pytest.approx((price(sigma=sigma + h) - price(sigma=sigma - h)) / (2 * h) / 100,
+                                           rel=1e-6)
+    assert greeks["rho"] == pytest.approx((price(r=R + h) - price(r=R - h)) / (2 * h) / 100, rel=1e-6)
+    h = 1e-6
+    assert greeks["theta"] == pytest.approx(-(price(T=T + h) - price(T=T - h)) / (2 * h) / 365, rel=1e-5)
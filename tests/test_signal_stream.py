@@ -0,0 +1,69 @@
+"""
+SignalScheduler polling loop: error retries and re-warming evicted streams
+"""
+import asyncio
+import time
+
+import numpy as np
+
+import signal_stream
+from signal_stream import SignalScheduler, Topic
+from tradepilot_engine import TradePilotEngine
+
+
+def test_errors_are_retried_before_the_next_bar_close(monkeypatch):
+    monkeypatch.setattr(signal_stream, "SSE_RETRY_SECONDS", 0.01)
+    # A daily topic over a weekend: the next close is days away
+    monkeypatch.setattr(signal_stream, "next_bar_close", lambda tf, now: now + 3 * 86400)
+    calls = []
+
+    async def warm(topic):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            return {"error": "Polygon unavailable"}
+        topic.last_t = 1
+        return {"layers": {}, "overall_signal": {"recommendation": "HOLD"}}
+
+    async def run():
+        scheduler = SignalScheduler(engine=None)
+        monkeypatch.setattr(scheduler, "_warm", warm)
+        subscription = scheduler.subscribe([("AAPL", "day")])
+        for _ in range(200):
+            if len(calls) >= 3:
+                break
+            await asyncio.sleep(0.01)
+        stats = scheduler.stats()
+        events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        await scheduler.close()
+        return stats, events
+
+    stats, events = asyncio.run(run())
+    assert len(calls) == 3
+    assert stats["errors"] == 2
+    assert [frame.split(b"\n", 1)[0] for frame in events] == [b"event: error", b"event: error", b"event: snapshot"]
+
+
+def test_evicted_stream_is_rewarmed(monkeypatch):
+    closed = int(time.time() - 7 * 86400) * 1000
+    columns = {key: np.array([100.0, 101.0]) for key in ("o", "h", "l", "c", "v")}
+    columns["t"] = np.array([closed - 86_400_000, closed])
+
+    async def get_candles(symbol, tf, limit, columnar):
+        return {"columns": columns}
+
+    warmed = []
+
+    async def warm(topic):
+        warmed.append(topic.symbol)
+        return {"layers": {}}
+
+    monkeypatch.setattr(signal_stream, "feed", None)
+    monkeypatch.setattr(signal_stream, "get_candles", get_candles)
+    # max_streams evicted this topic's stream after its last poll
+    scheduler = SignalScheduler(TradePilotEngine(max_streams=1))
+    monkeypatch.setattr(scheduler, "_warm", warm)
+    topic = Topic("AAPL", "day")
+    topic.last_t = closed - 86_400_000
+
+    assert asyncio.run(scheduler._advance(topic)) == {"layers": {}}
+    assert warmed == ["AAPL"]
@@ -0,0 +1,100 @@
+"""
+Streaming: start_stream/update against analyze() on the growing history
+
+Every update() advances the incremental indicator state by one bar; its
+result must match analyze() on all bars so far. Also covers the
+max_streams LRU bound on warm streams.
+"""
+import math
+
+import pytest
+
+from synthetic import make_candles
+from tradepilot_engine import TradePilotEngine
+
+WARM_BARS = 300
+UPDATES = 60
+
+# name -> (seed, bars, flat runs)
+SERIES = {"random": (40, WARM_BARS + UPDATES, 0), "flat": (41, WARM_BARS + UPDATES, 6)}
+
+
+def assert_close(actual, expected, path):
+    """Equal structures, floats to 1e-9 (running sums round differently from fresh ones)"""
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(actual), path
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("series", SERIES)
+def test_updates_match_analyze_on_the_growing_history(series):
+    results = make_candles(*SERIES[series])["results"]
+    engine = TradePilotEngine()
+
+    warm = engine.start_stream({"results": results[:WARM_BARS]}, "SYM", "day")
+    assert_close(warm["layers"], engine.analyze({"results": results[:WARM_BARS]}, "SYM", "day")["layers"], "warm")
+
+    for end in range(WARM_BARS + 1, len(results) + 1):
+        streamed = engine.update("SYM", results[end - 1], "day")
+        expected = engine.analyze({"results": results[:end]}, "SYM", "day")
+        assert streamed["latest_price"] == expected["latest_price"]
+        assert streamed["latest_datetime"] == expected["latest_datetime"]
+        assert_close(streamed["layers"], expected["layers"], f"bar {end}")
+        assert_close(streamed["overall_signal"], expected["overall_signal"], f"bar {end}")
+
+
+def test_update_returns_the_selected_layers():
+    results = make_candles(42, WARM_BARS + 1)["results"]
+    engine = TradePilotEngine()
+    engine.start_stream({"results": results[:WARM_BARS]}, "SYM", "day")
+    streamed = engine.update("SYM", results[-1], "day", layers=["layer_9_confirmation"])
+    assert list(streamed["layers"]) == ["layer_9_confirmation"]
+    expected = engine.analyze({"results": results}, "SYM", "day", layers=["layer_9_confirmation"])
+    assert_close(streamed["layers"], expected["layers"], "layer_9")
+
+
+def test_update_without_a_stream_raises():
+    with pytest.raises(ValueError, match="start_stream"):
+        TradePilotEngine().update("SYM", {"o": 1, "h": 1, "l": 1, "c": 1, "v": 1}, "day")
+
+
+def test_max_streams_evicts_the_least_recently_used():
+    results = make_candles(43, 201)["results"]
+    history = {"results": results[:200]}
+    engine = TradePilotEngine(max_streams=2)
+
+    engine.start_stream(history, "A", "day")
+    engine.start_stream(history, "B", "day")
+    engine.update("A", results[-1], "day")  # A is now the most recently used
+    engine.start_stream(history, "C", "day")
+
+    assert not engine.has_stream("B", "day")
+    assert engine.has_stream("A", "day") and engine.has_stream("C", "day")
+    with pytest.raises(ValueError):
+        engine.update("B", results[-1], "day")
+
+    stats = engine.stream_stats()
+    assert stats["streams"] == 2
+    assert stats["max_streams"] == 2
+    assert stats["evicted"] == 1
+    assert stats["memory_bytes"] > 0
+
+
+def test_restarting_a_stream_does_not_evict():
+    history = make_candles(44, 200)
+    engine = TradePilotEngine(max_streams=2)
+    for symbol in ("A", "B", "A", "B"):
+        engine.start_stream(history, symbol, "day")
+    assert list(engine.streams) == [("A", "day"), ("B", "day")]
+    assert engine.stream_stats()["evicted"] == 0
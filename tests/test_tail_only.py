@@ -0,0 +1,52 @@
+"""
+Parity: tail-only evaluation against full-history evaluation
+
+analyze(tail_only=True) evaluates the indicators over the selected layers'
+lookback only; every layer must return exactly what the full history gives,
+whether all layers run or just one (which shrinks the lookback to that
+layer and its dependencies).
+"""
+import pytest
+
+from synthetic import make_candles
+from tradepilot_engine import TradePilotEngine
+
+# name -> (seed, bars, flat runs)
+SERIES = {
+    "730": (10, 730, 0),
+    "730-flat": (11, 730, 8),
+    "2000": (12, 2000, 0),
+    "5000-flat": (13, 5000, 25),
+    "20000": (14, 20000, 0),
+    "20000-flat": (15, 20000, 60),
+}
+
+ENGINE = TradePilotEngine()
+
+
+def assert_equal_outputs(tail, full):
+    """Equal layer outputs (NaN equals NaN)"""
+    assert tail.keys() == full.keys()
+    for layer in full:
+        assert tail[layer] == pytest.approx(full[layer], rel=0, abs=0, nan_ok=True), layer
+
+
+@pytest.fixture(scope="module", params=SERIES)
+def candles(request):
+    seed, bars, flat_runs = SERIES[request.param]
+    return make_candles(seed, bars, flat_runs)
+
+
+def test_all_layers(candles):
+    tail = ENGINE.analyze(candles, "SYM", "day", tail_only=True)
+    full = ENGINE.analyze(candles, "SYM", "day", tail_only=False)
+    assert_equal_outputs(tail["layers"], full["layers"])
+    assert tail["overall_signal"] == full["overall_signal"]
+
+
+@pytest.mark.parametrize("layer", list(ENGINE.layers))
+def test_single_layer(candles, layer):
+    tail = ENGINE.analyze(candles, "SYM", "day", layers=[layer], tail_only=True)
+    full = ENGINE.analyze(candles, "SYM", "day", layers=[layer], tail_only=False)
+    assert list(tail["layers"]) == [layer]
+    assert_equal_outputs(tail["layers"], full["layers"])
@@ -0,0 +1,165 @@
+"""
+Parity: analyze_universe against per-symbol analyze()
+
+universe.score_features restates every layer's rules over arrays; each row
+of analyze_universe must give what analyze() returns for that symbol on its
+own. The histories are ragged (stack_candles left-pads the shorter ones
+with NaN) and include flat runs and a symbol below validate_data's minimum.
+signal_history (series_features at every bar of one symbol) is held to
+analyze() and get_signal_summary() on the history ending at each bar.
+"""
+import numpy as np
+import pytest
+
+from synthetic import make_candles
+from tradepilot_engine import TradePilotEngine, universe
+
+# symbol -> (seed, bars, flat runs)
+HISTORIES = {
+    "LONG": (20, 1500, 0),
+    "MID": (21, 730, 0),
+    "FLAT": (22, 600, 8),
+    "SHORT": (23, 260, 0),
+    "MIN": (24, 200, 0),
+    "NEW": (25, 150, 0),
+}
+
+# analyze_universe column -> (layer, key) in analyze()'s output
+LAYER_COLUMNS = {
+    "momentum_score": ("layer_1_momentum", "momentum_score"),
+    "momentum_signal": ("layer_1_momentum", "signal"),
+    "rsi": ("layer_1_momentum", "rsi"),
+    "macd_hist": ("layer_1_momentum", "macd_hist"),
+    "adx": ("layer_1_momentum", "adx"),
+    "trend_direction": ("layer_1_momentum", "trend_direction"),
+    "volume_flow_score": ("layer_2_volume", "volume_flow_score"),
+    "volume_signal": ("layer_2_volume", "signal"),
+    "cdv_slope": ("layer_3_divergence", "cdv_slope"),
+    "divergence_signal": ("layer_3_divergence", "signal"),
+    "rvol": ("layer_4_volume_strength", "rvol"),
+    "volume_strength_signal": ("layer_4_volume_strength", "signal"),
+    "trend_score": ("layer_5_trend", "trend_score"),
+    "trend_signal": ("layer_5_trend", "signal"),
+    "structure_bias": ("layer_6_structure", "bias"),
+    "liquidity_score": ("layer_7_liquidity", "liquidity_score"),
+    "liquidity_signal": ("layer_7_liquidity", "signal"),
+    "atrp": ("layer_8_volatility_regime", "atrp"),
+    "volatility_regime": ("layer_8_volatility_regime", "regime"),
+    "confirmation_signal": ("layer_9_confirmation", "confirmation_signal"),
+    "confirmation": ("layer_9_confirmation", "signal"),
+    "pattern_score": ("layer_10_candle_intelligence", "pattern_score"),
+    "candle_signal": ("layer_10_candle_intelligence", "signal"),
+}
+
+OVERALL_COLUMNS = ("weighted_signal", "confidence", "direction", "recommendation")
+
+# get_signal_summary key -> signal_history field
+SUMMARY_FIELDS = {
+    "latest_price": "latest_price",
+    "momentum_bias": "momentum_signal",
+    "momentum_score": "momentum_score",
+    "trend_direction": "trend_direction",
+    "trend_strength": "adx",
+    "volume_flow": "volume_flow_score",
+    "volatility_regime": "volatility_regime",
+    "structure_bias": "structure_bias",
+    "confirmation_signal": "confirmation",
+    "overall_signal": "direction",
+    "overall_confidence": "confidence",
+    "recommendation": "recommendation",
+}
+
+ENGINE = TradePilotEngine()
+
+
+def assert_same_value(actual, expected, label):
+    if isinstance(expected, str):
+        assert actual == expected, label
+    else:
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), label
+
+
+@pytest.fixture(scope="module")
+def candles():
+    return {symbol: make_candles(*spec) for symbol, spec in HISTORIES.items()}
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["full", "tail_only"])
+def table(request, candles):
+    symbols, bars = universe.stack_candles(candles)
+    return ENGINE.analyze_universe(symbols, bars, tail_only=request.param)
+
+
+def test_stack_candles_right_aligns_ragged_histories(candles):
+    symbols, bars = universe.stack_candles(candles)
+    assert symbols == list(HISTORIES)
+    assert bars["close"].shape == (len(HISTORIES), max(spec[1] for spec in HISTORIES.values()))
+    for row, (symbol, (_, length, _)) in enumerate(HISTORIES.items()):
+        closes = bars["close"][row]
+        assert np.isnan(closes[:-length]).all(), symbol
+        np.testing.assert_array_equal(closes[-length:], [bar["c"] for bar in candles[symbol]["results"]])
+
+
+@pytest.mark.parametrize("symbol", list(HISTORIES))
+def test_rows_match_analyze(table, candles, symbol):
+    row = table.loc[symbol]
+    expected = ENGINE.analyze(candles[symbol], symbol, "day")
+    assert row["bars"] == HISTORIES[symbol][1]
+
+    if "error" in expected:
+        scores = row.drop("bars")
+        assert scores.isna().all(), symbol
+        return
+
+    assert row["latest_price"] == expected["latest_price"]
+    for column, (layer, key) in LAYER_COLUMNS.items():
+        assert_same_value(row[column], expected["layers"][layer][key], f"{symbol}.{column}")
+    for column in OVERALL_COLUMNS:
+        assert_same_value(row[column], expected["overall_signal"][column], f"{symbol}.{column}")
+
+
+def test_every_column_is_checked(table):
+    checked = {"bars", "latest_price", *LAYER_COLUMNS, *OVERALL_COLUMNS}
+    assert set(table.columns) == checked
+
+
+@pytest.mark.parametrize("symbol", ["LONG", "FLAT", "MIN"])
+def test_signal_history_last_bar_matches_analyze(candles, symbol):
+    fields = ["latest_price", *LAYER_COLUMNS, *OVERALL_COLUMNS]
+    history = ENGINE.signal_history(candles[symbol], symbol, bars=50, fields=fields)
+    columns = history["columns"]
+    length = HISTORIES[symbol][1]
+    assert history["bars"] == min(50, length - universe.MIN_BARS + 1)
+    assert columns["t"][-1] == candles[symbol]["results"][-1]["t"]
+
+    expected = ENGINE.analyze(candles[symbol], symbol, "day")
+    last = {field: values[-1] for field, values in columns.items()}
+    assert last["latest_price"] == expected["latest_price"]
+    for field, (layer, key) in LAYER_COLUMNS.items():
+        assert_same_value(last[field], expected["layers"][layer][key], f"{symbol}.{field}")
+    for field in OVERALL_COLUMNS:
+        assert_same_value(last[field], expected["overall_signal"][field], f"{symbol}.{field}")
+
+    summary = ENGINE.get_signal_summary(candles[symbol], symbol)
+    for key, field in SUMMARY_FIELDS.items():
+        assert_same_value(last[field], summary[key], f"{symbol}.{key}")
+
+
+def test_signal_history_earlier_bars_match_analyze_on_the_history_so_far(candles):
+    results = candles["SHORT"]["results"]
+    history = ENGINE.signal_history(candles["SHORT"], "SHORT", bars=len(results),
+                                    fields=list(OVERALL_COLUMNS))
+    columns = history["columns"]
+    assert history["bars"] == len(results) - universe.MIN_BARS + 1
+    for end in (universe.MIN_BARS, 230, len(results) - 1):
+        bar = end - universe.MIN_BARS
+        assert columns["t"][bar] == results[end - 1]["t"]
+        expected = ENGINE.analyze({"results": results[:end]}, "SHORT", "day", tail_only=False)
+        for field in OVERALL_COLUMNS:
+            assert_same_value(columns[field][bar], expected["overall_signal"][field], f"{end}.{field}")
+
+
+def test_signal_history_rejects_short_histories(candles):
+    history = ENGINE.signal_history(candles["NEW"], "NEW")
+    assert history["error"] == "Insufficient or invalid data"
+    assert history["bars_received"] == HISTORIES["NEW"][1]
@@ -7,5 +7,6 @@ __author__ = "TradePilot Team"
 
 from .engine_core import TradePilotEngine
 from .data_processor import DataProcessor
+from .ring_buffer import BarRingBuffer
 
-__all__ = ["TradePilotEngine", "DataProcessor"]
+__all__ = ["TradePilotEngine", "DataProcessor", "BarRingBuffer"]
@@ -0,0 +1,166 @@
+"""
+Backtest - Vectorized simulation of the overall recommendation
+
+Scores every layer at every bar of every symbol (universe.series_features +
+score_features, in blocks of symbols to bound memory) instead of calling
+analyze() once per bar, then trades the overall recommendation on the
+(symbols, bars) matrix:
+
+- a bar closing with an entry recommendation goes long, one closing with an
+  exit recommendation goes flat (or short with allow_short); any other
+  recommendation keeps the position
+- positions are taken at the signal bar's close and earn the next bar's
+  return, so there is no look-ahead
+- every unit of position change costs (commission_bps + slippage_bps)
+- bars failing validate_data's checks (fewer than 200 bars so far) are flat
+
+Per-symbol results and an equal-weight portfolio of all symbols report
+returns, drawdown, hit rate (share of winning trades) and turnover.
+"""
+import math
+import numpy as np
+from typing import Dict, List, Mapping, Sequence
+from .indicators import IndicatorContext, OHLCV_COLUMNS
+from . import universe
+
+ENTRY_RECOMMENDATIONS = ("STRONG BUY", "BUY")
+EXIT_RECOMMENDATIONS = ("STRONG SELL", "SELL")
+
+# Symbols scored per block (bounds the (symbols, bars) string arrays)
+SYMBOL_BLOCK = 32
+
+
+def recommendations(bars: Mapping[str, np.ndarray], layers: Dict,
+                    block: int = SYMBOL_BLOCK) -> np.ndarray:
+    """Overall recommendation at every bar, shaped like the bars"""
+    close = bars["close"]
+    out = np.empty(close.shape, dtype="<U11")
+    for start in range(0, close.shape[0], block):
+        rows = slice(start, start + block)
+        ctx = IndicatorContext({column: bars[column][rows] for column in OHLCV_COLUMNS})
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = universe.score_features(universe.series_features(ctx, layers), layers)
+        out[rows] = scores["recommendation"]
+    return out
+
+
+def positions(recommendation: np.ndarray, valid: np.ndarray,
+              entry: Sequence[str] = ENTRY_RECOMMENDATIONS, exit: Sequence[str] = EXIT_RECOMMENDATIONS,
+              allow_short: bool = False) -> np.ndarray:
+    """Position held after each bar's close: 1 long, -1 short, 0 flat"""
+    target = np.full(recommendation.shape, np.nan)
+    target[np.isin(recommendation, exit)] = -1.0 if allow_short else 0.0
+    target[np.isin(recommendation, entry)] = 1.0
+    target[~valid] = 0.0
+
+    # Hold the last decided position through bars without a decision
+    bars = np.arange(target.shape[-1])
+    last = np.maximum.accumulate(np.where(np.isnan(target), -1, bars), axis=-1)
+    held = np.take_along_axis(target, np.maximum(last, 0), axis=-1)
+    return np.where(last >= 0, held, 0.0)
+
+
+def _drawdown(equity: np.ndarray) -> np.ndarray:
+    return (equity / np.maximum.accumulate(equity, axis=-1) - 1).min(axis=-1)
+
+
+def _trade_returns(position: np.ndarray, returns: np.ndarray, cost: float) -> np.ndarray:
+    """Net return of every trade (a run of one non-zero position), open trades marked at the last close"""
+    previous = np.zeros_like(position)
+    previous[..., 1:] = position[..., :-1]
+    starts = (position != 0) & (position != previous)
+    trade_ids = np.cumsum(starts.ravel()).reshape(position.shape)
+    # Bar j's return belongs to the trade held over (j-1, j]
+    held_ids = np.zeros_like(trade_ids)
+    held_ids[..., 1:] = np.where(previous[..., 1:] != 0, trade_ids[..., :-1], 0)
+    count = int(trade_ids.max(initial=0))
+    with np.errstate(invalid="ignore"):
+        growth = np.log1p(previous * returns)
+    mask = held_ids > 0
+    log_growth = np.bincount(held_ids[mask], weights=growth[mask], minlength=count + 1)[1:]
+    # Entry and exit each trade one unit
+    return np.expm1(log_growth) * (1 - cost) ** 2 - (1 - (1 - cost) ** 2)
+
+
+def _metrics(net: np.ndarray, turnover: np.ndarray, exposure: np.ndarray, active: np.ndarray,
+             trades: np.ndarray, bars_per_year: float) -> Dict:
+    """Summary statistics of per-bar net returns, turnover and exposure (1-D) over the active bars"""
+    net = net[active]
+    periods = len(net)
+    if periods == 0:
+        return {"bars": 0}
+    equity = np.cumprod(1 + net)
+    total = float(equity[-1] - 1)
+    years = periods / bars_per_year
+    std = float(net.std())
+    traded = float(turnover[active].sum())
+    return {
+        "bars": periods,
+        "total_return": round(total, 6),
+        "cagr": round(float((1 + total) ** (1 / years) - 1), 6) if total > -1 else -1.0,
+        "volatility": round(std * math.sqrt(bars_per_year), 6),
+        "sharpe": round(float(net.mean()) / std * math.sqrt(bars_per_year), 4) if std > 0 else 0.0,
+        "max_drawdown": round(float(_drawdown(np.concatenate(([1.0], equity)))), 6),
+        "trades": len(trades),
+        "hit_rate": round(float((trades > 0).mean()), 4) if len(trades) else None,
+        "turnover": round(traded, 2),
+        "turnover_per_year": round(traded / years, 2),
+        "exposure": round(float(exposure[active].mean()), 4),
+    }
+
+
+def run_backtest(symbols: List[str], bars: Mapping[str, np.ndarray], layers: Dict,
+                 commission_bps: float = 1.0, slippage_bps: float = 2.0, allow_short: bool = False,
+                 entry: Sequence[str] = ENTRY_RECOMMENDATIONS, exit: Sequence[str] = EXIT_RECOMMENDATIONS,
+                 bars_per_year: float = 252) -> Dict:
+    """
+    Backtest the recommendation over (symbols, bars) OHLCV matrices
+
+    Returns:
+        {"portfolio": metrics of the equal-weight portfolio,
+         "symbols": {symbol: metrics}, "equity": portfolio equity per bar}
+    """
+    cost = (commission_bps + slippage_bps) / 10_000
+    close = np.asarray(bars["close"], dtype=np.float64)
+    valid = universe.valid_bars(bars)
+
+    position = positions(recommendations(bars, layers), valid, entry, exit, allow_short)
+    previous = np.zeros_like(position)
+    previous[..., 1:] = position[..., :-1]
+
+    returns = np.zeros_like(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[..., 1:] = close[..., 1:] / close[..., :-1] - 1
+    returns[~np.isfinite(returns)] = 0.0
+    turnover = np.abs(position - previous)
+    net = previous * returns - cost * turnover
+
+    # A symbol is active from its first tradeable bar on
+    active = np.logical_or.accumulate(valid, axis=-1)
+    trades = _trade_returns(position, returns, cost)
+    trade_symbol = np.repeat(np.arange(len(symbols)), ((position != 0) & (position != previous)).sum(axis=-1))
+
+    exposure = (position != 0).astype(np.float64)
+
+    per_symbol = {
+        symbol: _metrics(net[row], turnover[row], exposure[row], active[row],
+                         trades[trade_symbol == row], bars_per_year)
+        for row, symbol in enumerate(symbols)
+    }
+
+    # Equal weight across the symbols active at each bar
+    weights = np.maximum(active.sum(axis=0), 1)
+
+    def portfolio_mean(values: np.ndarray) -> np.ndarray:
+        return np.where(active, values, 0.0).sum(axis=0) / weights
+
+    portfolio_net = portfolio_mean(net)
+    portfolio = _metrics(portfolio_net, portfolio_mean(turnover), portfolio_mean(exposure),
+                         active.any(axis=0), trades, bars_per_year)
+    portfolio["symbols"] = int(active.any(axis=-1).sum())
+
+    return {
+        "portfolio": portfolio,
+        "symbols": per_symbol,
+        "equity": np.cumprod(1 + portfolio_net),
+    }
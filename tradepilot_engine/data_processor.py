@@ -1,53 +1,139 @@
 """
 Data Processor - Converts Polygon.io data to engine-ready format
 """
+import json
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Optional
+from operator import itemgetter
+from typing import Dict, List, Optional, Union
+
+from .ring_buffer import BarRingBuffer
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional: pip install orjson
+    _loads = json.loads
+
+# Polygon aggregate fields -> column dtype ("n" is float so missing counts can be NaN)
+AGGREGATE_COLUMNS = {
+    "t": np.int64,
+    "o": np.float64,
+    "h": np.float64,
+    "l": np.float64,
+    "c": np.float64,
+    "v": np.float64,
+    "vw": np.float64,
+    "n": np.float64,
+}
+
+# Polygon aggregate fields -> DataFrame column names
+COLUMN_NAMES = {
+    "o": "open",
+    "h": "high",
+    "l": "low",
+    "c": "close",
+    "v": "volume",
+    "t": "timestamp",
+    "vw": "vwap",
+    "n": "trades"
+}
 
 class DataProcessor:
     """Process and prepare data from Polygon.io for indicator calculations"""
     
     @staticmethod
-    def polygon_to_dataframe(candles_data: Dict) -> Optional[pd.DataFrame]:
+    def results_to_columns(results: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        Polygon aggregate bars (list of dicts) -> one preallocated array per field
+        
+        Keeps the response's bar order (see sort_columns). Missing fields are NaN (t: 0).
+        """
+        count = len(results)
+        columns = {}
+        for key, dtype in AGGREGATE_COLUMNS.items():
+            try:
+                columns[key] = np.fromiter(map(itemgetter(key), results), dtype=dtype, count=count)
+            except KeyError:
+                missing = 0 if key == "t" else np.nan
+                columns[key] = np.fromiter((bar.get(key, missing) for bar in results), dtype=dtype, count=count)
+        return columns
+    
+    @staticmethod
+    def sort_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Order columnar bars oldest first
+        
+        Already-ascending bars are returned untouched and descending ones as
+        reversed views; only unordered bars pay for a sort.
+        """
+        t = columns["t"]
+        if len(t) < 2 or (t[1:] >= t[:-1]).all():
+            return columns
+        if (t[1:] <= t[:-1]).all():
+            return {key: values[::-1] for key, values in columns.items()}
+        order = np.argsort(t, kind="stable")
+        return {key: values[order] for key, values in columns.items()}
+    
+    @staticmethod
+    def decode_aggregates(payload: Union[bytes, str]) -> Dict:
+        """
+        Parse a Polygon aggregates response body straight into columnar candles
+        
+        Returns the response with "results" replaced by "columns" in the
+        response's bar order; bodies without results (errors) are returned as parsed.
+        """
+        body = _loads(payload)
+        if "results" in body:
+            body["columns"] = DataProcessor.results_to_columns(body.pop("results") or [])
+        return body
+    
+    @staticmethod
+    def bar_count(candles_data: Union[Dict, BarRingBuffer, None]) -> int:
+        """Number of bars in a Polygon response, columnar candles dict or ring buffer (0 if none)"""
+        if isinstance(candles_data, BarRingBuffer):
+            return len(candles_data)
+        if not candles_data:
+            return 0
+        if "columns" in candles_data:
+            columns = candles_data["columns"]
+            return len(columns["t"]) if "t" in columns else len(next(iter(columns.values()), []))
+        return len(candles_data.get("results") or [])
+    
+    @staticmethod
+    def polygon_to_dataframe(candles_data: Union[Dict, BarRingBuffer]) -> Optional[pd.DataFrame]:
         """
         Convert Polygon.io candles JSON to pandas DataFrame
         
         Args:
-            candles_data: Raw JSON response from Polygon.io /candles endpoint
+            candles_data: Raw JSON response from Polygon.io /candles endpoint,
+                columnar candles ({"columns": {"t": [...], "o": [...], ...}}, e.g. from the bar store),
+                or a BarRingBuffer (its bars are viewed, not copied)
             
         Returns:
             DataFrame with OHLCV data or None if invalid
         """
-        if not candles_data or "results" not in candles_data:
+        if DataProcessor.bar_count(candles_data) == 0:
             return None
-            
-        results = candles_data["results"]
-        if not results or len(results) == 0:
-            return None
-        
-        # Extract data
-        df = pd.DataFrame(results)
-        
-        # Rename columns to standard format
-        column_mapping = {
-            "o": "open",
-            "h": "high",
-            "l": "low",
-            "c": "close",
-            "v": "volume",
-            "t": "timestamp",
-            "vw": "vwap",
-            "n": "trades"
-        }
+        if isinstance(candles_data, BarRingBuffer):
+            candles_data = candles_data.to_candles()
         
-        df = df.rename(columns=column_mapping)
+        # Extract data (columnar candles are used as-is, without copying)
+        if "columns" in candles_data:
+            df = pd.DataFrame(
+                {COLUMN_NAMES.get(name, name): np.asarray(values) for name, values in candles_data["columns"].items()},
+                copy=False,
+            )
+        else:
+            df = pd.DataFrame(candles_data["results"])
+            
+            # Rename columns to standard format
+            df.rename(columns=COLUMN_NAMES, inplace=True)
         
         # Convert timestamp to datetime
         if "timestamp" in df.columns:
-            df["datetime"] = pd.to_datetime(df["timestamp"], unit="ms")
-            df = df.set_index("datetime")
+            df.index = pd.DatetimeIndex(pd.to_datetime(df["timestamp"], unit="ms"), name="datetime")
         
         # Ensure required columns exist
         required_columns = ["open", "high", "low", "close", "volume"]
@@ -55,8 +141,9 @@ class DataProcessor:
             if col not in df.columns:
                 raise ValueError(f"Missing required column: {col}")
         
-        # Sort by datetime
-        df = df.sort_index()
+        # Sort by datetime (Polygon already returns ascending bars)
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
         
         return df
     
@@ -92,7 +179,10 @@ class DataProcessor:
     @staticmethod
     def calculate_basic_features(df: pd.DataFrame) -> pd.DataFrame:
         """
-        Calculate basic derived features needed by multiple layers
+        Calculate basic derived features on a copy of the frame
+        
+        The engine no longer calls this: layers get derived features from
+        IndicatorContext without copying the bar DataFrame.
         
         Args:
             df: OHLCV DataFrame
@@ -1,10 +1,17 @@
 """
 TradePilot Engine Core - Orchestrates all 10 analysis layers
 """
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Mapping, Optional, Tuple
 from .data_processor import DataProcessor
-from .json_utils import clean_for_json
+from .indicators import IndicatorContext, OHLCV_COLUMNS
+from .streaming import Bar, StreamingContext
+from . import universe
+from .resample import bars_per_bucket, is_coarser
+from .backtest import run_backtest
 from .layers import (
     Layer1Momentum,
     Layer2Volume,
@@ -17,11 +24,67 @@ from .layers import (
     Layer9Confirmation,
     Layer10CandleIntelligence
 )
+from .layers.layer_9_confirmation import CONFIRMATION_LAYERS
+
+# Pseudo-layer name for the combined signal in layer selections
+OVERALL_SIGNAL = "overall_signal"
+
+# Layers (and the overall signal) that consume other layers' results
+LAYER_DEPENDENCIES = {
+    "layer_9_confirmation": ("layer_1_momentum", "layer_2_volume", "layer_5_trend"),
+    OVERALL_SIGNAL: (
+        "layer_1_momentum",
+        "layer_2_volume",
+        "layer_5_trend",
+        "layer_8_volatility_regime",
+        "layer_9_confirmation"
+    )
+}
+
+# Layers read by get_signal_summary()
+SUMMARY_LAYERS = [
+    "layer_1_momentum",
+    "layer_2_volume",
+    "layer_5_trend",
+    "layer_6_structure",
+    "layer_8_volatility_regime",
+    "layer_9_confirmation",
+    OVERALL_SIGNAL
+]
+
+# Per-bar fields returned by signal_history() by default (any universe.score_features key can be requested)
+HISTORY_FIELDS = [
+    "momentum_score",
+    "momentum_signal",
+    "volume_flow_score",
+    "volume_signal",
+    "divergence_signal",
+    "volume_strength_signal",
+    "trend_score",
+    "trend_signal",
+    "structure_bias",
+    "liquidity_signal",
+    "volatility_regime",
+    "confirmation_signal",
+    "candle_signal",
+    "weighted_signal",
+    "confidence",
+    "recommendation"
+]
 
 class TradePilotEngine:
     """Main engine that runs all 10 layers of technical analysis"""
     
-    def __init__(self):
+    def __init__(self, tail_only: bool = True, max_streams: Optional[int] = None):
+        """
+        Args:
+            tail_only: Evaluate indicators over the selected layers' maximum
+                lookback instead of the full history (see required_lookback)
+            max_streams: Warm streams to keep; starting one more evicts the
+                least recently started or updated one (None = unbounded)
+        """
+        self.tail_only = tail_only
+        self.max_streams = max_streams
         self.data_processor = DataProcessor()
         self.layers = {
             "layer_1_momentum": Layer1Momentum(),
@@ -35,19 +98,92 @@ class TradePilotEngine:
             "layer_9_confirmation": Layer9Confirmation(),
             "layer_10_candle_intelligence": Layer10CandleIntelligence()
         }
+        
+        # Cumulative IndicatorContext counters across analyses
+        self.indicator_stats = {"computed": 0, "reused": 0}
+        self._stats_lock = threading.Lock()
+        
+        # Live per-(symbol, timeframe) incremental indicator state, least recently used first
+        self.streams: "OrderedDict[Tuple[str, str], StreamingContext]" = OrderedDict()
+        self.streams_evicted = 0
+        self._streams_lock = threading.Lock()
     
-    def analyze(self, candles_data: Dict, symbol: str, timeframe: str = "day") -> Dict:
+    def resolve_layers(self, layers: Optional[List[str]] = None) -> List[str]:
         """
-        Run full analysis through all 10 layers
+        Expand a layer selection with its dependencies
         
         Args:
-            candles_data: Raw Polygon.io candles data
+            layers: Layer names (and/or "overall_signal"); None selects everything
+            
+        Returns:
+            Layer names to run, in execution order
+        """
+        if layers is None:
+            return list(self.layers.keys())
+        
+        unknown = [name for name in layers if name not in self.layers and name != OVERALL_SIGNAL]
+        if unknown:
+            raise ValueError(
+                f"Unknown layers: {unknown}. Available: {list(self.layers.keys()) + [OVERALL_SIGNAL]}"
+            )
+        
+        needed = set()
+        pending = list(layers)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(LAYER_DEPENDENCIES.get(name, ()))
+        
+        # self.layers is declared in dependency order
+        return [name for name in self.layers if name in needed]
+    
+    def resolve_timeframes(self, timeframe: str, timeframes: Optional[List[str]]) -> List[str]:
+        """
+        Confirmation timeframes that can be resampled from `timeframe` bars
+        
+        Timeframes not coarser than `timeframe` are dropped; unknown names raise ValueError.
+        """
+        return [tf for tf in dict.fromkeys(timeframes or []) if is_coarser(tf, timeframe)]
+    
+    def required_bars(self, timeframe: str, timeframes: List[str]) -> int:
+        """
+        `timeframe` bars to fetch so every confirmation timeframe gets 200 bars
+
+        Sized for the coarsest timeframe, plus one bucket for the partial
+        oldest one; 0 without confirmation timeframes.
+        """
+        if not timeframes:
+            return 0
+        return (universe.MIN_BARS + 1) * max(bars_per_bucket(tf, timeframe) for tf in timeframes)
+    
+    def required_lookback(self, run_order: List[str]) -> int:
+        """Bars needed for exact latest-bar values of the given layers"""
+        return max(self.layers[name].lookback for name in run_order)
+    
+    def analyze(self, candles_data: Dict, symbol: str, timeframe: str = "day",
+                layers: Optional[List[str]] = None, tail_only: Optional[bool] = None,
+                confirmation_timeframes: Optional[List[str]] = None) -> Dict:
+        """
+        Run analysis through all 10 layers, or a selected subset
+        
+        Args:
+            candles_data: Raw Polygon.io candles data, columnar candles or a BarRingBuffer
             symbol: Stock symbol
             timeframe: Timeframe string
+            layers: Layer names to return (and/or "overall_signal"); None runs everything.
+                Dependencies are computed but only the requested layers are returned.
+            tail_only: Override the engine's tail_only setting for this call
+            confirmation_timeframes: Coarser timeframes (hour, day, week, month)
+                whose layer 1, 2 and 5 signals Layer 9 also confirms against.
+                They are resampled from the same bars, not fetched.
             
         Returns:
-            Complete analysis results from all layers
+            Analysis results from the selected layers
         """
+        run_order = self.resolve_layers(layers)
+        confirmation_timeframes = self.resolve_timeframes(timeframe, confirmation_timeframes)
+        
         # Convert to DataFrame
         df = self.data_processor.polygon_to_dataframe(candles_data)
         
@@ -59,9 +195,6 @@ class TradePilotEngine:
                 "bars_received": len(df) if df is not None else 0
             }
         
-        # Add basic features
-        df = self.data_processor.calculate_basic_features(df)
-        
         # Run each layer
         results = {
             "symbol": symbol,
@@ -72,43 +205,283 @@ class TradePilotEngine:
             "layers": {}
         }
         
-        # Layer 1: Momentum
-        results["layers"]["layer_1_momentum"] = self.layers["layer_1_momentum"].analyze(df)
+        # Indicator series shared by all layers of this analysis. Layers treat
+        # df as read-only; derived features (true range, wicks) come from ctx.
+        # In tail-only mode ctx exposes just the bars the layers need
+        if tail_only is None:
+            tail_only = self.tail_only
+        lookback = self.required_lookback(run_order) if tail_only else None
+        ctx = IndicatorContext(df, lookback)
+        timeframes = None
+        if confirmation_timeframes and "layer_9_confirmation" in run_order:
+            timeframes = self._timeframe_results(ctx, confirmation_timeframes, tail_only)
+        self._run_layers(results, df, ctx, run_order, layers, timeframes)
         
-        # Layer 2: Volume
-        results["layers"]["layer_2_volume"] = self.layers["layer_2_volume"].analyze(df)
+        # Layers return native Python types, so results are JSON-ready as-is
+        return results
+    
+    def _timeframe_results(self, ctx: IndicatorContext, timeframes: List[str], tail_only: bool) -> Dict[str, Dict]:
+        """Layers 1, 2 and 5 on each timeframe resampled from ctx's bars (input to Layer 9)"""
+        lookback = self.required_lookback(list(CONFIRMATION_LAYERS)) if tail_only else None
+        results = {}
+        for timeframe in timeframes:
+            view = ctx.resampled(timeframe, lookback)
+            bars = view.start + len(view)
+            if bars < universe.MIN_BARS:
+                results[timeframe] = {"error": "Insufficient data", "bars": bars}
+                continue
+            results[timeframe] = {name: self.layers[name].analyze(None, view) for name in CONFIRMATION_LAYERS}
+            results[timeframe]["bars"] = bars
+            
+            with self._stats_lock:
+                self.indicator_stats["computed"] += view.computed
+                self.indicator_stats["reused"] += view.reused
+        return results
+    
+    def _run_layers(self, results: Dict, df: Optional[pd.DataFrame], ctx, run_order: List[str],
+                    layers: Optional[List[str]], timeframes: Optional[Dict[str, Dict]] = None):
+        """Run the layers in run_order on ctx and fill results with the requested outputs"""
+        computed = {}
+        for name in run_order:
+            if name in LAYER_DEPENDENCIES:
+                # Layer 9: Confirmation (uses results from other layers, and from coarser timeframes)
+                computed[name] = self.layers[name].analyze(df, computed, ctx, timeframes)
+            else:
+                computed[name] = self.layers[name].analyze(df, ctx)
         
-        # Layer 3: Divergence
-        results["layers"]["layer_3_divergence"] = self.layers["layer_3_divergence"].analyze(df)
+        with self._stats_lock:
+            self.indicator_stats["computed"] += ctx.computed
+            self.indicator_stats["reused"] += ctx.reused
         
-        # Layer 4: Volume Strength
-        results["layers"]["layer_4_volume_strength"] = self.layers["layer_4_volume_strength"].analyze(df)
+        requested = set(run_order) if layers is None else set(layers)
+        results["layers"] = {name: computed[name] for name in run_order if name in requested}
         
-        # Layer 5: Trend
-        results["layers"]["layer_5_trend"] = self.layers["layer_5_trend"].analyze(df)
+        # Generate overall signal
+        if layers is None or OVERALL_SIGNAL in requested:
+            results["overall_signal"] = self._generate_overall_signal(computed)
+    
+    def analyze_universe(self, symbols: List[str], bars: Mapping[str, np.ndarray],
+                         tail_only: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Score every layer for a whole universe in one vectorized pass
         
-        # Layer 6: Market Structure
-        results["layers"]["layer_6_structure"] = self.layers["layer_6_structure"].analyze(df)
+        Args:
+            symbols: Row labels
+            bars: OHLCV matrices shaped (symbols, bars), rows right-aligned on
+                their latest bar and left-padded with NaN (see universe.stack_candles)
+            tail_only: Override the engine's tail_only setting for this call
+            
+        Returns:
+            DataFrame indexed by symbol with each layer's score and signal and the
+            overall signal. Rows failing validate_data's checks have NaN/None values.
+        """
+        valid, counts = universe.valid_rows(bars)
         
-        # Layer 7: Liquidity
-        results["layers"]["layer_7_liquidity"] = self.layers["layer_7_liquidity"].analyze(df)
+        if tail_only is None:
+            tail_only = self.tail_only
+        if tail_only:
+            # MACD's EMAs get the full lookback, rolling windows only their own warm-up
+            ctx = IndicatorContext(bars, self.required_lookback(list(self.layers)))
+            window_ctx = IndicatorContext(bars, universe.window_lookback(self.layers))
+        else:
+            ctx = window_ctx = IndicatorContext(bars)
         
-        # Layer 8: Volatility Regime
-        results["layers"]["layer_8_volatility_regime"] = self.layers["layer_8_volatility_regime"].analyze(df)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            features = universe.latest_features(ctx, self.layers, window_ctx)
+            scores = universe.score_features(features, self.layers)
         
-        # Layer 9: Confirmation (uses results from other layers)
-        results["layers"]["layer_9_confirmation"] = self.layers["layer_9_confirmation"].analyze(
-            df, results["layers"]
-        )
+        with self._stats_lock:
+            for context in {id(ctx): ctx, id(window_ctx): window_ctx}.values():
+                self.indicator_stats["computed"] += context.computed
+                self.indicator_stats["reused"] += context.reused
         
-        # Layer 10: Candle Intelligence
-        results["layers"]["layer_10_candle_intelligence"] = self.layers["layer_10_candle_intelligence"].analyze(df)
+        table = pd.DataFrame(scores, index=pd.Index(symbols, name="symbol"))
+        table = table.where(np.broadcast_to(valid[:, None], table.shape))
+        table.insert(0, "bars", counts)
+        return table
+    
+    def backtest(self, symbols: List[str], bars: Mapping[str, np.ndarray], **options) -> Dict:
+        """
+        Simulate trading the overall recommendation over the whole history
         
-        # Generate overall signal
-        results["overall_signal"] = self._generate_overall_signal(results["layers"])
+        Every layer is scored at every bar in one vectorized pass (see
+        backtest.run_backtest for the rules and options: commission_bps,
+        slippage_bps, allow_short, entry, exit, bars_per_year).
+        
+        Args:
+            symbols: Row labels
+            bars: OHLCV matrices shaped (symbols, bars), as for analyze_universe
+            
+        Returns:
+            Portfolio and per-symbol metrics plus the portfolio equity curve
+        """
+        return run_backtest(symbols, bars, self.layers, **options)
+    
+    def signal_history(self, candles_data: Dict, symbol: str, timeframe: str = "day",
+                       bars: int = 100, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Per-bar layer scores and signals over the latest bars, in one vectorized pass
+        
+        Every bar's values are what analyze(..., tail_only=False) returns for
+        the history ending at that bar; bars with fewer than 200 bars of
+        history before them are left out.
+        
+        Args:
+            candles_data: Raw Polygon.io candles data, columnar candles or a BarRingBuffer
+            symbol: Stock symbol
+            timeframe: Timeframe string
+            bars: Number of latest bars to return
+            fields: Fields to return (see HISTORY_FIELDS); None returns HISTORY_FIELDS
+            
+        Returns:
+            Columnar series: {"columns": {"t": [...], field: [...]}}, oldest bar first
+        """
+        fields = HISTORY_FIELDS if fields is None else fields
         
-        # Clean all NumPy types for JSON serialization
-        return clean_for_json(results)
+        df = self.data_processor.polygon_to_dataframe(candles_data)
+        
+        if df is None or not self.data_processor.validate_data(df):
+            return {
+                "error": "Insufficient or invalid data",
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "bars_received": len(df) if df is not None else 0
+            }
+        
+        ctx = IndicatorContext(df)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = universe.score_features(universe.series_features(ctx, self.layers), self.layers)
+        
+        with self._stats_lock:
+            self.indicator_stats["computed"] += ctx.computed
+            self.indicator_stats["reused"] += ctx.reused
+        
+        unknown = [field for field in fields if field not in scores]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}. Available: {list(scores)}")
+        
+        count = max(min(bars, len(df) - universe.MIN_BARS + 1), 0)
+        window = slice(len(df) - count, len(df))
+        columns = {"t": df.index[window].as_unit("ms").asi8}
+        for field in fields:
+            columns[field] = scores[field][window]
+        
+        return {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "bars": count,
+            "columns": columns
+        }
+    
+    def start_stream(self, candles_data: Dict, symbol: str, timeframe: str = "minute",
+                     layers: Optional[List[str]] = None) -> Dict:
+        """
+        Warm incremental indicator state for a symbol from historical candles
+        
+        Args:
+            candles_data: Raw Polygon.io candles data or a BarRingBuffer (history to replay)
+            symbol: Stock symbol
+            timeframe: Timeframe string
+            layers: Layer names to return for the latest bar; None returns everything
+            
+        Returns:
+            Analysis of the latest bar, as from analyze()
+        """
+        run_order = self.resolve_layers(layers)
+        df = self.data_processor.polygon_to_dataframe(candles_data)
+        
+        if df is None or not self.data_processor.validate_data(df):
+            return {
+                "error": "Insufficient or invalid data",
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "bars_received": len(df) if df is not None else 0
+            }
+        
+        stream = StreamingContext(self.required_lookback(list(self.layers)))
+        timestamps = df["timestamp"].tolist() if "timestamp" in df.columns else [None] * len(df)
+        columns = [df[column].astype(float).tolist() for column in OHLCV_COLUMNS]
+        for timestamp, bar in zip(timestamps, zip(*columns)):
+            stream.push(Bar(*bar), timestamp)
+        
+        key = (symbol, timeframe)
+        with self._streams_lock:
+            self.streams[key] = stream
+            self.streams.move_to_end(key)
+            while self.max_streams is not None and len(self.streams) > self.max_streams:
+                self.streams.popitem(last=False)
+                self.streams_evicted += 1
+        with stream.lock:
+            return self._stream_results(stream, symbol, timeframe, run_order, layers)
+    
+    def update(self, symbol: str, bar: Dict, timeframe: str = "minute",
+               layers: Optional[List[str]] = None) -> Dict:
+        """
+        Append one closed bar to a warm stream and return the refreshed layers
+        
+        Each registered indicator advances in O(1); the layers then read the
+        buffered series exactly as they read an IndicatorContext.
+        
+        Raises ValueError when there is no warm stream (never started, stopped
+        or evicted by max_streams).
+        
+        Args:
+            symbol: Stock symbol (started with start_stream)
+            bar: Polygon.io aggregate bar ({"o", "h", "l", "c", "v", "t"})
+            timeframe: Timeframe string
+            layers: Layer names to return; None returns everything
+            
+        Returns:
+            Analysis of the new bar, as from analyze()
+        """
+        key = (symbol, timeframe)
+        with self._streams_lock:
+            stream = self.streams.get(key)
+            if stream is not None:
+                self.streams.move_to_end(key)
+        if stream is None:
+            raise ValueError(f"No stream for {symbol} ({timeframe}); call start_stream first")
+        run_order = self.resolve_layers(layers)
+        
+        with stream.lock:
+            stream.push(Bar(float(bar["o"]), float(bar["h"]), float(bar["l"]), float(bar["c"]), float(bar["v"])),
+                        bar.get("t"))
+            return self._stream_results(stream, symbol, timeframe, run_order, layers)
+    
+    def has_stream(self, symbol: str, timeframe: str = "minute") -> bool:
+        """Whether update() can advance this symbol (started and not stopped or evicted)"""
+        return (symbol, timeframe) in self.streams
+    
+    def stop_stream(self, symbol: str, timeframe: str = "minute"):
+        """Drop the incremental state for a symbol"""
+        with self._streams_lock:
+            self.streams.pop((symbol, timeframe), None)
+    
+    def stream_stats(self) -> Dict:
+        """Number of warm streams, the memory their buffers hold and evictions so far"""
+        with self._streams_lock:
+            streams = list(self.streams.values())
+        return {
+            "streams": len(streams),
+            "max_streams": self.max_streams,
+            "evicted": self.streams_evicted,
+            "memory_bytes": sum(stream.memory_bytes() for stream in streams)
+        }
+    
+    def _stream_results(self, stream: StreamingContext, symbol: str, timeframe: str,
+                        run_order: List[str], layers: Optional[List[str]]) -> Dict:
+        """Layer outputs for the latest streamed bar (caller holds stream.lock)"""
+        results = {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "bars_analyzed": stream.bars,
+            "latest_price": float(stream.close[-1]),
+            "latest_datetime": str(pd.Timestamp(stream.last_timestamp, unit="ms"))
+                if stream.last_timestamp is not None else None,
+            "layers": {}
+        }
+        self._run_layers(results, None, stream, run_order, layers)
+        return results
     
     def get_signal_summary(self, candles_data: Dict, symbol: str) -> Dict:
         """
@@ -121,7 +494,7 @@ class TradePilotEngine:
         Returns:
             Condensed signal summary
         """
-        full_analysis = self.analyze(candles_data, symbol)
+        full_analysis = self.analyze(candles_data, symbol, layers=SUMMARY_LAYERS)
         
         if "error" in full_analysis:
             return full_analysis
@@ -144,8 +517,7 @@ class TradePilotEngine:
             "recommendation": full_analysis["overall_signal"]["recommendation"]
         }
         
-        # Clean for JSON
-        return clean_for_json(summary)
+        return summary
     
     def _generate_overall_signal(self, layers: Dict) -> Dict:
         """
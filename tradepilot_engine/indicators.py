@@ -0,0 +1,231 @@
+"""
+Indicator Context - Per-analysis store of shared indicator series
+
+Several layers need the same series (ATR, +DI/-DI/ADX, money-flow, CMF).
+The engine creates one IndicatorContext per analysis and passes it to every
+layer; each named series is computed on first request, memoized by
+(indicator, params), and the same array is handed to every later caller.
+
+Layer inputs are read-only: the OHLCV columns are exposed as read-only
+contiguous float64 arrays, layers never copy or add columns to the bar
+DataFrame, and each layer keeps its own outputs in its result dict.
+All series are NumPy arrays computed with the vectorized kernels.
+
+With `lookback` set, the context only exposes the last `lookback` bars, so
+every rolling window and EMA runs over the minimal warm-up span instead of
+the whole history. Cumulative levels (OBV, A/D, CDV) are still summed from
+the first bar so their values match full-history evaluation.
+
+The context also accepts a mapping of (symbols, bars) OHLCV matrices: every
+kernel works along the last axis, so the same methods score a whole universe.
+
+resampled() aggregates the bars into a coarser timeframe and wraps them in
+their own context, memoized like any other series, so every layer reading
+the weekly view shares one aggregation and one set of weekly indicators.
+"""
+import pandas as pd
+import numpy as np
+from typing import Callable, Dict, Hashable, Mapping, Optional, Tuple, Union
+from . import kernels, resample
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def _money_flow_multiplier(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """Chaikin money-flow multiplier ((C-L) - (H-C)) / (H-L), 0 on flat bars"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mf_multiplier = ((close - low) - (high - close)) / (high - low)
+    # Zero-range bars give NaN (0/0) or ±inf; pandas fillna(0) only cleared NaN
+    return np.where(np.isnan(mf_multiplier), 0.0, mf_multiplier)
+
+
+class IndicatorContext:
+    """Memoized indicator series shared by all layers of one analysis"""
+
+    def __init__(self, df: Union[pd.DataFrame, Mapping[str, np.ndarray]], lookback: Optional[int] = None):
+        """
+        Args:
+            df: Bar DataFrame, or a mapping of OHLCV arrays shaped (bars,) or (symbols, bars)
+            lookback: Expose only the last `lookback` bars (None = full history)
+        """
+        self.df = df
+        self._cache: Dict[Hashable, object] = {}
+        self.computed = 0
+        self.reused = 0
+
+        self._full: Dict[str, np.ndarray] = {}
+        for column in OHLCV_COLUMNS:
+            values = kernels.as_float_array(np.asarray(df[column]))
+            values.flags.writeable = False
+            self._full[column] = values
+
+        # First bar exposed to the layers (0 = full history)
+        bars = self._full["close"].shape[-1]
+        self.start = max(bars - lookback, 0) if lookback else 0
+        for column, values in self._full.items():
+            setattr(self, column, values[..., self.start:])
+
+    def __len__(self) -> int:
+        return self.close.shape[-1]
+
+    def _memo(self, key: Hashable, compute: Callable[[], object]):
+        """Return the cached value for key, computing it on first use"""
+        if key in self._cache:
+            self.reused += 1
+            return self._cache[key]
+        self.computed += 1
+        value = compute()
+        self._cache[key] = value
+        return value
+
+    def stats(self) -> Dict:
+        """Computed vs. reused (recomputation avoided) counts"""
+        return {"computed": self.computed, "reused": self.reused}
+
+    def resampled(self, timeframe: str, lookback: Optional[int] = None) -> "IndicatorContext":
+        """
+        Context over the full history aggregated into a coarser timeframe
+
+        Needs the bar timestamps (a DataFrame with a "timestamp" column, as
+        DataProcessor builds). `lookback` applies to the resampled bars.
+        """
+        def compute():
+            if "timestamp" not in self.df:
+                raise ValueError("Resampling needs bar timestamps")
+            bars = dict(self._full, timestamp=np.asarray(self.df["timestamp"]))
+            return IndicatorContext(resample.resample(bars, timeframe), lookback)
+        return self._memo(("resampled", timeframe, lookback), compute)
+
+    # ---------------- Price range ----------------
+
+    def true_range(self) -> np.ndarray:
+        """True Range"""
+        return self._memo(("true_range",), lambda: kernels.true_range(self.high, self.low, self.close))
+
+    def upper_wick(self) -> np.ndarray:
+        """High minus the top of the candle body"""
+        return self._memo(("upper_wick",), lambda: self.high - np.maximum(self.close, self.open))
+
+    def lower_wick(self) -> np.ndarray:
+        """Bottom of the candle body minus the low"""
+        return self._memo(("lower_wick",), lambda: np.minimum(self.close, self.open) - self.low)
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        """Average True Range (simple moving average of TR)"""
+        return self._memo(("atr", period), lambda: kernels.rolling_mean(self.true_range(), period))
+
+    def dmi(self, period: int = 14) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ADX, +DI and -DI"""
+        def compute():
+            up_move = kernels.diff(self.high)
+            down_move = -kernels.diff(self.low)
+
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+
+            atr = self.atr(period)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                plus_di = 100 * kernels.rolling_mean(plus_dm, period) / atr
+                minus_di = 100 * kernels.rolling_mean(minus_dm, period) / atr
+
+                dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+            adx = kernels.rolling_mean(dx, period)
+
+            return adx, plus_di, minus_di
+        return self._memo(("dmi", period), compute)
+
+    # ---------------- Oscillators ----------------
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        """RSI (simple-average gains/losses)"""
+        def compute():
+            delta = kernels.diff(self.close)
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+
+            avg_gain = kernels.rolling_mean(gain, period)
+            avg_loss = kernels.rolling_mean(loss, period)
+
+            rs = avg_gain / np.where(avg_loss == 0, np.inf, avg_loss)
+            return 100 - (100 / (1 + rs))
+        return self._memo(("rsi", period), compute)
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """MACD line, signal line and histogram"""
+        def compute():
+            macd_line = kernels.ema(self.close, fast) - kernels.ema(self.close, slow)
+            signal_line = kernels.ema(macd_line, signal)
+            return macd_line, signal_line, macd_line - signal_line
+        return self._memo(("macd", fast, slow, signal), compute)
+
+    def stochastic(self, length: int = 14, smooth: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Stochastic %K (smoothed) and %D"""
+        def compute():
+            lowest_low = kernels.rolling_min(self.low, length)
+            highest_high = kernels.rolling_max(self.high, length)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                k = 100 * (self.close - lowest_low) / (highest_high - lowest_low)
+            k = kernels.rolling_mean(k, smooth)
+            d = kernels.rolling_mean(k, smooth)
+            return k, d
+        return self._memo(("stochastic", length, smooth), compute)
+
+    def ichimoku(self, conv: int = 9, base: int = 26, span: int = 52) -> Tuple[np.ndarray, ...]:
+        """Ichimoku conversion line, base line, leading spans A and B"""
+        def midpoint(window):
+            return (kernels.rolling_max(self.high, window) + kernels.rolling_min(self.low, window)) / 2
+
+        def compute():
+            conv_line = midpoint(conv)
+            base_line = midpoint(base)
+            lead1 = (conv_line + base_line) / 2
+            lead2 = midpoint(span)
+            return conv_line, base_line, lead1, lead2
+        return self._memo(("ichimoku", conv, base, span), compute)
+
+    # ---------------- Money flow ----------------
+
+    def money_flow_multiplier(self) -> np.ndarray:
+        """Chaikin money-flow multiplier ((C-L) - (H-C)) / (H-L), 0 on flat bars"""
+        return self._memo(
+            ("mf_multiplier",), lambda: _money_flow_multiplier(self.high, self.low, self.close)
+        )
+
+    def money_flow_volume(self) -> np.ndarray:
+        """Money-flow volume"""
+        return self._memo(("mf_volume",), lambda: self.money_flow_multiplier() * self.volume)
+
+    def cmf(self, period: int = 20) -> np.ndarray:
+        """Chaikin Money Flow"""
+        def compute():
+            mf_sum = kernels.rolling_sum(self.money_flow_volume(), period)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return mf_sum / kernels.rolling_sum(self.volume, period)
+        return self._memo(("cmf", period), compute)
+
+    def ad_line(self) -> np.ndarray:
+        """Accumulation/Distribution Line"""
+        def compute():
+            if self.start == 0:
+                return kernels.cumsum(self.money_flow_volume())
+            full = self._full
+            mf_multiplier = _money_flow_multiplier(full["high"], full["low"], full["close"])
+            return kernels.cumsum(mf_multiplier * full["volume"])[..., self.start:]
+        return self._memo(("ad_line",), compute)
+
+    # ---------------- Volume flow ----------------
+
+    def obv(self) -> np.ndarray:
+        """On-Balance Volume"""
+        def compute():
+            close, volume = self._full["close"], self._full["volume"]
+            return kernels.cumsum(np.sign(kernels.diff(close)) * volume)[..., self.start:]
+        return self._memo(("obv",), compute)
+
+    def cdv(self) -> np.ndarray:
+        """Cumulative volume delta (bar volume signed by candle direction)"""
+        def compute():
+            close, open_, volume = self._full["close"], self._full["open"], self._full["volume"]
+            return kernels.cumsum(np.where(close >= open_, volume, -volume))[..., self.start:]
+        return self._memo(("cdv",), compute)
@@ -3,7 +3,18 @@ JSON Utilities - Convert NumPy types to native Python types
 """
 import numpy as np
 import pandas as pd
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+def to_float(value: Any, digits: Optional[int] = None) -> float:
+    """
+    Native float for a layer output, rounded like round(value, digits)
+    
+    NaN/Inf are kept (later layers compare against them); the JSON
+    response writes them as null.
+    """
+    if digits is not None:
+        value = round(value, digits)
+    return float(value)
 
 def clean_for_json(obj: Any) -> Any:
     """
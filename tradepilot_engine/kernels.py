@@ -0,0 +1,233 @@
+"""
+Kernels - Vectorized NumPy building blocks for the layer indicators
+
+All functions take float64 arrays and work along the last axis, so the same
+code handles one symbol (bars,) or a universe (symbols, bars). Rolling
+windows follow pandas' rolling(window) defaults: the first window-1 outputs
+are NaN, and so is any window that contains a NaN or ±inf.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Spans after which an EMA seeded at an arbitrary value has converged:
+# (1 - 2/(span+1)) ** (10*span) ~ e**-20, far below the rounding of any output
+EMA_WARMUP_SPANS = 10
+
+
+def as_float_array(values) -> np.ndarray:
+    """Contiguous float64 array (no copy when the input already is one)"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Shift forward along the last axis, filling with NaN"""
+    out = np.full_like(x, np.nan)
+    if periods < x.shape[-1]:
+        out[..., periods:] = x[..., :-periods]
+    return out
+
+
+def diff(x: np.ndarray) -> np.ndarray:
+    """First difference, NaN in the first position"""
+    out = np.full_like(x, np.nan)
+    out[..., 1:] = x[..., 1:] - x[..., :-1]
+    return out
+
+
+def cumsum(x: np.ndarray) -> np.ndarray:
+    """Cumulative sum skipping NaN (NaN inputs stay NaN in the output)"""
+    with np.errstate(invalid="ignore"):
+        out = np.nancumsum(x, axis=-1)
+    out[np.isnan(x)] = np.nan
+    return out
+
+
+def _window_counts(valid: np.ndarray, window: int) -> np.ndarray:
+    """Number of valid samples in each trailing window (last-axis aligned)"""
+    counts = np.cumsum(valid, axis=-1, dtype=np.int64)
+    out = counts.copy()
+    out[..., window:] -= counts[..., :-window]
+    return out
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling sum via cumulative sums"""
+    n = x.shape[-1]
+    out = np.full_like(x, np.nan)
+    if window > n:
+        return out
+    valid = np.isfinite(x)
+    all_valid = valid.all()
+    totals = np.cumsum(x if all_valid else np.where(valid, x, 0.0), axis=-1)
+    sums = out[..., window - 1:]
+    sums[...] = totals[..., window - 1:]
+    sums[..., 1:] -= totals[..., :n - window]
+    if not all_valid:
+        sums[_window_counts(valid, window)[..., window - 1:] < window] = np.nan
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing simple moving average"""
+    return rolling_sum(x, window) / window
+
+
+def _rolling_extreme(x: np.ndarray, window: int, combine: np.ufunc, fill: float) -> np.ndarray:
+    """
+    Van Herk/Gil-Werman rolling max/min: O(n) regardless of window size.
+
+    The series is cut into blocks of `window`; every window spans the suffix
+    of one block and the prefix of the next, so its extreme is the combination
+    of a running suffix and a running prefix extreme.
+    """
+    n = x.shape[-1]
+    out = np.full_like(x, np.nan)
+    if window > n:
+        return out
+    valid = np.isfinite(x)
+    all_valid = valid.all()
+    filled = x if all_valid else np.where(valid, x, fill)
+
+    pad = (-n) % window
+    if pad:
+        pad_width = [(0, 0)] * (x.ndim - 1) + [(0, pad)]
+        filled = np.pad(filled, pad_width, constant_values=fill)
+    blocks = filled.reshape(filled.shape[:-1] + (-1, window))
+    prefix = combine.accumulate(blocks, axis=-1).reshape(filled.shape)
+    suffix = combine.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(filled.shape)
+
+    extremes = out[..., window - 1:]
+    combine(suffix[..., :n - window + 1], prefix[..., window - 1:n], out=extremes)
+    if not all_valid:
+        extremes[_window_counts(valid, window)[..., window - 1:] < window] = np.nan
+    return out
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling maximum"""
+    return _rolling_extreme(x, window, np.maximum, -np.inf)
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling minimum"""
+    return _rolling_extreme(x, window, np.minimum, np.inf)
+
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponential moving average, seeded with the first value
+    (pandas ewm(span, adjust=False)). Leading NaNs (left-padded rows of a
+    universe matrix) are skipped and stay NaN; any other NaN propagates.
+    """
+    alpha = 2.0 / (span + 1.0)
+    if x.shape[-1] == 0:
+        return x.copy()
+
+    padding = None
+    if np.isnan(x[..., 0]).any():
+        # Hold each row at its first value until it starts, which seeds the EMA there
+        first = np.argmax(~np.isnan(x), axis=-1)[..., None]
+        padding = np.arange(x.shape[-1]) < first
+        x = np.where(padding, np.take_along_axis(x, first, axis=-1), x)
+
+    zi = (1.0 - alpha) * x[..., :1]
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, axis=-1, zi=zi)
+    if padding is not None:
+        out[padding] = np.nan
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True Range (NaN on the first bar, which has no previous close)"""
+    prev_close = shift(close, 1)
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def linreg_slope(y: np.ndarray) -> np.ndarray:
+    """Least-squares slope of y against 0..n-1 along the last axis (np.polyfit deg 1)"""
+    n = y.shape[-1]
+    x = np.arange(n, dtype=np.float64)
+    x -= x.mean()
+    return (y * x).sum(axis=-1) / (x * x).sum()
+
+
+def trailing_mean(x: np.ndarray, window: int):
+    """Mean of the last `window` values (rolling(window).mean().iloc[-1])"""
+    if x.shape[-1] < window:
+        return np.full(x.shape[:-1], np.nan) if x.ndim > 1 else np.nan
+    tail = x[..., -window:]
+    return np.where(np.isfinite(tail).all(axis=-1), tail.sum(axis=-1) / window, np.nan)[()]
+
+
+def trailing_max(x: np.ndarray, window: int):
+    """Max of the last `window` values (rolling(window).max().iloc[-1])"""
+    if x.shape[-1] < window:
+        return np.full(x.shape[:-1], np.nan) if x.ndim > 1 else np.nan
+    tail = x[..., -window:]
+    return np.where(np.isfinite(tail).all(axis=-1), tail.max(axis=-1), np.nan)[()]
+
+
+def trailing_min(x: np.ndarray, window: int):
+    """Min of the last `window` values (rolling(window).min().iloc[-1])"""
+    if x.shape[-1] < window:
+        return np.full(x.shape[:-1], np.nan) if x.ndim > 1 else np.nan
+    tail = x[..., -window:]
+    return np.where(np.isfinite(tail).all(axis=-1), tail.min(axis=-1), np.nan)[()]
+
+
+# ---------------- Per-bar versions of the trailing reductions ----------------
+
+# Cap on the float64 elements one block of sliding windows may materialize
+_WINDOW_BLOCK_ELEMENTS = 1 << 22
+
+
+def rolling_linreg_slope(y: np.ndarray, window: int) -> np.ndarray:
+    """linreg_slope of every trailing `window` (NaN until the first full window)"""
+    out = np.full_like(y, np.nan)
+    if window > y.shape[-1]:
+        return out
+    x = np.arange(window, dtype=np.float64)
+    x -= x.mean()
+    out[..., window - 1:] = (sliding_window_view(y, window, axis=-1) * x).sum(axis=-1) / (x * x).sum()
+    return out
+
+
+def _percentile_virtual_index(n: int, q: float) -> float:
+    """np.percentile's (linear method) fractional index of quantile q in n sorted values"""
+    return n * q + (1 + q * -1) - 1
+
+
+def rolling_percentiles(x: np.ndarray, window: int, percentiles) -> list:
+    """
+    np.percentile (linear) of every trailing `window`, one array per percentile
+
+    Windows are sorted in blocks so memory stays bounded; the interpolation
+    reproduces np.percentile exactly. Windows that are not full or contain
+    a NaN are NaN, like np.percentile over them.
+    """
+    outs = [np.full_like(x, np.nan) for _ in percentiles]
+    n = x.shape[-1]
+    if window > n:
+        return outs
+    rows = x.reshape(-1, n)
+    views = [out.reshape(-1, n) for out in outs]
+    has_nan = rolling_sum(np.isnan(rows).astype(np.float64), window) > 0
+
+    indexes = []
+    for percentile in percentiles:
+        virtual = _percentile_virtual_index(window, percentile / 100)
+        below = int(np.floor(virtual))
+        indexes.append((below, min(below + 1, window - 1), virtual - below))
+
+    step = max(_WINDOW_BLOCK_ELEMENTS // (window * len(rows)), 1)
+    for start in range(window - 1, n, step):
+        stop = min(start + step, n)
+        ordered = np.sort(sliding_window_view(rows[:, start - window + 1:stop], window, axis=-1), axis=-1)
+        for view, (below, above, gamma) in zip(views, indexes):
+            a, b = ordered[..., below], ordered[..., above]
+            diff_b_a = b - a
+            view[:, start:stop] = b - diff_b_a * (1 - gamma) if gamma >= 0.5 else a + diff_b_a * gamma
+    for view in views:
+        view[has_nan] = np.nan
+    return outs
@@ -4,36 +4,42 @@ Advanced candlestick pattern detection
 """
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
 
 class Layer10CandleIntelligence:
     """Candle pattern intelligence"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    lookback = 3
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run candle pattern analysis"""
-        df = df.copy()
         
         # Get last few candles
-        if len(df) < 3:
+        if ctx is None:
+            ctx = IndicatorContext(df)
+        
+        if len(ctx) < 3:
             return {"error": "Not enough data", "signal": "NEUTRAL"}
         
         # Current candle
-        is_bullish = df["close"].iloc[-1] > df["open"].iloc[-1]
-        body_size = abs(df["close"].iloc[-1] - df["open"].iloc[-1])
-        candle_range = df["high"].iloc[-1] - df["low"].iloc[-1]
+        is_bullish = bool(ctx.close[-1] > ctx.open[-1])
+        body_size = abs(ctx.close[-1] - ctx.open[-1])
+        candle_range = ctx.high[-1] - ctx.low[-1]
         body_percent = body_size / candle_range if candle_range > 0 else 0
         
         # Previous candle
-        prev_bullish = df["close"].iloc[-2] > df["open"].iloc[-2]
-        prev_body = abs(df["close"].iloc[-2] - df["open"].iloc[-2])
+        prev_bullish = bool(ctx.close[-2] > ctx.open[-2])
+        prev_body = abs(ctx.close[-2] - ctx.open[-2])
         
         # Pattern detection
-        bullish_engulfing = is_bullish and not prev_bullish and body_size > prev_body * 1.1
-        bearish_engulfing = not is_bullish and prev_bullish and body_size > prev_body * 1.1
+        bullish_engulfing = is_bullish and not prev_bullish and bool(body_size > prev_body * 1.1)
+        bearish_engulfing = not is_bullish and prev_bullish and bool(body_size > prev_body * 1.1)
         
-        doji = body_percent < 0.1
-        hammer = is_bullish and df["lower_wick"].iloc[-1] > body_size * 2
-        shooting_star = not is_bullish and df["upper_wick"].iloc[-1] > body_size * 2
+        doji = bool(body_percent < 0.1)
+        hammer = is_bullish and bool(ctx.lower_wick()[-1] > body_size * 2)
+        shooting_star = not is_bullish and bool(ctx.upper_wick()[-1] > body_size * 2)
         
         # Pattern score
         pattern_score = 0
@@ -58,7 +64,7 @@ class Layer10CandleIntelligence:
         return {
             "pattern_score": round(pattern_score, 2),
             "pattern_strength": pattern_strength,
-            "body_percent": round(body_percent * 100, 2),
+            "body_percent": to_float(body_percent * 100, 2),
             "is_bullish": is_bullish,
             "is_doji": doji,
             "is_hammer": hammer,
@@ -4,101 +4,72 @@ Combines OBV, A/D Line, and CMF with divergence detection
 """
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer2Volume:
     """Volume analysis with OBV, A/D Line, CMF and divergence detection"""
     
     def __init__(self):
-        self.obv_ma_length = 14
-        self.ad_ma_length = 14
         self.cmf_length = 20
         self.cmf_threshold = 0.05
         self.vol_sma_length = 20
+        self.lookback = max(self.cmf_length, self.vol_sma_length)
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run full volume analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
         # Calculate OBV
-        obv = self._calculate_obv(df)
-        obv_ma = obv.rolling(window=self.obv_ma_length).mean()
+        obv = ctx.obv()
         obv_slope = self._calculate_slope(obv, 5)
-        df["obv"] = obv
-        df["obv_ma"] = obv_ma
         
         # Calculate A/D Line
-        ad_line = self._calculate_ad_line(df)
-        ad_ma = ad_line.rolling(window=self.ad_ma_length).mean()
+        ad_line = ctx.ad_line()
         ad_slope = self._calculate_slope(ad_line, 5)
-        df["ad_line"] = ad_line
-        df["ad_ma"] = ad_ma
         
         # Calculate CMF
-        cmf = self._calculate_cmf(df, self.cmf_length)
-        df["cmf"] = cmf
+        cmf = ctx.cmf(self.cmf_length)
         
         # Volume analysis
-        avg_vol = df["volume"].rolling(window=self.vol_sma_length).mean()
-        vol_ratio = df["volume"].iloc[-1] / avg_vol.iloc[-1] if avg_vol.iloc[-1] > 0 else 1
+        avg_vol = kernels.trailing_mean(ctx.volume, self.vol_sma_length)
+        vol_ratio = ctx.volume[-1] / avg_vol if avg_vol > 0 else 1
         
         # Calculate volume flow score
         obv_strength = self._calculate_strength(obv_slope)
         ad_strength = self._calculate_strength(ad_slope)
-        cmf_strength = cmf.iloc[-1] * 100 if not pd.isna(cmf.iloc[-1]) else 0
+        cmf_strength = cmf[-1] * 100 if not pd.isna(cmf[-1]) else 0
         
         volume_flow_score = (obv_strength + ad_strength + cmf_strength) / 3
         
         # Signal generation
         signal = self._generate_signal(
-            volume_flow_score, obv_slope, ad_slope, cmf.iloc[-1]
+            volume_flow_score, obv_slope, ad_slope, cmf[-1]
         )
         
         return {
-            "volume_flow_score": round(volume_flow_score, 2),
-            "obv": round(obv.iloc[-1], 0),
-            "obv_slope": round(obv_slope, 2),
+            "volume_flow_score": to_float(volume_flow_score, 2),
+            "obv": to_float(obv[-1], 0),
+            "obv_slope": to_float(obv_slope, 2),
             "obv_trend": "RISING" if obv_slope > 0 else "FALLING",
-            "ad_line": round(ad_line.iloc[-1], 0),
-            "ad_slope": round(ad_slope, 2),
+            "ad_line": to_float(ad_line[-1], 0),
+            "ad_slope": to_float(ad_slope, 2),
             "ad_trend": "ACCUMULATION" if ad_slope > 0 else "DISTRIBUTION",
-            "cmf": round(cmf.iloc[-1], 4),
-            "volume_ratio": round(vol_ratio, 2),
-            "avg_volume": round(avg_vol.iloc[-1], 0),
-            "current_volume": round(df["volume"].iloc[-1], 0),
+            "cmf": to_float(cmf[-1], 4),
+            "volume_ratio": to_float(vol_ratio, 2),
+            "avg_volume": to_float(avg_vol, 0),
+            "current_volume": to_float(ctx.volume[-1], 0),
             "signal": signal
         }
     
-    def _calculate_obv(self, df: pd.DataFrame) -> pd.Series:
-        """Calculate On-Balance Volume"""
-        direction = np.sign(df["close"].diff())
-        obv = (direction * df["volume"]).cumsum()
-        return obv
-    
-    def _calculate_ad_line(self, df: pd.DataFrame) -> pd.Series:
-        """Calculate Accumulation/Distribution Line"""
-        mf_multiplier = ((df["close"] - df["low"]) - (df["high"] - df["close"])) / (df["high"] - df["low"])
-        mf_multiplier = mf_multiplier.fillna(0)
-        mf_volume = mf_multiplier * df["volume"]
-        ad_line = mf_volume.cumsum()
-        return ad_line
-    
-    def _calculate_cmf(self, df: pd.DataFrame, period: int) -> pd.Series:
-        """Calculate Chaikin Money Flow"""
-        mf_multiplier = ((df["close"] - df["low"]) - (df["high"] - df["close"])) / (df["high"] - df["low"])
-        mf_multiplier = mf_multiplier.fillna(0)
-        mf_volume = mf_multiplier * df["volume"]
-        cmf = mf_volume.rolling(window=period).sum() / df["volume"].rolling(window=period).sum()
-        return cmf
-    
-    def _calculate_slope(self, series: pd.Series, period: int) -> float:
+    def _calculate_slope(self, series: np.ndarray, period: int) -> float:
         """Calculate slope of a series"""
         if len(series) < period:
             return 0
-        recent = series.iloc[-period:]
-        x = np.arange(len(recent))
-        slope = np.polyfit(x, recent, 1)[0]
-        return slope
+        return kernels.linreg_slope(series[-period:])
     
     def _calculate_strength(self, slope: float) -> float:
         """Convert slope to strength score"""
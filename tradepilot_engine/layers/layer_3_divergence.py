@@ -3,27 +3,31 @@ Layer 3: Divergence Engine
 Delta divergence detection and CDV analysis
 """
 import pandas as pd
-import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer3Divergence:
     """Divergence analysis using delta and CDV"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    lookback = 20
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run divergence analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
-        # Calculate delta (simplified)
-        delta = np.where(df["close"] >= df["open"], df["volume"], -df["volume"])
-        cdv = pd.Series(delta).cumsum()
+        # Cumulative volume delta (simplified)
+        cdv = ctx.cdv()
         
         # CDV analysis
-        cdv_slope = np.polyfit(np.arange(len(cdv.iloc[-20:])), cdv.iloc[-20:], 1)[0] if len(cdv) >= 20 else 0
+        cdv_slope = kernels.linreg_slope(cdv[-20:]) if len(cdv) >= 20 else 0
         cdv_bias = "BULLISH" if cdv_slope > 0 else "BEARISH"
         
         return {
-            "cdv": float(cdv.iloc[-1]),
-            "cdv_slope": round(cdv_slope, 2),
+            "cdv": to_float(cdv[-1]),
+            "cdv_slope": to_float(cdv_slope, 2),
             "cdv_bias": cdv_bias,
             "signal": "BUY" if cdv_bias == "BULLISH" else "SELL"
         }
@@ -3,18 +3,24 @@ Layer 4: Volume Strength Engine
 RVOL and volume spike detection
 """
 import pandas as pd
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer4VolumeStrength:
     """Volume strength analysis with RVOL"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    lookback = 20
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run volume strength analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
         # Calculate RVOL
-        avg_volume = df["volume"].rolling(window=20).mean()
-        rvol = df["volume"].iloc[-1] / avg_volume.iloc[-1] if avg_volume.iloc[-1] > 0 else 1
+        avg_volume = kernels.trailing_mean(ctx.volume, 20)
+        rvol = ctx.volume[-1] / avg_volume if avg_volume > 0 else 1
         
         # Classify RVOL state
         if rvol >= 3.0:
@@ -29,9 +35,9 @@ class Layer4VolumeStrength:
             state = "LOW"
         
         return {
-            "rvol": round(rvol, 2),
+            "rvol": to_float(rvol, 2),
             "rvol_state": state,
-            "avg_volume": float(avg_volume.iloc[-1]),
-            "current_volume": float(df["volume"].iloc[-1]),
-            "signal": "STRONG_BUY" if rvol > 2.0 and df["close"].iloc[-1] > df["open"].iloc[-1] else "NEUTRAL"
+            "avg_volume": to_float(avg_volume),
+            "current_volume": to_float(ctx.volume[-1]),
+            "signal": "STRONG_BUY" if rvol > 2.0 and ctx.close[-1] > ctx.open[-1] else "NEUTRAL"
         }
@@ -3,52 +3,48 @@ Layer 5: Trend Engine
 SuperTrend, ADX/DMI, and moving averages
 """
 import pandas as pd
-import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer5Trend:
     """Trend analysis with multiple indicators"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    lookback = 200
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run trend analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
         # Calculate moving averages
-        ma20 = df["close"].rolling(window=20).mean()
-        ma50 = df["close"].rolling(window=50).mean()
-        ma200 = df["close"].rolling(window=200).mean()
-        
-        # Calculate ADX (simplified)
-        up_move = df["high"].diff()
-        down_move = -df["low"].diff()
-        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
-        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
+        ma20 = kernels.trailing_mean(ctx.close, 20)
+        ma50 = kernels.trailing_mean(ctx.close, 50)
+        ma200 = kernels.trailing_mean(ctx.close, 200)
         
-        tr = df["true_range"]
-        atr = tr.rolling(window=14).mean()
-        plus_di = 100 * pd.Series(plus_dm).rolling(window=14).mean() / atr
-        minus_di = 100 * pd.Series(minus_dm).rolling(window=14).mean() / atr
-        dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
-        adx = dx.rolling(window=14).mean()
+        # ADX/DMI (shared with Layer 1)
+        adx, plus_di, minus_di = ctx.dmi(14)
         
         # Trend classification
-        trend_direction = "BULLISH" if plus_di.iloc[-1] > minus_di.iloc[-1] else "BEARISH"
-        trend_strength = "STRONG" if adx.iloc[-1] > 40 else "MODERATE" if adx.iloc[-1] > 25 else "WEAK"
+        trend_direction = "BULLISH" if plus_di[-1] > minus_di[-1] else "BEARISH"
+        trend_strength = "STRONG" if adx[-1] > 40 else "MODERATE" if adx[-1] > 25 else "WEAK"
         
         # Trend score
-        ma_trend = 1 if (df["close"].iloc[-1] > ma20.iloc[-1] > ma50.iloc[-1] > ma200.iloc[-1]) else -1 if (df["close"].iloc[-1] < ma20.iloc[-1] < ma50.iloc[-1] < ma200.iloc[-1]) else 0
-        dmi_trend = 1 if plus_di.iloc[-1] > minus_di.iloc[-1] else -1
+        close = ctx.close[-1]
+        ma_trend = 1 if (close > ma20 > ma50 > ma200) else -1 if (close < ma20 < ma50 < ma200) else 0
+        dmi_trend = 1 if plus_di[-1] > minus_di[-1] else -1
         trend_score = (ma_trend + dmi_trend) / 2 * 100
         
         return {
-            "trend_score": round(trend_score, 2),
+            "trend_score": to_float(trend_score, 2),
             "trend_direction": trend_direction,
             "trend_strength": trend_strength,
-            "adx": round(adx.iloc[-1], 2),
-            "plus_di": round(plus_di.iloc[-1], 2),
-            "minus_di": round(minus_di.iloc[-1], 2),
-            "ma20": round(ma20.iloc[-1], 2),
-            "ma50": round(ma50.iloc[-1], 2),
-            "ma200": round(ma200.iloc[-1], 2),
-            "signal": "STRONG_BUY" if trend_score > 50 and adx.iloc[-1] > 25 else "STRONG_SELL" if trend_score < -50 and adx.iloc[-1] > 25 else "NEUTRAL"
+            "adx": to_float(adx[-1], 2),
+            "plus_di": to_float(plus_di[-1], 2),
+            "minus_di": to_float(minus_di[-1], 2),
+            "ma20": to_float(ma20, 2),
+            "ma50": to_float(ma50, 2),
+            "ma200": to_float(ma200, 2),
+            "signal": "STRONG_BUY" if trend_score > 50 and adx[-1] > 25 else "STRONG_SELL" if trend_score < -50 and adx[-1] > 25 else "NEUTRAL"
         }
@@ -3,34 +3,40 @@ Layer 6: Market Structure Engine
 CHoCH, BOS, Order Blocks, and FVG detection
 """
 import pandas as pd
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer6Structure:
     """Market structure analysis"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    lookback = 11
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run structure analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
-        # Simplified structure analysis
+        # Simplified structure analysis: the last complete centered pivot
+        # window (pivot_len bars each side) is the trailing 2*pivot_len+1 bars
         pivot_len = 5
-        high_pivots = df["high"].rolling(window=pivot_len*2+1, center=True).max()
-        low_pivots = df["low"].rolling(window=pivot_len*2+1, center=True).min()
+        pivot_window = pivot_len * 2 + 1
         
-        last_high = high_pivots.dropna().iloc[-1] if len(high_pivots.dropna()) > 0 else df["high"].iloc[-1]
-        last_low = low_pivots.dropna().iloc[-1] if len(low_pivots.dropna()) > 0 else df["low"].iloc[-1]
+        last_high = kernels.trailing_max(ctx.high, pivot_window) if len(ctx) >= pivot_window else ctx.high[-1]
+        last_low = kernels.trailing_min(ctx.low, pivot_window) if len(ctx) >= pivot_window else ctx.low[-1]
         
         # Determine bias
-        if df["close"].iloc[-1] > last_high:
+        if ctx.close[-1] > last_high:
             bias = "BULLISH"
-        elif df["close"].iloc[-1] < last_low:
+        elif ctx.close[-1] < last_low:
             bias = "BEARISH"
         else:
             bias = "NEUTRAL"
         
         return {
             "bias": bias,
-            "last_high": round(last_high, 2),
-            "last_low": round(last_low, 2),
+            "last_high": to_float(last_high, 2),
+            "last_low": to_float(last_low, 2),
             "signal": "BUY" if bias == "BULLISH" else "SELL" if bias == "BEARISH" else "NEUTRAL"
         }
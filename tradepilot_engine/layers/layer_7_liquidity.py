@@ -3,22 +3,29 @@ Layer 7: Liquidity Engine
 Liquidity sweep and hunt detection
 """
 import pandas as pd
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer7Liquidity:
     """Liquidity analysis"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    # 20-bar swing range before the current bar
+    lookback = 21
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run liquidity analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
-        # Simplified liquidity score
-        swing_high = df["high"].rolling(window=20).max()
-        swing_low = df["low"].rolling(window=20).min()
+        # Simplified liquidity score: 20-bar swings as of the previous bar
+        swing_high = kernels.trailing_max(ctx.high[:-1], 20)
+        swing_low = kernels.trailing_min(ctx.low[:-1], 20)
         
         # Check for potential sweeps
-        bullish_sweep = (df["low"].iloc[-1] < swing_low.iloc[-2] and df["close"].iloc[-1] > swing_low.iloc[-2])
-        bearish_sweep = (df["high"].iloc[-1] > swing_high.iloc[-2] and df["close"].iloc[-1] < swing_high.iloc[-2])
+        bullish_sweep = (ctx.low[-1] < swing_low and ctx.close[-1] > swing_low)
+        bearish_sweep = (ctx.high[-1] > swing_high and ctx.close[-1] < swing_high)
         
         liquidity_score = 50.0
         if bullish_sweep:
@@ -27,6 +34,6 @@ class Layer7Liquidity:
             liquidity_score = 25.0
         
         return {
-            "liquidity_score": round(liquidity_score, 2),
+            "liquidity_score": to_float(liquidity_score, 2),
             "signal": "BUY" if bullish_sweep else "SELL" if bearish_sweep else "NEUTRAL"
         }
@@ -4,29 +4,33 @@ ATR-based volatility classification
 """
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+from .. import kernels
 
 class Layer8VolatilityRegime:
     """Volatility regime classification"""
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    # 100 smoothed ATRP samples after the ATR(14) and 5-bar smoothing warm-up
+    lookback = 100 + 14 + 5
+    
+    def analyze(self, df: pd.DataFrame, ctx: Optional[IndicatorContext] = None) -> Dict:
         """Run volatility analysis"""
-        df = df.copy()
+        if ctx is None:
+            ctx = IndicatorContext(df)
         
         # Calculate ATRP (ATR as percentage)
-        atr = df["true_range"].rolling(window=14).mean()
-        atrp = (atr / df["close"]) * 100
-        atrp_smoothed = atrp.rolling(window=5).mean()
+        atr = ctx.atr(14)
+        atrp = (atr / ctx.close) * 100
+        atrp_smoothed = kernels.rolling_mean(atrp, 5)
         
         # Calculate percentiles
-        atrp_values = atrp_smoothed.dropna().iloc[-100:]
+        atrp_values = atrp_smoothed[~np.isnan(atrp_smoothed)][-100:]
         if len(atrp_values) > 0:
-            p20 = np.percentile(atrp_values, 20)
-            p40 = np.percentile(atrp_values, 40)
-            p60 = np.percentile(atrp_values, 60)
-            p80 = np.percentile(atrp_values, 80)
+            p20, p40, p60, p80 = np.percentile(atrp_values, [20, 40, 60, 80])
             
-            current_atrp = atrp_smoothed.iloc[-1]
+            current_atrp = atrp_smoothed[-1]
             
             if current_atrp <= p20:
                 regime = "LOW"
@@ -44,7 +48,7 @@ class Layer8VolatilityRegime:
         
         return {
             "regime": regime,
-            "atrp": round(current_atrp, 4) if not pd.isna(current_atrp) else 0,
-            "atr": round(atr.iloc[-1], 4),
+            "atrp": to_float(current_atrp, 4) if not pd.isna(current_atrp) else 0,
+            "atr": to_float(atr[-1], 4),
             "signal": "NEUTRAL"
         }
@@ -1,70 +1,103 @@
 """
 Layer 9: Confirmation Engine
 Multi-timeframe confirmation system
+
+Combines the momentum, volume and trend signals of the analyzed timeframe
+and, when the engine passes them, of coarser timeframes resampled from the
+same bars (see IndicatorContext.resampled).
 """
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Optional
+from ..indicators import IndicatorContext
+from ..json_utils import to_float
+
+# Layers whose signals are confirmed (on every timeframe)
+CONFIRMATION_LAYERS = ("layer_1_momentum", "layer_2_volume", "layer_5_trend")
 
 class Layer9Confirmation:
     """Confirmation analysis across layers"""
     
-    def analyze(self, df: pd.DataFrame, layer_results: Dict) -> Dict:
-        """Run confirmation analysis based on other layers"""
-        
-        # Collect signals from other layers
-        signals = []
-        
-        if "layer_1_momentum" in layer_results:
-            mom_signal = layer_results["layer_1_momentum"].get("signal", "NEUTRAL")
-            if "BUY" in mom_signal:
-                signals.append(1)
-            elif "SELL" in mom_signal:
-                signals.append(-1)
-            else:
-                signals.append(0)
+    # Reads other layers' results, not bars
+    lookback = 0
+    
+    def analyze(self, df: pd.DataFrame, layer_results: Dict, ctx: Optional[IndicatorContext] = None,
+                timeframes: Optional[Dict[str, Dict]] = None) -> Dict:
+        """
+        Run confirmation analysis based on other layers
         
-        if "layer_2_volume" in layer_results:
-            vol_signal = layer_results["layer_2_volume"].get("signal", "NEUTRAL")
-            if "BUY" in vol_signal:
-                signals.append(1)
-            elif "SELL" in vol_signal:
-                signals.append(-1)
-            else:
-                signals.append(0)
+        Args:
+            df: OHLCV DataFrame (unused; signals come from layer_results)
+            layer_results: Results of layers 1, 2 and 5 on the analyzed timeframe
+            ctx: Shared indicator context (unused)
+            timeframes: Results of layers 1, 2 and 5 on coarser timeframes,
+                {timeframe: {layer_name: result}} or {timeframe: {"error": ...}}
+                for views without enough bars. Every usable timeframe gets an
+                equal vote with the analyzed one.
+        """
+        signals = self._layer_signals(layer_results)
+        votes = [sum(signals) / len(signals)] if signals else []
         
-        if "layer_5_trend" in layer_results:
-            trend_signal = layer_results["layer_5_trend"].get("signal", "NEUTRAL")
-            if "BUY" in trend_signal:
-                signals.append(1)
-            elif "SELL" in trend_signal:
-                signals.append(-1)
-            else:
-                signals.append(0)
+        timeframe_results = {}
+        for timeframe, results in (timeframes or {}).items():
+            if "error" in results:
+                timeframe_results[timeframe] = results
+                continue
+            tf_signals = self._layer_signals(results)
+            if not tf_signals:
+                continue
+            tf_avg = sum(tf_signals) / len(tf_signals)
+            votes.append(tf_avg)
+            signals += tf_signals
+            tf_confirmation = int(tf_avg * 2)
+            timeframe_results[timeframe] = {
+                "confirmation_signal": tf_confirmation,
+                "signals_aligned": len([s for s in tf_signals if abs(s) > 0]),
+                "signal": self._signal(tf_confirmation),
+                "bars": results.get("bars")
+            }
         
         # Calculate confirmation
-        if len(signals) > 0:
-            avg_signal = sum(signals) / len(signals)
+        if len(votes) > 0:
+            avg_signal = sum(votes) / len(votes)
             confirmation_signal = int(avg_signal * 2)  # Scale to -2 to +2
             confidence = abs(avg_signal) * 100
         else:
             confirmation_signal = 0
             confidence = 0
         
-        # Generate signal
+        result = {
+            "confirmation_signal": confirmation_signal,
+            "confidence": to_float(confidence, 2),
+            "signals_aligned": len([s for s in signals if abs(s) > 0]),
+            "signal": self._signal(confirmation_signal)
+        }
+        if timeframes is not None:
+            result["timeframes"] = timeframe_results
+        return result
+    
+    @staticmethod
+    def _layer_signals(layer_results: Dict) -> List[int]:
+        """+1/-1/0 for the BUY/SELL/other signal of each confirmed layer present"""
+        signals = []
+        for name in CONFIRMATION_LAYERS:
+            if name in layer_results:
+                signal = layer_results[name].get("signal", "NEUTRAL")
+                if "BUY" in signal:
+                    signals.append(1)
+                elif "SELL" in signal:
+                    signals.append(-1)
+                else:
+                    signals.append(0)
+        return signals
+    
+    @staticmethod
+    def _signal(confirmation_signal: int) -> str:
         if confirmation_signal >= 2:
-            signal = "STRONG_BUY"
+            return "STRONG_BUY"
         elif confirmation_signal == 1:
-            signal = "BUY"
+            return "BUY"
         elif confirmation_signal <= -2:
-            signal = "STRONG_SELL"
+            return "STRONG_SELL"
         elif confirmation_signal == -1:
-            signal = "SELL"
-        else:
-            signal = "NEUTRAL"
-        
-        return {
-            "confirmation_signal": confirmation_signal,
-            "confidence": round(confidence, 2),
-            "signals_aligned": len([s for s in signals if abs(s) > 0]),
-            "signal": signal
-        }
+            return "SELL"
+        return "NEUTRAL"
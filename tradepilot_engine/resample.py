@@ -0,0 +1,106 @@
+"""
+Resample - Vectorized OHLCV aggregation into coarser timeframes
+
+Bars are grouped by the bucket their timestamp falls in, Polygon's way:
+clock minutes and hours, and New York calendar days, weeks (starting
+Sunday) and months. Each bucket is labeled with its start, so a view built
+from minute bars lines up with the same timeframe fetched from Polygon
+(the latest bucket is still forming, like Polygon's current bar).
+
+Buckets are contiguous runs of sorted bars, so every field is one
+ufunc.reduceat over the run starts: no groupby, no Python loop.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Mapping
+
+MARKET_TZ = "America/New_York"
+
+# Timeframes from finest to coarsest
+TIMEFRAMES = ("second", "minute", "hour", "day", "week", "month")
+
+# Clock-aligned bucket length in ms (New York offsets are whole hours)
+_CLOCK_MS = {"second": 1_000, "minute": 60_000, "hour": 3_600_000}
+
+# Most trading seconds one bar can span: intraday bars cover the extended
+# session (04:00-20:00, 16 hours a day), weeks 5 and months 23 trading days
+_DAY_SECONDS = 16 * 3600
+_SPAN_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": _DAY_SECONDS,
+                 "week": 5 * _DAY_SECONDS, "month": 23 * _DAY_SECONDS}
+
+
+def is_coarser(timeframe: str, base: str) -> bool:
+    """True if timeframe's bars are built from whole bars of base"""
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe: {timeframe}. Available: {list(TIMEFRAMES)}")
+    return base in TIMEFRAMES and TIMEFRAMES.index(timeframe) > TIMEFRAMES.index(base)
+
+
+def bars_per_bucket(timeframe: str, base: str) -> int:
+    """Most `base` bars that one `timeframe` bucket holds (an upper bound, for sizing fetches)"""
+    if not is_coarser(timeframe, base):
+        raise ValueError(f"{timeframe} is not coarser than {base}")
+    return -(-_SPAN_SECONDS[timeframe] // _SPAN_SECONDS[base])
+
+
+def _bucket_keys(t: np.ndarray, timeframe: str) -> np.ndarray:
+    """Bucket of every bar: its start in ms (clock timeframes) or its first local day"""
+    if timeframe in _CLOCK_MS:
+        return t - t % _CLOCK_MS[timeframe]
+    local = pd.DatetimeIndex(pd.to_datetime(t, unit="ms", utc=True)).tz_convert(MARKET_TZ)
+    days = local.tz_localize(None).values.astype("datetime64[D]")
+    if timeframe == "week":
+        # 1970-01-01 was a Thursday: (day + 4) % 7 counts days since Sunday
+        return days - (days.astype(np.int64) + 4) % 7
+    if timeframe == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if timeframe == "day":
+        return days
+    raise ValueError(f"Unknown timeframe: {timeframe}. Available: {list(TIMEFRAMES)}")
+
+
+def _bucket_labels(keys: np.ndarray, timeframe: str) -> np.ndarray:
+    """Bucket start timestamps (ms) of bucket keys"""
+    if timeframe in _CLOCK_MS:
+        return keys
+    return pd.DatetimeIndex(keys).tz_localize(MARKET_TZ).as_unit("ms").asi8
+
+
+def resample(bars: Mapping[str, np.ndarray], timeframe: str) -> Dict[str, np.ndarray]:
+    """
+    Aggregate sorted bars into timeframe buckets
+
+    Args:
+        bars: Columns keyed by DataFrame name: timestamp (ms), open, high,
+            low, close, volume and optionally vwap and trades
+        timeframe: Target timeframe (see TIMEFRAMES)
+
+    Returns:
+        The same columns, one value per bucket, oldest first
+    """
+    t = np.asarray(bars["timestamp"], dtype=np.int64)
+    if len(t) == 0:
+        return {name: np.asarray(values)[:0] for name, values in bars.items()}
+
+    keys = _bucket_keys(t, timeframe)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(t)) - 1
+
+    def column(name: str) -> np.ndarray:
+        return np.asarray(bars[name], dtype=np.float64)
+
+    volume = np.add.reduceat(column("volume"), starts)
+    out = {
+        "timestamp": _bucket_labels(keys[starts], timeframe),
+        "open": column("open")[starts],
+        "high": np.maximum.reduceat(column("high"), starts),
+        "low": np.minimum.reduceat(column("low"), starts),
+        "close": column("close")[ends],
+        "volume": volume,
+    }
+    if "vwap" in bars:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["vwap"] = np.add.reduceat(column("vwap") * column("volume"), starts) / volume
+    if "trades" in bars:
+        out["trades"] = np.add.reduceat(column("trades"), starts)
+    return out
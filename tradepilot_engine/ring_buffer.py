@@ -0,0 +1,179 @@
+"""
+Ring Buffer - Fixed-memory bar storage per (symbol, timeframe)
+
+BarRingBuffer keeps the latest `capacity` bars (timestamp, OHLCV, vwap,
+trades) in preallocated NumPy arrays. Every bar is written twice, at `pos`
+and `pos + capacity`, so the latest N bars are always one contiguous slice:
+appends are O(1) and reads are zero-copy views, never a concatenate.
+
+Views are read-only and stay valid for `capacity - N` further appends (the
+oldest viewed bar is overwritten after that); copy them to keep them longer.
+
+The buffer is accepted wherever candles are: DataProcessor converts it
+without copying, and it reads like a bar DataFrame (buffer["close"]), so
+IndicatorContext and the layers take it directly.
+"""
+import os
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+# Float fields in row order of the value matrix (the timestamp is kept as int64)
+VALUE_FIELDS = ("o", "h", "l", "c", "v", "vw", "n")
+
+# DataFrame column names -> Polygon fields
+_FIELD_NAMES = {
+    "open": "o",
+    "high": "h",
+    "low": "l",
+    "close": "c",
+    "volume": "v",
+    "vwap": "vw",
+    "trades": "n",
+    "timestamp": "t",
+}
+
+
+class BarRingBuffer:
+    """Latest `capacity` bars of one symbol and timeframe, oldest first"""
+
+    def __init__(self, capacity: int, symbol: str = "", timeframe: str = ""):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self._t = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.full((len(VALUE_FIELDS), 2 * capacity), np.nan)
+        self._pos = 0   # next write slot in [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_t(self) -> Optional[int]:
+        return int(self._t[self._pos + self.capacity - 1]) if self._size else None
+
+    def _write(self, t: int, row):
+        pos = self._pos
+        self._t[pos] = self._t[pos + self.capacity] = t
+        self._values[:, pos] = self._values[:, pos + self.capacity] = row
+
+    def append(self, bar: Mapping) -> bool:
+        """
+        Add one Polygon aggregate bar ({"t", "o", "h", "l", "c", "v", "vw"?, "n"?})
+
+        A bar with the latest timestamp replaces it (an updated bar); older
+        bars are ignored. Returns True if the bar was stored.
+        """
+        t = int(bar["t"])
+        last_t = self.last_t
+        if last_t is not None and t <= last_t:
+            if t != last_t:
+                return False
+            # Rewrite the newest slot in place
+            self._pos = (self._pos - 1) % self.capacity
+            self._size -= 1
+        self._write(t, [bar.get(field, np.nan) for field in VALUE_FIELDS])
+        self._pos = (self._pos + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        return True
+
+    def extend(self, columns: Mapping[str, np.ndarray]) -> int:
+        """
+        Add columnar bars ({"t": [...], "o": [...], ...}, oldest first) in one vectorized write
+
+        Bars not newer than the latest stored one are skipped. Returns the number stored.
+        """
+        t = np.asarray(columns["t"], dtype=np.int64)
+        if self._size:
+            t = t[t > self.last_t]
+        count = len(t)
+        if count == 0:
+            return 0
+        keep = min(count, self.capacity)
+        rows = np.full((len(VALUE_FIELDS), keep), np.nan)
+        for i, field in enumerate(VALUE_FIELDS):
+            if field in columns:
+                rows[i] = np.asarray(columns[field], dtype=np.float64)[-count:][-keep:]
+        t = t[-keep:]
+
+        # Slots pos .. pos+keep wrap around the end of the first copy at most once
+        slots = (self._pos + np.arange(keep)) % self.capacity
+        self._t[slots] = self._t[slots + self.capacity] = t
+        self._values[:, slots] = self._values[:, slots + self.capacity] = rows
+        self._pos = (self._pos + keep) % self.capacity
+        self._size = min(self._size + keep, self.capacity)
+        return count
+
+    def _window(self, limit: Optional[int]) -> slice:
+        count = self._size if limit is None else min(max(limit, 0), self._size)
+        end = self._pos + self.capacity
+        return slice(end - count, end)
+
+    @staticmethod
+    def _read_only(values: np.ndarray) -> np.ndarray:
+        values.flags.writeable = False
+        return values
+
+    def columns(self, limit: Optional[int] = None, copy: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Latest `limit` bars (all if None), keyed by Polygon field
+
+        Read-only contiguous views by default; copy=True returns copies that
+        later appends cannot change.
+        """
+        window = self._window(limit)
+        if copy:
+            columns = {"t": self._t[window].copy()}
+            columns.update(zip(VALUE_FIELDS, self._values[:, window].copy()))
+            return columns
+        columns = {"t": self._read_only(self._t[window])}
+        for i, field in enumerate(VALUE_FIELDS):
+            columns[field] = self._read_only(self._values[i, window])
+        return columns
+
+    def to_candles(self, limit: Optional[int] = None, copy: bool = False) -> Dict:
+        """Latest `limit` bars as columnar candles (views unless copy=True)"""
+        columns = self.columns(limit, copy)
+        return {"ticker": self.symbol, "resultsCount": len(columns["t"]), "columns": columns}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """All buffered bars of one field, by DataFrame column name or Polygon field"""
+        field = _FIELD_NAMES.get(name, name)
+        window = self._window(None)
+        if field == "t":
+            return self._read_only(self._t[window])
+        if field not in VALUE_FIELDS:
+            raise KeyError(name)
+        return self._read_only(self._values[VALUE_FIELDS.index(field), window])
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the preallocated arrays (fixed for a given capacity)"""
+        return self._t.nbytes + self._values.nbytes
+
+    # ---------------- Persistence ----------------
+
+    def save(self, path: str):
+        """Write the buffered bars to an uncompressed .npz file"""
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            t=self._t[self._window(None)],
+            values=self._values[:, self._window(None)],
+            capacity=self.capacity,
+            symbol=self.symbol,
+            timeframe=self.timeframe,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, capacity: Optional[int] = None) -> "BarRingBuffer":
+        """Restore a buffer written by save() (optionally with a new capacity)"""
+        with np.load(path) as data:
+            buffer = cls(capacity or int(data["capacity"]), str(data["symbol"]), str(data["timeframe"]))
+            columns = {"t": data["t"]}
+            columns.update(zip(VALUE_FIELDS, data["values"]))
+            buffer.extend(columns)
+        return buffer
@@ -0,0 +1,533 @@
+"""
+Streaming - Incremental indicator state for bar-by-bar updates
+
+StreamingContext keeps every indicator the layers ask for as O(1)-per-bar
+state (running sums, EMA recurrences, running totals, monotonic-deque
+rolling highs/lows) and exposes the same interface as IndicatorContext, so
+the layers run unchanged on it. Only the last `capacity` bars of each
+series are kept, which is enough for the engine's largest layer lookback.
+
+Semantics follow the vectorized kernels: a rolling window containing a NaN
+or ±inf is NaN, EMAs are seeded with their first input, and cumulative
+levels (OBV, A/D, CDV) are summed from the first bar the stream saw.
+"""
+import math
+import threading
+import numpy as np
+from collections import deque
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from .indicators import OHLCV_COLUMNS
+
+NAN = float("nan")
+
+
+class Bar(NamedTuple):
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def _div(a: float, b: float) -> float:
+    """a / b with NumPy float semantics (x/0 is ±inf, 0/0 is NaN)"""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _sign(x: float) -> float:
+    if x != x:
+        return NAN
+    return 1.0 if x > 0 else -1.0 if x < 0 else 0.0
+
+
+def _money_flow_multiplier(bar: Bar) -> float:
+    """((C-L) - (H-C)) / (H-L), 0 on flat bars (0/0)"""
+    value = _div((bar.close - bar.low) - (bar.high - bar.close), bar.high - bar.low)
+    return 0.0 if value != value else value
+
+
+# ---------------- Incremental primitives ----------------
+
+class RingSeries:
+    """Fixed-capacity history of a float series (oldest values overwritten)"""
+
+    __slots__ = ("buffer", "pos", "size")
+
+    def __init__(self, capacity: int):
+        self.buffer = np.full(capacity, np.nan)
+        self.pos = 0
+        self.size = 0
+
+    def append(self, value: float):
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.buffer)
+        self.size = min(self.size + 1, len(self.buffer))
+
+    def values(self) -> np.ndarray:
+        """Read-only array of the stored values, oldest first"""
+        if self.size < len(self.buffer):
+            values = self.buffer[:self.size]
+        else:
+            values = np.concatenate((self.buffer[self.pos:], self.buffer[:self.pos]))
+        values.flags.writeable = False
+        return values
+
+
+class RollingSum:
+    """Trailing sum over `window` inputs (NaN until full or while a non-finite input is inside)"""
+
+    __slots__ = ("window", "values", "pos", "count", "total", "last_invalid")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = [0.0] * window
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.last_invalid = -1
+
+    def push(self, x: float) -> float:
+        i = self.count
+        self.count += 1
+        if not math.isfinite(x):
+            self.last_invalid = i
+            x = 0.0
+        self.total += x - self.values[self.pos]
+        self.values[self.pos] = x
+        self.pos += 1
+        if self.pos == self.window:
+            # Re-sum once per window so add/subtract rounding cannot drift
+            self.pos = 0
+            self.total = math.fsum(self.values)
+        if i < self.window - 1 or self.last_invalid > i - self.window:
+            return NAN
+        return self.total
+
+
+class RollingMean(RollingSum):
+    """Trailing simple moving average"""
+
+    __slots__ = ()
+
+    def push(self, x: float) -> float:
+        return super().push(x) / self.window
+
+
+class RollingExtreme:
+    """Trailing max (or min) over `window` inputs via a monotonic deque"""
+
+    __slots__ = ("window", "is_max", "candidates", "count", "last_invalid")
+
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.candidates = deque()
+        self.count = 0
+        self.last_invalid = -1
+
+    def push(self, x: float) -> float:
+        i = self.count
+        self.count += 1
+        candidates = self.candidates
+        if math.isfinite(x):
+            if self.is_max:
+                while candidates and candidates[-1][1] <= x:
+                    candidates.pop()
+            else:
+                while candidates and candidates[-1][1] >= x:
+                    candidates.pop()
+            candidates.append((i, x))
+        else:
+            self.last_invalid = i
+        while candidates and candidates[0][0] <= i - self.window:
+            candidates.popleft()
+        if i < self.window - 1 or self.last_invalid > i - self.window:
+            return NAN
+        return candidates[0][1]
+
+
+class EMA:
+    """Exponential moving average seeded with the first input (kernels.ema)"""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = None
+
+    def push(self, x: float) -> float:
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class RunningTotal:
+    """Cumulative sum skipping NaN (kernels.cumsum)"""
+
+    __slots__ = ("total",)
+
+    def __init__(self):
+        self.total = 0.0
+
+    def push(self, x: float) -> float:
+        if x != x:
+            return NAN
+        self.total += x
+        return self.total
+
+
+# ---------------- Incremental indicators ----------------
+# Each takes the new bar and the previous one (None for the first bar) and
+# returns one value per output series, mirroring IndicatorContext.
+
+class TrueRangeState:
+    outputs = 1
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        if prev is None:
+            return (NAN,)
+        return (max(bar.high - bar.low, abs(bar.high - prev.close), abs(bar.low - prev.close)),)
+
+
+class UpperWickState:
+    outputs = 1
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (bar.high - max(bar.close, bar.open),)
+
+
+class LowerWickState:
+    outputs = 1
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (min(bar.close, bar.open) - bar.low,)
+
+
+class ATRState:
+    outputs = 1
+
+    def __init__(self, period: int = 14):
+        self.true_range = TrueRangeState()
+        self.mean = RollingMean(period)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (self.mean.push(self.true_range.update(bar, prev)[0]),)
+
+
+class DMIState:
+    """ADX, +DI and -DI"""
+    outputs = 3
+
+    def __init__(self, period: int = 14):
+        self.atr = ATRState(period)
+        self.plus_dm = RollingMean(period)
+        self.minus_dm = RollingMean(period)
+        self.adx = RollingMean(period)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float, float, float]:
+        up_move = bar.high - prev.high if prev is not None else NAN
+        down_move = prev.low - bar.low if prev is not None else NAN
+        plus_dm = up_move if up_move > down_move and up_move > 0 else 0.0
+        minus_dm = down_move if down_move > up_move and down_move > 0 else 0.0
+
+        atr = self.atr.update(bar, prev)[0]
+        plus_di = _div(100 * self.plus_dm.push(plus_dm), atr)
+        minus_di = _div(100 * self.minus_dm.push(minus_dm), atr)
+        dx = _div(100 * abs(plus_di - minus_di), plus_di + minus_di)
+        return self.adx.push(dx), plus_di, minus_di
+
+
+class RSIState:
+    outputs = 1
+
+    def __init__(self, period: int = 14):
+        self.gain = RollingMean(period)
+        self.loss = RollingMean(period)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        delta = bar.close - prev.close if prev is not None else NAN
+        avg_gain = self.gain.push(delta if delta > 0 else 0.0)
+        avg_loss = self.loss.push(-delta if delta < 0 else 0.0)
+        rs = avg_gain / (math.inf if avg_loss == 0 else avg_loss)
+        return (100 - (100 / (1 + rs)),)
+
+
+class MACDState:
+    """MACD line, signal line and histogram"""
+    outputs = 3
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float, float, float]:
+        macd_line = self.fast.push(bar.close) - self.slow.push(bar.close)
+        signal_line = self.signal.push(macd_line)
+        return macd_line, signal_line, macd_line - signal_line
+
+
+class StochasticState:
+    """Stochastic %K (smoothed) and %D"""
+    outputs = 2
+
+    def __init__(self, length: int = 14, smooth: int = 3):
+        self.lowest_low = RollingExtreme(length, is_max=False)
+        self.highest_high = RollingExtreme(length, is_max=True)
+        self.k = RollingMean(smooth)
+        self.d = RollingMean(smooth)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float, float]:
+        lowest_low = self.lowest_low.push(bar.low)
+        highest_high = self.highest_high.push(bar.high)
+        k = self.k.push(_div(100 * (bar.close - lowest_low), highest_high - lowest_low))
+        return k, self.d.push(k)
+
+
+class IchimokuState:
+    """Ichimoku conversion line, base line, leading spans A and B"""
+    outputs = 4
+
+    def __init__(self, conv: int = 9, base: int = 26, span: int = 52):
+        self.windows = [
+            (RollingExtreme(window, is_max=True), RollingExtreme(window, is_max=False))
+            for window in (conv, base, span)
+        ]
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float, ...]:
+        conv_line, base_line, lead2 = (
+            (highest.push(bar.high) + lowest.push(bar.low)) / 2 for highest, lowest in self.windows
+        )
+        return conv_line, base_line, (conv_line + base_line) / 2, lead2
+
+
+class MoneyFlowMultiplierState:
+    outputs = 1
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (_money_flow_multiplier(bar),)
+
+
+class MoneyFlowVolumeState:
+    outputs = 1
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (_money_flow_multiplier(bar) * bar.volume,)
+
+
+class CMFState:
+    outputs = 1
+
+    def __init__(self, period: int = 20):
+        self.mf_volume = RollingSum(period)
+        self.volume = RollingSum(period)
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        mf_sum = self.mf_volume.push(_money_flow_multiplier(bar) * bar.volume)
+        return (_div(mf_sum, self.volume.push(bar.volume)),)
+
+
+class ADLineState:
+    outputs = 1
+
+    def __init__(self):
+        self.total = RunningTotal()
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (self.total.push(_money_flow_multiplier(bar) * bar.volume),)
+
+
+class OBVState:
+    outputs = 1
+
+    def __init__(self):
+        self.total = RunningTotal()
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        direction = _sign(bar.close - prev.close) if prev is not None else NAN
+        return (self.total.push(direction * bar.volume),)
+
+
+class CDVState:
+    outputs = 1
+
+    def __init__(self):
+        self.total = RunningTotal()
+
+    def update(self, bar: Bar, prev: Optional[Bar]) -> Tuple[float]:
+        return (self.total.push(bar.volume if bar.close >= bar.open else -bar.volume),)
+
+
+# Indicator name -> state factory (called with the indicator's params)
+STREAMING_INDICATORS: Dict[str, Callable] = {
+    "true_range": TrueRangeState,
+    "upper_wick": UpperWickState,
+    "lower_wick": LowerWickState,
+    "atr": ATRState,
+    "dmi": DMIState,
+    "rsi": RSIState,
+    "macd": MACDState,
+    "stochastic": StochasticState,
+    "ichimoku": IchimokuState,
+    "mf_multiplier": MoneyFlowMultiplierState,
+    "mf_volume": MoneyFlowVolumeState,
+    "cmf": CMFState,
+    "ad_line": ADLineState,
+    "obv": OBVState,
+    "cdv": CDVState,
+}
+
+# Levels that depend on every bar since the start, so they are tracked eagerly
+CUMULATIVE_INDICATORS = (("ad_line",), ("obv",), ("cdv",))
+
+
+class StreamingContext:
+    """
+    IndicatorContext-compatible view over incrementally updated indicators
+
+    Indicators are registered on first request by replaying the buffered
+    bars, then advanced by one O(1) update per pushed bar. Not thread-safe
+    by itself: callers hold `lock` around push() and layer evaluation.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.bars = 0
+        self.last_timestamp: Optional[int] = None
+        self.lock = threading.Lock()
+        self._prev: Optional[Bar] = None
+        self._prices = {column: RingSeries(capacity) for column in OHLCV_COLUMNS}
+        self._states: Dict[Hashable, Tuple[object, Tuple[RingSeries, ...]]] = {}
+        self._views: Dict[Hashable, object] = {}
+        self.computed = 0
+        self.reused = 0
+
+        for key in CUMULATIVE_INDICATORS:
+            self._register(key)
+
+    def __len__(self) -> int:
+        return self._prices["close"].size
+
+    def push(self, bar: Bar, timestamp: Optional[int] = None):
+        """Advance every registered indicator by one bar"""
+        if not all(math.isfinite(value) for value in bar):
+            raise ValueError(f"Bar contains non-finite values: {bar}")
+        if timestamp is not None and self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            raise ValueError(f"Bar at {timestamp} is not after the last bar at {self.last_timestamp}")
+
+        for column, value in zip(OHLCV_COLUMNS, bar):
+            self._prices[column].append(value)
+        for state, series in self._states.values():
+            for ring, value in zip(series, state.update(bar, self._prev)):
+                ring.append(value)
+
+        self._prev = bar
+        self.bars += 1
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        self._views.clear()
+        self.computed = 0
+        self.reused = 0
+
+    def _register(self, key: Hashable):
+        """Create the state for key and replay the buffered bars through it"""
+        state = STREAMING_INDICATORS[key[0]](*key[1:])
+        series = tuple(RingSeries(self.capacity) for _ in range(state.outputs))
+        prev = None
+        for bar in zip(*(self._prices[column].values() for column in OHLCV_COLUMNS)):
+            bar = Bar(*map(float, bar))
+            for ring, value in zip(series, state.update(bar, prev)):
+                ring.append(value)
+            prev = bar
+        self._states[key] = (state, series)
+
+    def _series(self, key: Hashable):
+        """Current arrays for key (one array, or a tuple for multi-output indicators)"""
+        if key in self._views:
+            self.reused += 1
+            return self._views[key]
+        self.computed += 1
+        if key not in self._states:
+            self._register(key)
+        values = tuple(ring.values() for ring in self._states[key][1])
+        view = values[0] if len(values) == 1 else values
+        self._views[key] = view
+        return view
+
+    def stats(self) -> Dict:
+        """Computed vs. reused counts for the current bar"""
+        return {"computed": self.computed, "reused": self.reused}
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the buffered price and indicator series"""
+        rings = list(self._prices.values())
+        for _, series in self._states.values():
+            rings.extend(series)
+        return sum(ring.buffer.nbytes for ring in rings)
+
+    # ---------------- Prices ----------------
+
+    def _price(self, column: str) -> np.ndarray:
+        key = ("price", column)
+        if key not in self._views:
+            self._views[key] = self._prices[column].values()
+        return self._views[key]
+
+    open = property(lambda self: self._price("open"))
+    high = property(lambda self: self._price("high"))
+    low = property(lambda self: self._price("low"))
+    close = property(lambda self: self._price("close"))
+    volume = property(lambda self: self._price("volume"))
+
+    # ---------------- Indicators (IndicatorContext interface) ----------------
+
+    def true_range(self) -> np.ndarray:
+        return self._series(("true_range",))
+
+    def upper_wick(self) -> np.ndarray:
+        return self._series(("upper_wick",))
+
+    def lower_wick(self) -> np.ndarray:
+        return self._series(("lower_wick",))
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        return self._series(("atr", period))
+
+    def dmi(self, period: int = 14) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._series(("dmi", period))
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        return self._series(("rsi", period))
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._series(("macd", fast, slow, signal))
+
+    def stochastic(self, length: int = 14, smooth: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        return self._series(("stochastic", length, smooth))
+
+    def ichimoku(self, conv: int = 9, base: int = 26, span: int = 52) -> Tuple[np.ndarray, ...]:
+        return self._series(("ichimoku", conv, base, span))
+
+    def money_flow_multiplier(self) -> np.ndarray:
+        return self._series(("mf_multiplier",))
+
+    def money_flow_volume(self) -> np.ndarray:
+        return self._series(("mf_volume",))
+
+    def cmf(self, period: int = 20) -> np.ndarray:
+        return self._series(("cmf", period))
+
+    def ad_line(self) -> np.ndarray:
+        return self._series(("ad_line",))
+
+    def obv(self) -> np.ndarray:
+        return self._series(("obv",))
+
+    def cdv(self) -> np.ndarray:
+        return self._series(("cdv",))
@@ -0,0 +1,426 @@
+"""
+Universe - Cross-sectional scoring of a whole universe in one pass
+
+Takes aligned (symbols, bars) OHLCV matrices, builds one IndicatorContext
+over them (every kernel works along the last axis) and scores every layer
+for all symbols at once with NumPy instead of one DataFrame per symbol.
+
+Scoring is split in two steps:
+- latest_features() reads each layer's inputs at the latest bar
+  (series_features() at every bar, for backtests and signal histories)
+- score_features() applies the layers' rules elementwise, so it works on
+  arrays of any shape
+The rules mirror the layer classes exactly; per-symbol analyze() is the
+reference, and tests/test_universe.py holds every column to it.
+"""
+import numpy as np
+from typing import Dict, List, Mapping, Optional, Tuple
+from .indicators import IndicatorContext, OHLCV_COLUMNS
+from . import kernels
+
+MIN_BARS = 200  # DataProcessor.validate_data minimum
+
+BUY_SIGNALS = ("STRONG_BUY", "BUY")
+SELL_SIGNALS = ("STRONG_SELL", "SELL")
+
+
+def _candle_columns(candles: Optional[Dict]) -> Dict[str, np.ndarray]:
+    """Polygon results or columnar candles -> bar arrays keyed by Polygon name, oldest first"""
+    candles = candles or {}
+    if "columns" in candles:
+        columns = {key: np.asarray(values, dtype=float) for key, values in candles["columns"].items()}
+    else:
+        results = sorted(candles.get("results") or [], key=lambda bar: bar.get("t", 0))
+        return {key: np.array([bar.get(key, np.nan) for bar in results], dtype=float)
+                for key in ("o", "h", "l", "c", "v")}
+    if "t" in columns:
+        order = np.argsort(columns["t"], kind="stable")
+        columns = {key: values[order] for key, values in columns.items()}
+    return columns
+
+
+def stack_candles(candles_by_symbol: Mapping[str, Dict]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Stack Polygon candle responses into (symbols, bars) OHLCV matrices
+
+    Accepts raw Polygon responses or columnar candles (bar store). Rows are
+    right-aligned on each symbol's own latest bar and left-padded with NaN,
+    so every row scores exactly like that symbol on its own.
+    """
+    keys = {"open": "o", "high": "h", "low": "l", "close": "c", "volume": "v"}
+    symbols = list(candles_by_symbol)
+    series = [_candle_columns(candles_by_symbol[symbol]) for symbol in symbols]
+    lengths = [len(next(iter(columns.values()), ())) for columns in series]
+    width = max(lengths, default=0)
+
+    bars = {column: np.full((len(symbols), width), np.nan) for column in OHLCV_COLUMNS}
+    for row, (columns, length) in enumerate(zip(series, lengths)):
+        if not length:
+            continue
+        for column, key in keys.items():
+            if key in columns:
+                bars[column][row, width - length:] = columns[key]
+    return symbols, bars
+
+
+def valid_rows(bars: Mapping[str, np.ndarray], min_bars: int = MIN_BARS) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows that pass validate_data (no NaN after the first bar, min_bars bars), and their bar counts"""
+    missing = np.zeros(np.shape(bars["close"]), dtype=bool)
+    for column in OHLCV_COLUMNS:
+        missing |= np.isnan(bars[column])
+    present = ~missing
+    first = np.argmax(present, axis=-1)
+    counts = np.where(present.any(axis=-1), missing.shape[-1] - first, 0)
+    gaps = (missing & (np.arange(missing.shape[-1]) >= first[..., None])).any(axis=-1)
+    return (counts >= min_bars) & ~gaps, counts
+
+
+def window_lookback(layers: Dict) -> int:
+    """
+    Bars the rolling-window series need before the latest bar
+
+    Only MACD's EMAs need the engine's full lookback; the longest rolling
+    requirement is Layer 8's 100 smoothed ATRP samples. Trailing means
+    (MA200) read just their own window, so they don't count here.
+    """
+    return max(
+        layers["layer_1_momentum"].window_lookback,
+        2 * 14,  # Layer 5's DMI
+        *(layers[name].lookback for name in (
+            "layer_2_volume", "layer_3_divergence", "layer_4_volume_strength", "layer_6_structure",
+            "layer_7_liquidity", "layer_8_volatility_regime", "layer_10_candle_intelligence"
+        ))
+    )
+
+
+def latest_features(ctx: IndicatorContext, layers: Dict,
+                    window_ctx: Optional[IndicatorContext] = None) -> Dict[str, np.ndarray]:
+    """
+    Each layer's inputs at the latest bar, one value per symbol
+
+    Args:
+        ctx: Context over the engine's lookback (MACD and trailing means)
+        layers: The engine's layer instances (for their parameters)
+        window_ctx: Shorter context for the rolling-window series (see
+            window_lookback); defaults to ctx
+    """
+    if window_ctx is None:
+        window_ctx = ctx
+    momentum = layers["layer_1_momentum"]
+    volume_layer = layers["layer_2_volume"]
+
+    _, _, macd_hist = ctx.macd(momentum.macd_fast, momentum.macd_slow, momentum.macd_signal)
+    closes = ctx.close
+    rsi = window_ctx.rsi(momentum.rsi_length)
+    k, _ = window_ctx.stochastic(momentum.stoch_length, momentum.stoch_smooth)
+    adx, plus_di, minus_di = window_ctx.dmi(momentum.adx_length)
+    _, _, lead1, lead2 = window_ctx.ichimoku(momentum.ichimoku_conv, momentum.ichimoku_base, momentum.ichimoku_span)
+    trend_adx, trend_plus_di, trend_minus_di = window_ctx.dmi(14)
+
+    atrp_smoothed = kernels.rolling_mean(window_ctx.atr(14) / window_ctx.close * 100, 5)
+    p20, p40, p60, p80 = np.percentile(atrp_smoothed[..., -100:], [20, 40, 60, 80], axis=-1)
+
+    return {
+        "open": window_ctx.open[..., -1],
+        "high": window_ctx.high[..., -1],
+        "low": window_ctx.low[..., -1],
+        "close": window_ctx.close[..., -1],
+        "volume": window_ctx.volume[..., -1],
+        "prev_open": window_ctx.open[..., -2],
+        "prev_close": window_ctx.close[..., -2],
+        # Layer 1
+        "rsi": rsi[..., -1],
+        "macd_hist": macd_hist[..., -1],
+        "macd_hist_max": kernels.trailing_max(np.abs(macd_hist), momentum.macd_hist_window),
+        "stoch_k": k[..., -1],
+        "momentum_cmf": window_ctx.cmf(momentum.cmf_length)[..., -1],
+        "adx": adx[..., -1],
+        "plus_di": plus_di[..., -1],
+        "minus_di": minus_di[..., -1],
+        "lead1": lead1[..., -1],
+        "lead2": lead2[..., -1],
+        # Layer 2
+        "obv_slope": kernels.linreg_slope(window_ctx.obv()[..., -5:]),
+        "ad_slope": kernels.linreg_slope(window_ctx.ad_line()[..., -5:]),
+        "cmf": window_ctx.cmf(volume_layer.cmf_length)[..., -1],
+        # Layer 3
+        "cdv_slope": kernels.linreg_slope(window_ctx.cdv()[..., -20:]),
+        # Layer 4
+        "avg_volume": kernels.trailing_mean(window_ctx.volume, 20),
+        # Layer 5
+        "ma20": kernels.trailing_mean(closes, 20),
+        "ma50": kernels.trailing_mean(closes, 50),
+        "ma200": kernels.trailing_mean(closes, 200),
+        "trend_adx": trend_adx[..., -1],
+        "trend_plus_di": trend_plus_di[..., -1],
+        "trend_minus_di": trend_minus_di[..., -1],
+        # Layer 6
+        "pivot_high": kernels.trailing_max(window_ctx.high, 11),
+        "pivot_low": kernels.trailing_min(window_ctx.low, 11),
+        # Layer 7
+        "swing_high": kernels.trailing_max(window_ctx.high[..., :-1], 20),
+        "swing_low": kernels.trailing_min(window_ctx.low[..., :-1], 20),
+        # Layer 8
+        "atrp": atrp_smoothed[..., -1],
+        "atrp_p20": p20,
+        "atrp_p40": p40,
+        "atrp_p60": p60,
+        "atrp_p80": p80,
+        # Layer 10
+        "upper_wick": window_ctx.upper_wick()[..., -1],
+        "lower_wick": window_ctx.lower_wick()[..., -1],
+    }
+
+
+def series_features(ctx: IndicatorContext, layers: Dict) -> Dict[str, np.ndarray]:
+    """
+    latest_features at every bar: the inputs each layer would see if the
+    history ended there, shaped like the bars
+
+    Trailing reductions become their rolling kernels, so score_features()
+    scores every bar of every symbol in one pass. With a full-history ctx
+    each bar matches analyze(..., tail_only=False) on the bars up to it.
+    """
+    momentum = layers["layer_1_momentum"]
+    volume_layer = layers["layer_2_volume"]
+
+    _, _, macd_hist = ctx.macd(momentum.macd_fast, momentum.macd_slow, momentum.macd_signal)
+    k, _ = ctx.stochastic(momentum.stoch_length, momentum.stoch_smooth)
+    adx, plus_di, minus_di = ctx.dmi(momentum.adx_length)
+    _, _, lead1, lead2 = ctx.ichimoku(momentum.ichimoku_conv, momentum.ichimoku_base, momentum.ichimoku_span)
+    trend_adx, trend_plus_di, trend_minus_di = ctx.dmi(14)
+
+    atrp_smoothed = kernels.rolling_mean(ctx.atr(14) / ctx.close * 100, 5)
+    p20, p40, p60, p80 = kernels.rolling_percentiles(atrp_smoothed, 100, [20, 40, 60, 80])
+
+    return {
+        "open": ctx.open,
+        "high": ctx.high,
+        "low": ctx.low,
+        "close": ctx.close,
+        "volume": ctx.volume,
+        "prev_open": kernels.shift(ctx.open),
+        "prev_close": kernels.shift(ctx.close),
+        # Layer 1
+        "rsi": ctx.rsi(momentum.rsi_length),
+        "macd_hist": macd_hist,
+        "macd_hist_max": kernels.rolling_max(np.abs(macd_hist), momentum.macd_hist_window),
+        "stoch_k": k,
+        "momentum_cmf": ctx.cmf(momentum.cmf_length),
+        "adx": adx,
+        "plus_di": plus_di,
+        "minus_di": minus_di,
+        "lead1": lead1,
+        "lead2": lead2,
+        # Layer 2
+        "obv_slope": kernels.rolling_linreg_slope(ctx.obv(), 5),
+        "ad_slope": kernels.rolling_linreg_slope(ctx.ad_line(), 5),
+        "cmf": ctx.cmf(volume_layer.cmf_length),
+        # Layer 3
+        "cdv_slope": kernels.rolling_linreg_slope(ctx.cdv(), 20),
+        # Layer 4
+        "avg_volume": kernels.rolling_mean(ctx.volume, 20),
+        # Layer 5
+        "ma20": kernels.rolling_mean(ctx.close, 20),
+        "ma50": kernels.rolling_mean(ctx.close, 50),
+        "ma200": kernels.rolling_mean(ctx.close, 200),
+        "trend_adx": trend_adx,
+        "trend_plus_di": trend_plus_di,
+        "trend_minus_di": trend_minus_di,
+        # Layer 6
+        "pivot_high": kernels.rolling_max(ctx.high, 11),
+        "pivot_low": kernels.rolling_min(ctx.low, 11),
+        # Layer 7 (the 20 bars before the current one)
+        "swing_high": kernels.shift(kernels.rolling_max(ctx.high, 20)),
+        "swing_low": kernels.shift(kernels.rolling_min(ctx.low, 20)),
+        # Layer 8
+        "atrp": atrp_smoothed,
+        "atrp_p20": p20,
+        "atrp_p40": p40,
+        "atrp_p60": p60,
+        "atrp_p80": p80,
+        # Layer 10
+        "upper_wick": ctx.upper_wick(),
+        "lower_wick": ctx.lower_wick(),
+    }
+
+
+def valid_bars(bars: Mapping[str, np.ndarray], min_bars: int = MIN_BARS) -> np.ndarray:
+    """valid_rows at every bar: min_bars bars so far and no NaN since the row's first bar"""
+    missing = np.zeros(np.shape(bars["close"]), dtype=bool)
+    for column in OHLCV_COLUMNS:
+        missing |= np.isnan(bars[column])
+    present = ~missing
+    started = np.logical_or.accumulate(present, axis=-1)
+    counts = np.cumsum(started, axis=-1)
+    gaps = np.logical_or.accumulate(missing & started, axis=-1)
+    return (counts >= min_bars) & ~gaps
+
+
+def _sign(x: np.ndarray) -> np.ndarray:
+    """+1/-1/0 by sign, 0 for NaN (the engine's `1 if x > 0 else -1 if x < 0 else 0`)"""
+    return np.where(x > 0, 1, np.where(x < 0, -1, 0))
+
+
+def _direction(signal: np.ndarray) -> np.ndarray:
+    """+1 for buy signals, -1 for sell signals, 0 otherwise (Layer 9's reading)"""
+    return np.where(np.isin(signal, BUY_SIGNALS), 1, np.where(np.isin(signal, SELL_SIGNALS), -1, 0))
+
+
+def score_features(f: Dict[str, np.ndarray], layers: Dict) -> Dict[str, np.ndarray]:
+    """Apply every layer's scoring rules elementwise; returns scores and signals"""
+    cmf_threshold = layers["layer_2_volume"].cmf_threshold
+    close = f["close"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Layer 1: Momentum
+        rsi_momentum = (f["rsi"] - 50) / 50 * 100
+        macd_momentum = np.where(
+            f["macd_hist_max"] == 0, 0.0,
+            np.where(f["macd_hist"] > 0, 100 * (f["macd_hist"] / f["macd_hist_max"]),
+                     -100 * (np.abs(f["macd_hist"]) / f["macd_hist_max"]))
+        )
+        stoch_momentum = (f["stoch_k"] - 50) / 50 * 100
+        bullish_dmi = f["plus_di"] > f["minus_di"]
+        trend_momentum = np.where(bullish_dmi, (f["adx"] / 100) * 100, -(f["adx"] / 100) * 100)
+        cmf_momentum = np.where(np.isnan(f["momentum_cmf"]), 0.0, f["momentum_cmf"] * 100)
+        momentum_score = (rsi_momentum + macd_momentum + stoch_momentum + trend_momentum + cmf_momentum) / 5
+
+        cloud_bullish = (close > f["lead1"]) & (close > f["lead2"])
+        cloud_bearish = (close < f["lead1"]) & (close < f["lead2"])
+        momentum_signal = np.select(
+            [
+                (momentum_score > 50) & bullish_dmi & (f["adx"] > 25) & cloud_bullish,
+                (momentum_score > 20) & bullish_dmi,
+                (momentum_score < -50) & ~bullish_dmi & (f["adx"] > 25) & cloud_bearish,
+                (momentum_score < -20) & ~bullish_dmi,
+            ],
+            ["STRONG_BUY", "BUY", "STRONG_SELL", "SELL"], "NEUTRAL"
+        )
+
+        # Layer 2: Volume
+        obv_slope, ad_slope, cmf = f["obv_slope"], f["ad_slope"], f["cmf"]
+        cmf_strength = np.where(np.isnan(cmf), 0.0, cmf * 100)
+        volume_flow_score = (np.clip(obv_slope / 100, -100, 100) + np.clip(ad_slope / 100, -100, 100) + cmf_strength) / 3
+        volume_signal = np.select(
+            [
+                (volume_flow_score > 50) & (obv_slope > 0) & (ad_slope > 0) & (cmf > cmf_threshold),
+                (volume_flow_score > 20) & (obv_slope > 0),
+                (volume_flow_score < -50) & (obv_slope < 0) & (ad_slope < 0) & (cmf < -cmf_threshold),
+                (volume_flow_score < -20) & (obv_slope < 0),
+            ],
+            ["STRONG_BUY", "BUY", "STRONG_SELL", "SELL"], "NEUTRAL"
+        )
+
+        # Layer 3: Divergence
+        divergence_signal = np.where(f["cdv_slope"] > 0, "BUY", "SELL")
+
+        # Layer 4: Volume strength
+        rvol = np.where(f["avg_volume"] > 0, f["volume"] / f["avg_volume"], 1.0)
+        volume_strength_signal = np.where((rvol > 2.0) & (close > f["open"]), "STRONG_BUY", "NEUTRAL")
+
+        # Layer 5: Trend
+        trend_bullish = f["trend_plus_di"] > f["trend_minus_di"]
+        ma_trend = np.where(
+            (close > f["ma20"]) & (f["ma20"] > f["ma50"]) & (f["ma50"] > f["ma200"]), 1,
+            np.where((close < f["ma20"]) & (f["ma20"] < f["ma50"]) & (f["ma50"] < f["ma200"]), -1, 0)
+        )
+        trend_score = (ma_trend + np.where(trend_bullish, 1, -1)) / 2 * 100
+        trend_signal = np.select(
+            [(trend_score > 50) & (f["trend_adx"] > 25), (trend_score < -50) & (f["trend_adx"] > 25)],
+            ["STRONG_BUY", "STRONG_SELL"], "NEUTRAL"
+        )
+
+        # Layer 6: Structure
+        structure_bias = np.select(
+            [close > f["pivot_high"], close < f["pivot_low"]], ["BULLISH", "BEARISH"], "NEUTRAL"
+        )
+
+        # Layer 7: Liquidity
+        bullish_sweep = (f["low"] < f["swing_low"]) & (close > f["swing_low"])
+        bearish_sweep = (f["high"] > f["swing_high"]) & (close < f["swing_high"])
+        liquidity_score = np.select([bullish_sweep, bearish_sweep], [75.0, 25.0], 50.0)
+        liquidity_signal = np.select([bullish_sweep, bearish_sweep], ["BUY", "SELL"], "NEUTRAL")
+
+        # Layer 8: Volatility regime
+        atrp = f["atrp"]
+        regime = np.select(
+            [atrp <= f["atrp_p20"], atrp <= f["atrp_p40"], atrp <= f["atrp_p60"], atrp <= f["atrp_p80"]],
+            ["LOW", "NORMAL-LOW", "NORMAL", "ELEVATED"], "EXTREME"
+        )
+
+        # Layer 9: Confirmation
+        avg_signal = (_direction(momentum_signal) + _direction(volume_signal) + _direction(trend_signal)) / 3
+        confirmation_signal = np.trunc(avg_signal * 2).astype(int)
+        confirmation = np.select(
+            [confirmation_signal >= 2, confirmation_signal == 1, confirmation_signal <= -2, confirmation_signal == -1],
+            ["STRONG_BUY", "BUY", "STRONG_SELL", "SELL"], "NEUTRAL"
+        )
+
+        # Layer 10: Candle intelligence
+        is_bullish = close > f["open"]
+        body_size = np.abs(close - f["open"])
+        candle_range = f["high"] - f["low"]
+        body_percent = np.where(candle_range > 0, body_size / candle_range, 0.0)
+        prev_bullish = f["prev_close"] > f["prev_open"]
+        prev_body = np.abs(f["prev_close"] - f["prev_open"])
+        bullish_pattern = (is_bullish & ~prev_bullish & (body_size > prev_body * 1.1)) | (
+            is_bullish & (f["lower_wick"] > body_size * 2))
+        bearish_pattern = (~is_bullish & prev_bullish & (body_size > prev_body * 1.1)) | (
+            ~is_bullish & (f["upper_wick"] > body_size * 2))
+        pattern_score = np.select([bullish_pattern, bearish_pattern], [60.0, -60.0], 0.0)
+        candle_signal = np.select([pattern_score > 40, pattern_score < -40], ["BUY", "SELL"], "NEUTRAL")
+
+    # Overall signal (reads the rounded layer scores, as the engine does)
+    momentum_score = np.round(momentum_score, 2)
+    volume_flow_score = np.round(volume_flow_score, 2)
+    trend_score = np.round(trend_score, 2)
+    volatility_signal = np.where(np.isin(regime, ("LOW", "NORMAL")), 1, np.where(regime == "EXTREME", -1, 0))
+    weighted_signal = (
+        _sign(momentum_score) * 0.25 + _sign(volume_flow_score) * 0.20 + _sign(trend_score) * 0.20
+        + volatility_signal * 0.10 + confirmation_signal * 0.25
+    )
+    confidence = np.abs(weighted_signal) * 100
+    direction = np.select([weighted_signal > 0.3, weighted_signal < -0.3], ["BULLISH", "BEARISH"], "NEUTRAL")
+    recommendation = np.select(
+        [
+            (weighted_signal > 0.3) & (confidence > 70),
+            (weighted_signal > 0.3) & (confidence > 50),
+            weighted_signal > 0.3,
+            (weighted_signal < -0.3) & (confidence > 70),
+            (weighted_signal < -0.3) & (confidence > 50),
+            weighted_signal < -0.3,
+        ],
+        ["STRONG BUY", "BUY", "WEAK BUY", "STRONG SELL", "SELL", "WEAK SELL"], "HOLD"
+    )
+
+    return {
+        "latest_price": close,
+        "momentum_score": momentum_score,
+        "momentum_signal": momentum_signal,
+        "rsi": np.round(f["rsi"], 2),
+        "macd_hist": np.round(f["macd_hist"], 4),
+        "adx": np.round(f["adx"], 2),
+        "trend_direction": np.where(bullish_dmi, "BULLISH", "BEARISH"),
+        "volume_flow_score": volume_flow_score,
+        "volume_signal": volume_signal,
+        "cdv_slope": np.round(f["cdv_slope"], 2),
+        "divergence_signal": divergence_signal,
+        "rvol": np.round(rvol, 2),
+        "volume_strength_signal": volume_strength_signal,
+        "trend_score": trend_score,
+        "trend_signal": trend_signal,
+        "structure_bias": structure_bias,
+        "liquidity_score": liquidity_score,
+        "liquidity_signal": liquidity_signal,
+        "atrp": np.where(np.isnan(atrp), 0.0, np.round(atrp, 4)),
+        "volatility_regime": regime,
+        "confirmation_signal": confirmation_signal,
+        "confirmation": confirmation,
+        "pattern_score": pattern_score,
+        "candle_signal": candle_signal,
+        "weighted_signal": np.round(weighted_signal, 3),
+        "confidence": np.round(confidence, 2),
+        "direction": direction,
+        "recommendation": recommendation,
+    }